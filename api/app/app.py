@@ -5,6 +5,7 @@ from fastapi import FastAPI, UploadFile, File, HTTPException
 import requests
 import logging
 import time
+from typing import Optional
 
 # Internal Python Dependencies
 from service_models.models import LLMRequestModel, BetDetails
@@ -29,7 +30,7 @@ def retry_request(func, retries=3, delay=2):
                 raise
 
 # Validation and parsing utility
-def parse_and_validate_llm_response(response):
+def parse_and_validate_llm_response(response, sportsbook=None, user_id='X'):
     try:
         response_json = response.json()
         betsRequest = []
@@ -48,7 +49,9 @@ def parse_and_validate_llm_response(response):
                 bet_id = bet.pop('bet_id', None)  # Remove bet_id if present
                 if bet_id:
                     bet['bet_id'] = bet_id
-                betsRequest.append(BetDetails(**{**bet, 'outcome': bet.get('outcome', 'WON')}, user_id='X'))
+                if sportsbook:
+                    bet['sportsbook'] = sportsbook
+                betsRequest.append(BetDetails(**{**bet, 'outcome': bet.get('outcome', 'WON')}, user_id=user_id))
 
             except Exception as e:
                 logger.warning(f"Skipping invalid bet data: {str(e)}")
@@ -63,7 +66,7 @@ def parse_and_validate_llm_response(response):
 
 # Image Upload and OCR Processing
 @app.post("/upload/")
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(file: UploadFile = File(...), sportsbook: Optional[str] = None):
     start_time = time.time()
     logger.info(f"Received file: {file.filename}")
     
@@ -111,7 +114,7 @@ async def upload_image(file: UploadFile = File(...)):
 
     try:
         # Parse and validate the LLM response
-        betsRequest = parse_and_validate_llm_response(response)
+        betsRequest = parse_and_validate_llm_response(response, sportsbook=sportsbook)
     except Exception as e:
         return {"error": str(e)}
 
@@ -139,6 +142,89 @@ async def upload_image(file: UploadFile = File(...)):
 
     return response.json()
 
+# Betslip IDs from the list that are already stored for the user
+def find_existing_betslips(user_id: str, betslip_ids: list) -> set:
+    response = retry_request(lambda: requests.post(
+        f"http://storage_service:9004/bets/{user_id}/existing",
+        json=betslip_ids
+    ))
+    response.raise_for_status()
+    return set(response.json()["existing_bet_ids"])
+
+# MGM PDF Upload: betslips that are already stored are dropped before LLM extraction
+@app.post("/upload/mgm")
+async def upload_mgm_pdf(file: UploadFile = File(...), user_id: str = 'X', job_id: Optional[str] = None):
+    start_time = time.time()
+    logger.info(f"Received MGM PDF: {file.filename}")
+    file_content = await file.read()
+
+    extracted_text = mgm_ingestion.extract_text_pypdf2(file_content)
+    if extracted_text.startswith("Error using PyPDF2"):
+        logger.error(extracted_text)
+        raise HTTPException(status_code=400, detail=extracted_text)
+
+    header, betslips = mgm_ingestion.split_betslips(extracted_text)
+    betslip_ids = [betslip_id for betslip_id, _ in betslips if betslip_id]
+    try:
+        known_betslips = find_existing_betslips(user_id, betslip_ids)
+    except requests.exceptions.RequestException as e:
+        # Storage still skips duplicates on write, so extraction just costs more without the check
+        logger.warning(f"Could not check for stored betslips, extracting all of them: {str(e)}")
+        known_betslips = set()
+    new_betslips = [text for betslip_id, text in betslips if betslip_id not in known_betslips]
+    skipped_bets = [betslip_id for betslip_id in betslip_ids if betslip_id in known_betslips]
+    logger.info(f"{len(new_betslips)} new betslips, {len(skipped_bets)} already stored")
+    if not new_betslips:
+        return {"message": "No new bets", "succeeded_bets": [], "failed_bets": [], "duplicate_bets": [], "skipped_bets": skipped_bets}
+
+    try:
+        logger.info("Sending new betslips to LLM service")
+        llmRequest = LLMRequestModel(extracted_text=header + ''.join(new_betslips), job_id=job_id)
+        response = retry_request(lambda: requests.post(
+            "http://llm_service:9002/llm-extraction/mgm",
+            data=llmRequest.json()
+        ))
+        response.raise_for_status()
+        logger.info("Received response from LLM service")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error in LLM service: {str(e)}")
+        return {"error": f"Error in LLM service: {str(e)}"}
+
+    try:
+        # The model can repeat a betslip it saw in a neighbouring segment
+        betsRequest = [bet for bet in parse_and_validate_llm_response(response, sportsbook='MGM', user_id=user_id)
+                       if bet.bet_id not in known_betslips]
+    except Exception as e:
+        return {"error": str(e)}
+
+    try:
+        logger.info("Sending parsed data to Storage service")
+        response = retry_request(lambda: requests.post(
+            "http://storage_service:9004/bets",
+            data=json.dumps([bet.dict() for bet in betsRequest], default=str),
+            headers={'Content-Type': 'application/json'}
+        ))
+        response.raise_for_status()
+        logger.info("Successfully stored bets data")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error in Bets service: {str(e)}")
+        return {"error": f"Error in Bets service: {str(e)}"}
+
+    logging.info("MGM processing complete in: %s seconds" % (time.time() - start_time))
+    return {**response.json(), "skipped_bets": skipped_bets}
+
+# Extraction progress reported by the LLM service for multi-segment jobs
+@app.get("/progress/{job_id}")
+def get_extraction_progress(job_id: str):
+    try:
+        response = retry_request(lambda: requests.get(f"http://llm_service:9002/llm/progress/{job_id}"))
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error in LLM service: {str(e)}")
+        return {"error": f"Error in LLM service: {str(e)}"}
+    if response.status_code == 404:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return response.json()
+
 if __name__ == '__main__':
     import uvicorn
     uvicorn.run(app, port=9001)
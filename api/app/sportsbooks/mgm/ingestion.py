@@ -3,6 +3,12 @@ from io import BytesIO
 import re
 from datetime import datetime
 
+# Each betslip starts at its "Betslip ID: <id>" line. Copies of SLIP_SPLIT_PATTERN and BET_ID_PATTERN in
+# llm_service/app/llms/repair.py: the services ship as separate images, and the slips skipped here must be the ones
+# the LLM service would have split out, so keep both copies in sync
+BETSLIP_SPLIT_PATTERN = re.compile(r'(?=Betslip ID)', re.IGNORECASE)
+BETSLIP_ID_PATTERN = re.compile(r'Betslip ID:?\s*(\w+)', re.IGNORECASE)
+
 # File path for the uploaded PDF
 pdf_file_path = "BetMGM.pdf"
 
@@ -31,6 +37,17 @@ class IngestionProvider:
         
         return text
 
+    @staticmethod
+    def split_betslips(text: str) -> tuple:
+        # Returns the text before the first slip and one (betslip_id, slip_text) pair per slip
+        parts = BETSLIP_SPLIT_PATTERN.split(text)
+        header = '' if BETSLIP_ID_PATTERN.match(parts[0]) else parts.pop(0)
+        slips = []
+        for part in parts:
+            match = BETSLIP_ID_PATTERN.match(part)
+            slips.append((match.group(1) if match else None, part))
+        return header, slips
+
 if __name__ == "__main__":
     # Read the PDF file as bytes
     with open(pdf_file_path, "rb") as file:
@@ -0,0 +1,37 @@
+import unittest
+
+from ingestion import IngestionProvider
+
+SLIP = """Betslip ID: {}
+Result:Under 35.5
+Los Angeles Chargers at Pittsburgh Steelers
+9/20/24 • 1:52 PM $37.50 -110 $71.59WON
+"""
+
+class TestSplitBetslips(unittest.TestCase):
+
+    def test_text_before_the_first_slip_is_the_header(self):
+        text = "Settled bets\n" + SLIP.format("1ZR948E37C") + SLIP.format("2AB123C45D")
+        header, slips = IngestionProvider.split_betslips(text)
+        self.assertEqual(header, "Settled bets\n")
+        self.assertEqual([betslip_id for betslip_id, _ in slips], ["1ZR948E37C", "2AB123C45D"])
+        self.assertEqual(header + "".join(slip for _, slip in slips), text)
+
+    def test_text_starting_with_a_slip_has_no_header(self):
+        text = SLIP.format("1ZR948E37C") + SLIP.format("2AB123C45D")
+        header, slips = IngestionProvider.split_betslips(text)
+        self.assertEqual(header, "")
+        self.assertEqual(slips[0], ("1ZR948E37C", SLIP.format("1ZR948E37C")))
+
+    def test_slip_without_an_id_is_kept_with_none(self):
+        # "Betslip ID" with the ID lost to OCR still starts a slip, which must then be extracted
+        text = "Settled bets\n" + SLIP.format("1ZR948E37C") + "Betslip ID: •\nResult:Over 44.5\n"
+        header, slips = IngestionProvider.split_betslips(text)
+        self.assertEqual([betslip_id for betslip_id, _ in slips], ["1ZR948E37C", None])
+        self.assertEqual(slips[1][1], "Betslip ID: •\nResult:Over 44.5\n")
+
+    def test_text_without_slips_is_all_header(self):
+        self.assertEqual(IngestionProvider.split_betslips("No settled bets"), ("No settled bets", []))
+
+if __name__ == '__main__':
+    unittest.main()
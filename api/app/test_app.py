@@ -0,0 +1,95 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+from fastapi.testclient import TestClient
+
+import app as api
+
+SLIP = """Betslip ID: {}
+Result:Under 35.5
+Los Angeles Chargers at Pittsburgh Steelers
+9/20/24 • 1:52 PM $37.50 -110 $71.59WON
+"""
+
+HEADER = "Settled bets\n"
+TEXT = HEADER + SLIP.format("1ZR948E37C") + SLIP.format("2AB123C45D") + SLIP.format("3XY678Z90W")
+
+class Response:
+    def __init__(self, body, status_code=200):
+        self.body, self.status_code = body, status_code
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error")
+
+class FakeServices:
+    """Answers the API's requests.post calls as the storage and LLM services would, recording each call."""
+
+    def __init__(self, stored_ids=(), storage_up=True, echo_ids=()):
+        self.stored_ids, self.storage_up, self.echo_ids = set(stored_ids), storage_up, list(echo_ids)
+        self.llm_texts, self.written_ids = [], []
+
+    def post(self, url, data=None, **kwargs):
+        if url.endswith("/existing"):
+            if not self.storage_up:
+                raise requests.exceptions.ConnectionError("storage_service unreachable")
+            return Response({"existing_bet_ids": [bet_id for bet_id in kwargs["json"] if bet_id in self.stored_ids]})
+        if url.endswith("/llm-extraction/mgm"):
+            text = json.loads(data)["extracted_text"]
+            self.llm_texts.append(text)
+            # The model answers for every slip it was sent, plus any it repeats from a neighbouring segment
+            bet_ids = [bet_id for bet_id in ("1ZR948E37C", "2AB123C45D", "3XY678Z90W") if bet_id in text] + self.echo_ids
+            return Response([{"bet_id": bet_id, "odds": "-110", "stake": "37.50", "outcome": "WON"} for bet_id in bet_ids])
+        if url.endswith("/bets"):
+            bet_ids = [bet["bet_id"] for bet in json.loads(data)]
+            self.written_ids.extend(bet_ids)
+            return Response({"succeeded_bets": bet_ids, "failed_bets": [], "duplicate_bets": []})
+        raise AssertionError(f"unexpected POST {url}")
+
+class TestUploadMGM(unittest.TestCase):
+
+    def upload(self, services):
+        with mock.patch.object(api.requests, "post", services.post), \
+             mock.patch.object(api.mgm_ingestion, "extract_text_pypdf2", return_value=TEXT), \
+             mock.patch.object(api.time, "sleep"):
+            response = TestClient(api.app).post("/upload/mgm", files={"file": ("bets.pdf", b"%PDF", "application/pdf")})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_only_new_betslips_are_extracted(self):
+        services = FakeServices(stored_ids=["2AB123C45D"])
+        body = self.upload(services)
+        self.assertEqual(len(services.llm_texts), 1)
+        self.assertEqual(services.llm_texts[0], HEADER + SLIP.format("1ZR948E37C") + SLIP.format("3XY678Z90W"))
+        self.assertEqual(body["succeeded_bets"], ["1ZR948E37C", "3XY678Z90W"])
+        self.assertEqual(body["skipped_bets"], ["2AB123C45D"])
+
+    def test_all_known_betslips_skip_extraction(self):
+        services = FakeServices(stored_ids=["1ZR948E37C", "2AB123C45D", "3XY678Z90W"])
+        body = self.upload(services)
+        self.assertEqual(services.llm_texts, [])
+        self.assertEqual(services.written_ids, [])
+        self.assertEqual(body["message"], "No new bets")
+        self.assertEqual(body["skipped_bets"], ["1ZR948E37C", "2AB123C45D", "3XY678Z90W"])
+
+    def test_known_betslips_echoed_by_the_model_are_not_written(self):
+        services = FakeServices(stored_ids=["2AB123C45D"], echo_ids=["2AB123C45D"])
+        body = self.upload(services)
+        self.assertNotIn("2AB123C45D", services.llm_texts[0])
+        self.assertEqual(services.written_ids, ["1ZR948E37C", "3XY678Z90W"])
+        self.assertEqual(body["skipped_bets"], ["2AB123C45D"])
+
+    def test_unreachable_storage_extracts_every_betslip(self):
+        services = FakeServices(storage_up=False)
+        body = self.upload(services)
+        self.assertEqual(services.llm_texts, [TEXT])
+        self.assertEqual(services.written_ids, ["1ZR948E37C", "2AB123C45D", "3XY678Z90W"])
+        self.assertEqual(body["skipped_bets"], [])
+
+if __name__ == '__main__':
+    unittest.main()
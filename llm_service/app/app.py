@@ -1,37 +1,94 @@
 # External Python Dependencies
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
 # Internal Python Dependencies
-from llms.ollama.client import generate_content_from_model
+from llms.batcher import MicroBatcher
+from llms.cascade import btb_cascade_models, generate_with_cascade
+from llms.extraction import generate_batch_from_model, parse_mgm_pdf_inputs, router
+from llms.lifecycle import readiness, start_background_tasks
+from llms.metrics import metrics
+from llms.ollama.client import btb_ollama_model, btb_ollama_model_keep_alive
+from llms.resources import start_resource_sampler
+from llms.segments import progress_registry
 from service_models.models import LLMRequestModel, BetExtractionDetails
 load_dotenv()
 
-app = FastAPI()
+# Model pull, load and keep-alive run in the background so the port binds immediately
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    models = list(dict.fromkeys([*btb_cascade_models, btb_ollama_model]))
+    stop_event = start_background_tasks(router, models, btb_ollama_model_keep_alive)
+    start_resource_sampler(stop_event)
+    yield
+    stop_event.set()
+
+app = FastAPI(lifespan=lifespan)
+
+def require_ready():
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail=f"LLM service not ready: {readiness.status}")
+
+# Small single-slip requests arriving together share one model call
+batcher = MicroBatcher(batch_fn=generate_batch_from_model, single_fn=generate_with_cascade)
 
 # LLM Parsing Endpoint
 @app.post('/llm')
 async def llm(llm_request: LLMRequestModel):
+    require_ready()
     extracted_text = llm_request.extracted_text
 
     try:
-        parsed_data = generate_content_from_model(extracted_text,list(BetExtractionDetails.model_fields.keys().__iter__()))
+        parsed_data = await batcher.submit(extracted_text, list(BetExtractionDetails.model_fields.keys().__iter__()))
     except Exception as e:
         return {"error": str(e)}
 
     return parsed_data
 
-# LLM Parsing Endpoint
-# @app.post('/llm-extraction/mgm')
-# async def llm(llm_request: LLMRequestModel):
-#     extracted_text = llm_request.extracted_text
+# MGM PDF Parsing Endpoint
+@app.post('/llm-extraction/mgm')
+def llm_extraction_mgm(llm_request: LLMRequestModel):
+    require_ready()
+    extracted_text = llm_request.extracted_text
+
+    try:
+        parsed_data = parse_mgm_pdf_inputs(extracted_text, list(BetExtractionDetails.model_fields.keys().__iter__()), job_id=llm_request.job_id, generate=generate_with_cascade)
+    except Exception as e:
+        return {"error": str(e)}
+
+    return parsed_data
+
+# Readiness Endpoint (503 until models are pulled and warm)
+@app.get('/ready')
+async def ready():
+    return JSONResponse(status_code=200 if readiness.ready else 503, content=readiness.snapshot())
+
+# Segment Progress Endpoints
+@app.get('/llm/progress')
+async def list_progress():
+    return progress_registry.list()
+
+@app.get('/llm/progress/{job_id}')
+async def get_progress(job_id: str):
+    progress = progress_registry.get(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return progress.snapshot()
 
-#     try:
-#         parsed_data = parse_mgm_pdf_inputs(extracted_text, list(BetExtractionDetails.model_fields.keys().__iter__()))
-# # ['bet_id', 'outcome', 'away_team', 'home_team', 'date', 'stake', 'risk', 'payout','league','bet_type','selection','odds','wager_team','status'])
-#     except Exception as e:
-#         return {"error": str(e)}
+# Backend Routing Status
+@app.get('/llm/providers')
+async def get_providers():
+    status = router.status()
+    for provider, provider_status in zip(router.providers, status):
+        if hasattr(provider, 'pool'):
+            provider_status["hosts"] = provider.pool.snapshot()
+    return status
 
-#     return parsed_data
+# Metrics Endpoint (Prometheus text format)
+@app.get('/metrics', response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render()
 
 # if __name__ == '__main__':
 #     import uvicorn
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+
+from llms.metrics import metrics
+from llms.repair import repair_extraction
+from llms.validation import is_valid, validate_extraction
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Up to this many pending small requests are packed into one model call (1 disables batching)
+btb_batch_max_size = int(os.getenv('BTB_BATCH_MAX_SIZE', '4'))
+# How long the first request in a batch waits for company before the batch is sent
+btb_batch_wait_ms = int(os.getenv('BTB_BATCH_WAIT_MS', '50'))
+# Only single-slip sized texts are batched; longer texts go straight to the single-request path
+btb_batch_max_text_chars = int(os.getenv('BTB_BATCH_MAX_TEXT_CHARS', '600'))
+
+batch_sizes = metrics.histogram('llm_batch_size', 'Number of requests packed into a batched call', (1, 2, 4, 8, 16, 32))
+batch_fallbacks = metrics.counter('llm_batch_fallbacks_total', 'Batched requests retried individually after demultiplexing failed')
+
+# Packs concurrent small /llm requests into one delimited prompt and fans the keyed results back out
+class MicroBatcher:
+    def __init__(self, batch_fn, single_fn, max_batch_size: int = btb_batch_max_size,
+                 max_wait_ms: int = btb_batch_wait_ms, max_text_chars: int = btb_batch_max_text_chars):
+        self.batch_fn = batch_fn
+        self.single_fn = single_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_text_chars = max_text_chars
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, extracted_text: str, fields: list) -> list:
+        loop = asyncio.get_running_loop()
+        if self.max_batch_size <= 1 or len(extracted_text) > self.max_text_chars:
+            return await loop.run_in_executor(None, self.single_fn, extracted_text, fields)
+
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._collect())
+        future = loop.create_future()
+        await self._queue.put((extracted_text, list(fields), future))
+        return await future
+
+    # Gather requests until the batch is full or the wait window closes, then dispatch without blocking collection
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch: list):
+        loop = asyncio.get_running_loop()
+        # Requests with different field lists cannot share a schema, so they are batched separately
+        groups = {}
+        for item in batch:
+            groups.setdefault(tuple(item[1]), []).append(item)
+
+        for fields, items in groups.items():
+            batch_sizes.observe(len(items))
+            if len(items) == 1:
+                await self._run_single(items[0])
+                continue
+
+            texts = [text for text, _, _ in items]
+            try:
+                keyed_results = await loop.run_in_executor(None, self.batch_fn, texts, list(fields))
+            except Exception as e:
+                logging.error(f'Batched generation for {len(items)} requests failed: {e}')
+                keyed_results = {}
+
+            retries = []
+            for index, item in enumerate(items):
+                text, _, future = item
+                result = keyed_results.get(str(index), keyed_results.get(index))
+                # Pattern repair only; anything it cannot fix goes through the single path and its targeted re-prompts
+                result = repair_extraction(result, text, list(fields))
+                if isinstance(result, list) and is_valid(validate_extraction(result, text)):
+                    if not future.done():
+                        future.set_result(result)
+                else:
+                    retries.append(item)
+
+            if retries:
+                logging.warning(f'Demultiplexing failed for {len(retries)} of {len(items)} batched requests, retrying individually')
+                batch_fallbacks.inc(len(retries))
+                await asyncio.gather(*(self._run_single(item) for item in retries))
+
+    async def _run_single(self, item):
+        text, fields, future = item
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(None, self.single_fn, text, fields)
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
@@ -0,0 +1,80 @@
+import logging
+import os
+import random
+import threading
+import time
+
+from llms.extraction import generate_content_from_model
+from llms.metrics import LATENCY_BUCKETS, metrics
+from llms.ollama.client import btb_ollama_model
+from llms.validation import is_valid, validate_extraction
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Ordered model tiers, smallest first, e.g. "qwen2.5:1.5b,mistral". Defaults to the single configured model.
+btb_cascade_models = [model.strip() for model in os.getenv('BTB_CASCADE_MODELS', '').split(',') if model.strip()] or [btb_ollama_model]
+# Texts longer than this skip the small tiers, since multi-bet segments rarely pass on a small model
+btb_cascade_max_text_chars = int(os.getenv('BTB_CASCADE_MAX_TEXT_CHARS', '600'))
+# Fraction of accepted small-tier results re-run on the final tier in the background to measure accuracy
+btb_cascade_audit_rate = float(os.getenv('BTB_CASCADE_AUDIT_RATE', '0.05'))
+
+tier_latency = metrics.histogram('llm_cascade_tier_latency_seconds', 'Generation latency per cascade tier', LATENCY_BUCKETS)
+tier_results = metrics.counter('llm_cascade_tier_results_total', 'Cascade tier outcomes (accepted, escalated, exhausted)')
+validation_failures = metrics.counter('llm_cascade_validation_failures_total', 'Validation failures by model and field')
+field_agreement = metrics.counter('llm_cascade_field_agreement_total', 'Field agreement between a tier and the final tier')
+
+COMPARED_FIELDS = ("league", "away_team", "home_team", "bet_type", "odds", "stake", "payout", "outcome")
+
+def _normalize_field(value):
+    return str(value).strip().lower() if value is not None else None
+
+# Compare a lower tier's bets with the final tier's bets field by field
+def record_agreement(model: str, source: str, candidate: list, reference: list):
+    for candidate_bet, reference_bet in zip(candidate or [], reference or []):
+        if not isinstance(candidate_bet, dict) or not isinstance(reference_bet, dict):
+            continue
+        for field in COMPARED_FIELDS:
+            matched = _normalize_field(candidate_bet.get(field)) == _normalize_field(reference_bet.get(field))
+            field_agreement.inc(model=model, source=source, result='match' if matched else 'mismatch')
+
+def _audit(model: str, extracted_text: str, fields: list, accepted: list):
+    final_model = btb_cascade_models[-1]
+    reference = generate_content_from_model(extracted_text, fields, model=None if final_model == btb_ollama_model else final_model, request_type='audit')
+    if reference:
+        record_agreement(model, 'audit', accepted, reference)
+
+# Run the cheapest tier first and escalate only outputs that fail validation
+def generate_with_cascade(extracted_text: str, fields: list, request_type: str = 'single') -> list:
+    tiers = btb_cascade_models
+    if len(extracted_text) > btb_cascade_max_text_chars:
+        tiers = tiers[-1:]
+
+    rejected = []
+    parsed_data = []
+    for tier, model in enumerate(tiers):
+        start_time = time.time()
+        # The primary model is left unpinned so the router may serve it from any backend
+        parsed_data = generate_content_from_model(extracted_text, fields, model=None if model == btb_ollama_model else model, request_type=request_type)
+        tier_latency.observe(time.time() - start_time, tier=tier, model=model)
+
+        issues = validate_extraction(parsed_data, extracted_text)
+        if is_valid(issues):
+            tier_results.inc(tier=tier, model=model, result='accepted')
+            for rejected_model, rejected_data in rejected:
+                record_agreement(rejected_model, 'escalation', rejected_data, parsed_data)
+            if model != btb_cascade_models[-1] and random.random() < btb_cascade_audit_rate:
+                threading.Thread(target=_audit, args=(model, extracted_text, fields, parsed_data), daemon=True).start()
+            return parsed_data
+
+        for bet_issues in issues:
+            for field in bet_issues:
+                validation_failures.inc(model=model, field=field)
+        is_last = tier == len(tiers) - 1
+        tier_results.inc(tier=tier, model=model, result='exhausted' if is_last else 'escalated')
+        logging.warning(f'Cascade tier {tier} ({model}) failed validation: {issues}')
+        rejected.append((model, parsed_data))
+
+    # The final tier's output is returned even when it fails validation, matching the single-model behaviour
+    return parsed_data
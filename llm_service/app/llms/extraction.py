@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from llms.ollama.text_utils import split_context_for_batches
+from llms.lifecycle import record_load
+from llms.ollama.client import btb_ollama_hosts
+from llms.prompts import (btb_prompt_version, build_batch_system_prompt, build_batch_user_prompt,
+                          build_field_system_prompt, build_field_user_prompt, build_system_prompt, build_user_prompt)
+from llms.providers import build_providers
+from llms.repair import repair_extraction
+from llms.router import ProviderRouter
+from llms.segments import process_segments, progress_registry
+from llms.sizing import generation_options, token_estimator
+from llms.telemetry import record_generation, record_parse, record_retry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Segment extraction parallelism should match the total parallel slots: OLLAMA_NUM_PARALLEL per Ollama host
+btb_segment_workers = int(os.getenv('BTB_SEGMENT_WORKERS', int(os.getenv('OLLAMA_NUM_PARALLEL', '4')) * len(btb_ollama_hosts)))
+btb_segment_group_size = int(os.getenv('BTB_SEGMENT_GROUP_SIZE', '3'))
+btb_segment_retries = int(os.getenv('BTB_SEGMENT_RETRIES', '1'))
+
+# Every generation goes through the router, which picks a backend per request and fails over on errors
+router = ProviderRouter(build_providers())
+
+# Retry decorator with exponential backoff; returns an empty result once every attempt has failed
+def retry_with_backoff(retries=3, backoff_in_seconds=1):
+    def decorator(func):
+        def wrapper(*args, **kwargs):
+            for attempt in range(retries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == retries - 1:
+                        logging.error(f'Error: {e}. Giving up after {retries} attempts')
+                        break
+                    record_retry(type(e).__name__)
+                    wait = backoff_in_seconds * (2 ** attempt) + random.uniform(0, 1)
+                    logging.error(f'Error: {e}. Retrying in {wait:.2f} seconds...')
+                    time.sleep(wait)
+            return []
+        return wrapper
+    return decorator
+
+# Extract bets from slip text through whichever backend the router picks
+@retry_with_backoff(retries=3, backoff_in_seconds=2)
+def generate_content_from_model(extracted_text: str, fields: list, model: str = None, request_type: str = 'single') -> list:
+    logging.info(f'Generating content from model {model or "default"}')
+    logging.info(f'Extracted text: {extracted_text}')
+    # Static instructions and examples go in the system prefix so the backend can reuse its cached KV state
+    system_prompt = build_system_prompt(tuple(fields), btb_prompt_version)
+    user_prompt = build_user_prompt(extracted_text)
+    # Generation errors reach the retry decorator, which counts and retries them
+    response = router.generate(system_prompt, user_prompt, model=model, options=generation_options(system_prompt, user_prompt))
+    record_generation(response, request_type, btb_prompt_version)
+    token_estimator.observe(len(system_prompt) + len(user_prompt), response.get('prompt_eval_count'))
+    record_load(response)
+
+    try:
+        content = response.get('response', '')
+        # Clean up the response content by removing markdown formatting
+        cleaned_content = content.replace("<|json|>", "").replace("<|end|>", "").strip()
+        # logging.info(f'Cleaned content from batch: {cleaned_content}')
+
+        try:
+            # Try to parse the content into a list of JSON objects
+            parsed_data = json.loads(cleaned_content)
+            record_parse('ok', request_type)
+        except json.JSONDecodeError as e:
+            logging.error('Error decoding JSON response: %s. Attempting to parse partial JSON.', e)
+            parsed_data = attempt_partial_json_parsing(cleaned_content)
+            record_parse('partial' if parsed_data else 'failed', request_type)
+
+        # Broken fields are repaired from the OCR text, or re-requested on their own, instead of regenerating everything
+        parsed_data = repair_extraction(
+            parsed_data,
+            extracted_text,
+            fields,
+            reprompt=lambda text, missing, known: generate_fields_from_model(text, missing, known, model=model),
+        )
+        logging.info(f'Parsed data: {parsed_data}')
+        return parsed_data
+
+    except Exception as e:
+        logging.error(f"Error generating content from model: {e}")
+        return []
+
+# Extract several small slips in one call; returns the model's {request index: bets} mapping
+def generate_batch_from_model(extracted_texts: list, fields: list, model: str = None) -> dict:
+    logging.info(f'Generating batched content for {len(extracted_texts)} requests from model {model or "default"}')
+    system_prompt = build_batch_system_prompt(tuple(fields), btb_prompt_version)
+    user_prompt = build_batch_user_prompt(extracted_texts)
+    response = router.generate(
+        system_prompt,
+        user_prompt,
+        model=model,
+        json_mode=True,
+        options=generation_options(system_prompt, user_prompt),
+    )
+    record_generation(response, 'batch', btb_prompt_version)
+    token_estimator.observe(len(system_prompt) + len(user_prompt), response.get('prompt_eval_count'))
+    record_load(response)
+
+    try:
+        parsed_data = json.loads(response.get('response', ''))
+    except json.JSONDecodeError:
+        record_parse('failed', 'batch')
+        raise
+    record_parse('ok' if isinstance(parsed_data, dict) else 'failed', 'batch')
+    if not isinstance(parsed_data, dict):
+        raise ValueError(f"Expected a JSON object keyed by request index but got {type(parsed_data).__name__}")
+    return parsed_data
+
+# Re-request only the fields of one bet that could not be repaired from the OCR text
+def generate_fields_from_model(extracted_text: str, fields: list, known: dict, model: str = None) -> dict:
+    logging.info(f'Re-prompting for fields {fields}')
+    system_prompt = build_field_system_prompt(tuple(fields))
+    user_prompt = build_field_user_prompt(extracted_text, known)
+    options = generation_options(system_prompt, user_prompt)
+    # A handful of short values, not a full bet list
+    options['num_predict'] = min(options['num_predict'], 32 * len(fields) + 32)
+    response = router.generate(system_prompt, user_prompt, model=model, json_mode=True, options=options)
+    record_generation(response, 'repair', btb_prompt_version)
+    record_load(response)
+
+    try:
+        parsed_data = json.loads(response.get('response', ''))
+    except json.JSONDecodeError:
+        record_parse('failed', 'repair')
+        raise
+    record_parse('ok', 'repair')
+    return parsed_data
+
+# Recover the complete JSON objects from a truncated or otherwise malformed model response
+def attempt_partial_json_parsing(content: str) -> list:
+    decoder = json.JSONDecoder()
+    parsed_data = []
+    position = content.find('{')
+    while position != -1:
+        try:
+            value, end = decoder.raw_decode(content, position)
+        except json.JSONDecodeError:
+            position = content.find('{', position + 1)
+            continue
+        if isinstance(value, dict):
+            parsed_data.append(value)
+        position = content.find('{', end)
+    if not parsed_data:
+        logging.error('No complete JSON objects found in partial content')
+    return parsed_data
+
+# Main function to parse MGM PDF inputs
+def parse_mgm_pdf_inputs(extracted_text: str, fields: list, job_id: str = None, generate=None):
+    generate = generate or generate_content_from_model
+    logging.info('Parsing MGM PDF inputs')
+    text_segments = split_context_for_batches(extracted_text)
+
+    # Split text_segments into groups so each model call carries a few betslips
+    segment_groups = [text_segments[i:i + btb_segment_group_size] for i in range(0, len(text_segments), btb_segment_group_size)]
+    progress = progress_registry.create(len(segment_groups), job_id=job_id)
+    logging.info(f'Total segments: {progress.total}, Workers: {btb_segment_workers}')
+
+    # Each group is retried on its own so one bad segment does not sink the whole PDF
+    results = process_segments(
+        segment_groups,
+        lambda segment_group: generate(json.dumps(segment_group), fields, request_type='segment'),
+        max_workers=btb_segment_workers,
+        retries=btb_segment_retries,
+        progress=progress,
+    )
+
+    all_data = []
+    for segment_group, parsed_data in zip(segment_groups, results):
+        if parsed_data:
+            logging.info('Parsed Bet Data: %s', parsed_data)
+            all_data.extend(parsed_data)
+        else:
+            logging.error('Failed to process segment group %s', segment_group)
+
+    # Check if the number of betslips matches the number of output bets
+    num_betslips = len(re.findall(r'Betslip ID:', extracted_text, re.IGNORECASE)) or len(text_segments)
+    num_output_bets = len(all_data)
+    if num_betslips != num_output_bets:
+        logging.warning('Mismatch between number of betslips (%d) and output bets (%d)', num_betslips, num_output_bets)
+    else:
+        logging.info('Number of betslips matches the number of output bets')
+
+    logging.info(str(progress))
+    logging.info('All parsed data: %s', all_data)
+    return all_data
+
+# Example test call to mimic behavior against the configured backends
+if __name__ == "__main__":
+    extracted_text = """ 
+ Betslip ID: 1ZR948E37C
+ Result:Under 35.5
+ Los Angeles Chargers at Pittsburgh Steelers
+ 9/22/24 • 12:00 PM
+ Bet placement Stake Odds Payout (inc Stake)
+ 9/20/24 • 1:52 PM $37.50 -110 $71.59WON
+ Under 35.5Totals
+"""
+    start_time = time.time()
+    logging.info('Start time: %s', start_time)
+    try:
+        x = parse_mgm_pdf_inputs(extracted_text, ['bet_id', 'result', 'away_team', 'home_team', 'date', 'stake', 'odds', 'payout'])
+        logging.info('Parsed data: %s', x)
+    except Exception as e:
+        logging.error('Error occurred: %s', str(e))
+    finally:
+        end_time = time.time()
+        logging.info('Time elapsed: %s seconds', end_time - start_time)
\ No newline at end of file
@@ -1,25 +1,52 @@
-import os
 import json
-from decimal import Decimal
-from datetime import datetime
-from typing import Optional
-from dotenv import load_dotenv
-import google.generativeai as genai
+import logging
+import os
+import random
 import re
-import uuid
+import threading
 import time
+from functools import lru_cache
+from dotenv import load_dotenv
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from llms.ollama.text_utils import split_context_for_batches
+from llms.prompts import btb_prompt_version, build_system_prompt, build_user_prompt
+from llms.repair import repair_extraction
+from llms.segments import process_segments, progress_registry
+from llms.telemetry import record_generation, record_parse, record_retry
+from service_models.models import BetExtractionDetails
 
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
 
 # Load environment variables
 load_dotenv()
 
+btb_gemini_model = os.getenv('BTB_GEMINI_MODEL', 'gemini-1.5-flash')
+# REST endpoint override, e.g. http://localhost:11435 to run against the local stand-in
+btb_gemini_api_endpoint = os.getenv('BTB_GEMINI_API_ENDPOINT')
+# Segments in flight at once; keep below the project's requests-per-minute quota
+btb_gemini_max_concurrency = int(os.getenv('BTB_GEMINI_MAX_CONCURRENCY', '4'))
+btb_gemini_max_retries = int(os.getenv('BTB_GEMINI_MAX_RETRIES', '5'))
+btb_gemini_backoff_seconds = float(os.getenv('BTB_GEMINI_BACKOFF_SECONDS', '1'))
+btb_gemini_max_backoff_seconds = float(os.getenv('BTB_GEMINI_MAX_BACKOFF_SECONDS', '60'))
+
 # Check if GOOGLE_API_KEY is set
-api_key = os.getenv("GOOGLE_API_KEY")
+api_key = os.getenv("GOOGLE_API_KEY") or ('standin' if btb_gemini_api_endpoint else None)
 if not api_key:
     raise ValueError("GOOGLE_API_KEY environment variable not set")
 
 # Configure the Google Generative AI client
-genai.configure(api_key=api_key)
+if btb_gemini_api_endpoint:
+    genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': btb_gemini_api_endpoint})
+else:
+    genai.configure(api_key=api_key)
+
+DEFAULT_FIELDS = tuple(BetExtractionDetails.model_fields.keys())
+RETRY_DELAY_PATTERN = re.compile(r'retry_?delay\D{0,20}?(\d+(?:\.\d+)?)', re.IGNORECASE)
+RATE_LIMIT_ERRORS = (google_exceptions.TooManyRequests, google_exceptions.ServiceUnavailable)
 
 # Preprocessing function to clean OCR text
 def preprocess_text(text: str) -> str:
@@ -35,296 +62,109 @@ def preprocess_text(text: str) -> str:
     # Additional corrections as needed
     return text
 
-# Improved function to generate content from LLM for multiple bets
-def generate_content_from_model(extracted_text: str) -> list:
-    # Define the schema based on the Pydantic model
-    output_json_template = {
-        "user_id": "Nate",
-        "bet_id": str(uuid.uuid4()),
-        "upload_timestamp": str(datetime.utcnow()),
-        "league": None,
-        "season": None,
-        "date": None,
-        "game_id": None,
-        "away_team": None,
-        "home_team": None,
-        "wager_team": None,
-        "bet_type": None,
-        "selection": None,
-        "odds": None,
-        "risk": None,
-        "to_win": None,
-        "payout": None,
-        "outcome": None,
-        "profit_loss": None
-    }
+# Shared backoff for quota errors: one 429 pauses every worker, so concurrent segments do not keep hammering the quota
+class RateLimitBackoff:
+    def __init__(self, base_seconds: float = btb_gemini_backoff_seconds, max_seconds: float = btb_gemini_max_backoff_seconds):
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        delay = self.paused_until - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    # Honour the server's retry delay when it sends one, otherwise back off exponentially with jitter
+    def penalize(self, attempt: int, error: Exception) -> float:
+        match = RETRY_DELAY_PATTERN.search(f'{error} {getattr(error, "details", "")}')
+        delay = float(match.group(1)) if match else self.base_seconds * (2 ** attempt)
+        delay = min(delay, self.max_seconds) + random.uniform(0, self.base_seconds)
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.time() + delay)
+        return delay
+
+rate_limit_backoff = RateLimitBackoff()
+
+# One model instance per (model, fields): the static instructions live in system_instruction and are sent
+# byte-identically on every call, instead of rebuilding the model and the prompt per segment
+@lru_cache(maxsize=16)
+def get_model(model_name: str, fields: tuple) -> genai.GenerativeModel:
+    return genai.GenerativeModel(
+        model_name,
+        system_instruction=build_system_prompt(fields, btb_prompt_version),
+        generation_config=genai.GenerationConfig(response_mime_type="application/json"),
+    )
 
+def generate_with_backoff(model: genai.GenerativeModel, prompt: str):
+    for attempt in range(btb_gemini_max_retries + 1):
+        rate_limit_backoff.wait()
+        try:
+            return model.generate_content(prompt)
+        except RATE_LIMIT_ERRORS as e:
+            if attempt == btb_gemini_max_retries:
+                raise
+            record_retry('rate_limit')
+            delay = rate_limit_backoff.penalize(attempt, e)
+            logging.warning(f'Gemini rate limited ({e.__class__.__name__}), pausing requests for {delay:.1f}s')
+
+# Extract the bets in one slip segment with a single Gemini request
+def generate_content_from_model(extracted_text: str, fields: list = None, model_name: str = btb_gemini_model) -> list:
+    fields = tuple(fields or DEFAULT_FIELDS)
+    # Preprocess the extracted text to correct common OCR errors
+    cleaned_text = preprocess_text(extracted_text)
+    model = get_model(model_name, fields)
+
+    start_time = time.time()
     try:
-        # Preprocess the extracted text to correct common OCR errors
-        cleaned_text = preprocess_text(extracted_text)
-
-        # Initialize the model
-        model = genai.GenerativeModel('gemini-1.5-pro-002')
-
-        # Enhanced Prompt Structure
-        prompt = f"""
-        You are a highly capable model tasked with parsing betting slip information. The text may contain OCR errors.
-        Please extract the relevant information for each bet from the following text and populate a list of JSON objects based on the schema provided.
-
-        Important Instructions:
-        - Dollar signs ($) might be misread as 'S'. Make corrections where applicable.
-        - Match the fields to the correct types. For example:
-          - "outcome" must be one of ['WON', 'LOST', 'PUSH', 'PENDING'].
-          - "bet_type" must be one of ['Moneyline', 'Spread', 'Totals', 'Prop', 'Future', 'Other'].
-        - Multiple monetary values may be present. Distinguish between "risk", "payout", and "to_win".
-        - Use the context of words like 'BET', 'PAYOUT', 'Settled' to determine appropriate values.
-        - Dates are in the format 'MMM DD, YYYY at HH:MM AM/PM' in most cases.
-        - Extract all bets if there are multiple in the text.
-
-        **Text:**
-        "{cleaned_text}"
-
-        **Schema Template:**
-        {json.dumps(output_json_template, indent=2)}
-
-        Ensure each JSON object is valid and accurately fills in all the fields based on the given text. If any field cannot be determined, leave it as null.
-
-        Example:
-        Given a similar text input, here is how the JSON should be structured:
-        [
-          {{
-            "user_id": "Nate",
-            "bet_id": "ABCDEFGHIJKL",
-            "upload_timestamp": "2024-09-15T13:00:00",
-            "league": "NFL",
-            "season": 2024,
-            "date": "2024-09-22T15:25:00",
-            "game_id": "GAME12345",
-            "away_team": "BAL Ravens",
-            "home_team": "DAL Cowboys",
-            "wager_team": "BAL Ravens",
-            "bet_type": "Totals",
-            "selection": "Over 23.5",
-            "odds": "-120",
-            "risk": "61.21",
-            "to_win": "51.01",
-            "payout": "112.22",
-            "outcome": "WON",
-            "profit_loss": "51.01"
-          }}
-        ]
-
-        Please output the resulting list of JSON objects without additional commentary.
-        """
-        # print(prompt)
-
-        # Generate content from LLM
-        response = model.generate_content(prompt)
-
-        # Extract the content from the response object (adjust this based on actual response structure)
-        if hasattr(response, 'text'):
-            content = response.text
-        else:
-            content = str(response)
-        # print(content)
-        # Clean up the response content by removing markdown formatting
-        cleaned_content = content.replace("```json", "").replace("```", "").strip()
-
+        response = generate_with_backoff(model, build_user_prompt(cleaned_text))
+        content = response.text
     except Exception as e:
         raise RuntimeError(f"Failed to get a response from LLM: {str(e)}")
 
-    # Handling response and JSON parsing
+    usage = getattr(response, 'usage_metadata', None)
+    record_generation({
+        "model": model_name,
+        "provider": "gemini",
+        "total_duration": int((time.time() - start_time) * 1e9),
+        "prompt_eval_count": getattr(usage, 'prompt_token_count', 0),
+        "eval_count": getattr(usage, 'candidates_token_count', 0),
+    }, 'segment', btb_prompt_version)
+
+    # Clean up the response content by removing markdown formatting
+    cleaned_content = content.replace("```json", "").replace("```", "").strip()
     try:
-        # Attempt to parse the cleaned response content as a list of JSON objects
         parsed_data = json.loads(cleaned_content)
     except json.JSONDecodeError as e:
+        record_parse('failed', 'segment')
         raise ValueError(f"Failed to parse the response as JSON: {str(e)}")
+    record_parse('ok', 'segment')
 
-    # Validate parsed data to ensure critical fields are populated correctly for each bet
-    validated_data = [validate_and_correct_output(bet, cleaned_text) for bet in parsed_data]
-
-    return validated_data
-
-# Function to validate and correct the LLM output
-def validate_and_correct_output(parsed_data: dict, original_text: str) -> dict:
-    # List of fields that must not be null
-    critical_fields = ["bet_id", "bet_type", "risk", "odds", "away_team", "home_team", "date"]
-
-    # Iterate over the critical fields and check if they are filled
-    for field in critical_fields:
-        if parsed_data.get(field) is None:
-            # If the field is missing, try re-extracting using regex or add a placeholder for later correction
-            parsed_data[field] = extract_fallback_field(field, original_text)
-
-    # Convert specific fields to correct types
-    if parsed_data.get("risk"):
-        parsed_data["risk"] = str(parsed_data["risk"])
-    if parsed_data.get("to_win"):
-        parsed_data["to_win"] = str(parsed_data["to_win"])
-    if parsed_data.get("payout"):
-        parsed_data["payout"] = str(parsed_data["payout"])
-    if parsed_data.get("profit_loss"):
-        try:
-            parsed_data["profit_loss"] = Decimal(parsed_data["profit_loss"])
-        except:
-            parsed_data["profit_loss"] = None  # Set to None if it can't be converted
+    # Fill broken fields from the OCR text rather than paying for another request
+    return repair_extraction(parsed_data, cleaned_text, list(fields))
 
-    return parsed_data
-
-# Fallback extraction function using regex
-def extract_fallback_field(field_name: str, text: str) -> Optional[str]:
-    if field_name in ["risk", "to_win", "payout"]:
-        # Extract the first occurrence of a dollar amount as a fallback
-        match = re.search(r'\$\d+(\.\d{2})?', text)
-        if match:
-            return match.group().replace('$', '')
-    elif field_name in ["away_team", "home_team"]:
-        # Attempt to extract team names based on common patterns
-        teams = re.findall(r'\b[A-Z]{3,}\s[A-Za-z]+\b', text)
-        if teams:
-            if field_name == "away_team":
-                return teams[0]
-            elif len(teams) > 1:
-                return teams[1]
-    # Additional fallback logic for other fields as needed
-    return None
-
-# Function to split context into manageable batches while avoiding splits within betslips
-def split_context_for_batches(text: str, model_name: str = 'gemini-1.5-flash', max_chunk_size: int = 1000) -> list:
-    """
-    Uses the Gemini Pro model to split input text into manageable, logical batches while avoiding splits within individual betslips.
-
-    Parameters:
-    - text (str): The entire input text to be split.
-    - model_name (str): The Gemini model to be used for splitting.
-    - max_chunk_size (int): The maximum number of characters per chunk.
-
-    Returns:
-    - List of text segments, each containing logically grouped bet information.
-    """
-    # Helper function to split text into chunks but avoid breaking betslips
-    def chunk_text_safely(text, chunk_size):
-        betslip_pattern = re.compile(r"(Betslip ID: \w+)", re.IGNORECASE)
-        chunks = []
-        current_chunk = ""
-        for line in text.splitlines():
-            # If the line starts a new betslip and the current chunk is already large enough
-            if betslip_pattern.match(line) and len(current_chunk) + len(line) > chunk_size:
-                chunks.append(current_chunk)
-                current_chunk = line  # Start a new chunk
-            else:
-                current_chunk += "\n" + line
-
-        # Add any remaining text to chunks
-        if current_chunk:
-            chunks.append(current_chunk)
-        return chunks
-
-    # Initialize the model
-    model = genai.GenerativeModel(model_name)
-
-    batches = []
-    
-    # Safely chunk the text
-    chunks = chunk_text_safely(text, max_chunk_size)
-    
-    for chunk in chunks:
-        # Use a minimal, token-efficient prompt
-        prompt = f"""
-        Split the following text into logical sections based on individual betslips. Do not add or modify any content. Each section must contain the full details of a single betslip without splitting information across batches.
-
-        Text:
-        {chunk}
-        """
-        result = model.generate_content(
-            prompt,
-            generation_config=genai.GenerationConfig(
-                response_mime_type="application/json",
-                response_schema=list[str]
-            )
-        )
-        try:
-            batch = json.loads(result.text)
-            batches.extend(batch)
-        except json.JSONDecodeError as e:
-            print(f"Error decoding JSON response: {e}")
-            continue
-    
-    return batches
-
-# Function to process each batch using a smaller model (e.g., Gemini Flash)
-def parse_bet_data_with_flash_model(batch: str, model_name: str = 'gemini-1.5-flash') -> dict:
-    """
-    Sends a batch to the Gemini Flash model for processing.
-
-    Parameters:
-    - batch (str): The text batch to be processed.
-    - model_name (str): The Gemini model to be used for parsing.
-
-    Returns:
-    - Parsed response from the Flash model.
-    """
-    # Initialize the model
-    model = genai.GenerativeModel(model_name)
-
-    # Prepare the prompt for parsing the batch
-    prompt = f"""
-    You will now process the following batch of bet information:
-
-    **Batch Segment:**
-    "{batch}"
-
-    Extract bet details in JSON format using the following schema:
-    {{
-      "user_id": "Nate",
-      "bet_id": "<unique-identifier>",
-      "upload_timestamp": "<timestamp>",
-      "league": "<league-name>",
-      "season": "<season-year>",
-      "date": "<bet-date>",
-      "game_id": "<game-id>",
-      "away_team": "<team-name>",
-      "home_team": "<team-name>",
-      "wager_team": "<team-name>",
-      "bet_type": "<bet-type>",
-      "selection": "<bet-selection>",
-      "odds": "<odds>",
-      "risk": "<risk-amount>",
-      "to_win": "<to-win-amount>",
-      "payout": "<payout-amount>",
-      "outcome": "<outcome-status>",
-      "profit_loss": "<profit-or-loss>"
-    }}
-    """
-
-    response = model.generate_content(
-        prompt,
-        generation_config=genai.GenerationConfig(
-            response_mime_type="application/json"
-        )
+# Split locally, then parse segments concurrently: one Gemini request per segment and no splitting round trips
+def parse_mgm_pdf_inputs(extracted_text: str, fields: list = None, job_id: str = None, model_name: str = btb_gemini_model) -> list:
+    start_time = time.time()
+    text_segments = split_context_for_batches(extracted_text)
+    progress = progress_registry.create(len(text_segments), job_id=job_id)
+    logging.info(f'Total segments: {progress.total}, concurrency: {btb_gemini_max_concurrency}')
+
+    results = process_segments(
+        text_segments,
+        lambda segment: generate_content_from_model(segment, fields, model_name),
+        max_workers=btb_gemini_max_concurrency,
+        progress=progress,
     )
-    try:
-        return json.loads(response.text)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON response: {e}")
-        return {}
 
-import concurrent.futures
-def parse_mgm_pdf_inputs(extracted_text: str): # Extracted text from the PDF
-    # Step 1: Use the Pro model to create batches
-    text_segments = split_context_for_batches(extracted_text)
-    # print(text_segments)
     all_data = []
+    for segment, parsed_data in zip(text_segments, results):
+        if parsed_data:
+            all_data.extend(parsed_data if isinstance(parsed_data, list) else [parsed_data])
+        else:
+            logging.error(f'Failed to process segment {segment}')
 
-    for i, segment in enumerate(text_segments):
-        parsed_data = parse_bet_data_with_flash_model(segment)
-        print(parsed_data)
-        cleaned_data = validate_and_correct_output(parsed_data, segment)
-        try:
-            print("Parsed Bet Data:", cleaned_data)  # Here you can save the parsed data to your database or take further action
-            all_data.append(parsed_data)
-        except Exception as e:
-            print(f"Error processing segment {segment}: {e}")
+    logging.info(f'Parsed {len(all_data)} bets from {len(text_segments)} segments in {time.time() - start_time:.2f}s; {progress}')
     return all_data
 
 # Example Usage
@@ -667,4 +507,4 @@ https://sports.ia.betmgm.com/en/sports/my-bets/settled 11/11
     """
 
     x = parse_mgm_pdf_inputs(extracted_text)
-    print(x)
\ No newline at end of file
+    logging.info(f'Parsed data: {x}')
\ No newline at end of file
@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+
+from llms.metrics import metrics
+from llms.sizing import btb_min_num_ctx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# How often loaded models are pinged so Ollama never evicts them between requests
+btb_keep_alive_interval = float(os.getenv('BTB_KEEP_ALIVE_INTERVAL_SECONDS', '300'))
+# A load taking longer than this means the model had to be read back into memory
+btb_cold_load_threshold_ms = float(os.getenv('BTB_COLD_LOAD_THRESHOLD_MS', '1000'))
+btb_startup_max_backoff = float(os.getenv('BTB_STARTUP_MAX_BACKOFF_SECONDS', '30'))
+# How often Ollama hosts are probed for health and loaded models
+btb_health_check_interval = float(os.getenv('BTB_HEALTH_CHECK_INTERVAL_SECONDS', '10'))
+
+time_to_ready = metrics.gauge('llm_time_to_ready_seconds', 'Seconds from process start until models were pulled and warm')
+model_ready = metrics.gauge('llm_model_ready', 'Whether a model is pulled and loaded (1) or not (0)')
+cold_loads = metrics.counter('llm_model_cold_loads_total', 'Generations that had to load the model into memory first')
+
+# Tracks whether startup work has finished so /ready can gate traffic
+class ServiceReadiness:
+    def __init__(self):
+        self.started_at = time.time()
+        self.ready_at = None
+        self.status = 'starting'
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    def set_status(self, status: str, error: str = None):
+        with self._lock:
+            self.status = status
+            self.error = error
+
+    def mark_ready(self):
+        with self._lock:
+            self.ready_at = time.time()
+            self.status = 'ready'
+            self.error = None
+        time_to_ready.set(self.ready_at - self.started_at)
+        logging.info(f'LLM service ready after {self.ready_at - self.started_at:.1f}s')
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "status": self.status,
+                "error": self.error,
+                "time_to_ready_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            }
+
+readiness = ServiceReadiness()
+
+# Count generations whose load time shows the model was not resident
+def record_load(response: dict):
+    load_ms = (response.get('load_duration') or 0) / 1e6
+    if load_ms > btb_cold_load_threshold_ms:
+        cold_loads.inc(model=response.get('model'), provider=response.get('provider'))
+        logging.warning(f'Cold load of {response.get("model")} took {load_ms:.0f} ms')
+
+# Pull and load every model on one Ollama host, retrying until the server is reachable
+def pull_and_warm(host, models: list, keep_alive: str, stop_event: threading.Event) -> bool:
+    backoff = 1.0
+    for model in models:
+        while not stop_event.is_set():
+            try:
+                readiness.set_status(f'pulling {model} on {host.url}')
+                logging.info(f'Pulling Ollama Model: {model} on {host.url}')
+                host.client.pull(model)
+                readiness.set_status(f'loading {model} on {host.url}')
+                # An empty prompt loads the model without generating any tokens; loading with the smallest
+                # context bucket matches single-slip requests so they do not trigger a runner reload
+                response = host.client.generate(model=model, prompt='', keep_alive=keep_alive, options={'num_ctx': btb_min_num_ctx})
+                response = response if isinstance(response, dict) else response.model_dump()
+                record_load({**response, 'provider': 'ollama'})
+                model_ready.set(1, model=model, host=host.url)
+                logging.info(f'Model {model} available on {host.url} for {keep_alive}')
+                backoff = 1.0
+                break
+            except Exception as e:
+                if not readiness.ready:
+                    readiness.set_status(f'waiting for {host.url}', str(e))
+                logging.warning(f'Ollama host {host.url} not ready for {model}: {e}. Retrying in {backoff:.0f}s')
+                stop_event.wait(backoff)
+                backoff = min(backoff * 2, btb_startup_max_backoff)
+    return not stop_event.is_set()
+
+# Refresh keep-alive on every host in rotation so warm models are never evicted
+def refresh_keep_alive(pool, models: list, keep_alive: str):
+    now = time.time()
+    for host in pool.hosts:
+        if not host.available(now):
+            continue
+        for model in models:
+            try:
+                response = host.client.generate(model=model, prompt='', keep_alive=keep_alive, options={'num_ctx': btb_min_num_ctx})
+                response = response if isinstance(response, dict) else response.model_dump()
+                record_load({**response, 'provider': 'ollama'})
+                model_ready.set(1, model=model, host=host.url)
+            except Exception as e:
+                model_ready.set(0, model=model, host=host.url)
+                logging.warning(f'Keep-alive for {model} on {host.url} failed: {e}')
+
+# Health-check pools often, re-warming hosts that come back from ejection, and refresh keep-alive less often
+def maintenance_loop(pools: list, models: list, keep_alive: str, router, stop_event: threading.Event):
+    last_keep_alive = time.time()
+    while not stop_event.wait(btb_health_check_interval):
+        for pool in pools:
+            for host in pool.refresh():
+                logging.info(f'Ollama host {host.url} answering again, re-warming before re-entry')
+                if pull_and_warm(host, models, keep_alive, stop_event):
+                    pool.mark_warm(host, models)
+        if time.time() - last_keep_alive >= btb_keep_alive_interval:
+            for pool in pools:
+                refresh_keep_alive(pool, models, keep_alive)
+            last_keep_alive = time.time()
+        router.refresh_health()
+
+# Pull/warm in the background so the HTTP server binds immediately, then keep models resident.
+# The service is ready as soon as any one host is warm; slower hosts join the pool when they finish.
+def start_background_tasks(router, models: list, keep_alive: str) -> threading.Event:
+    from llms.ollama.client import OllamaProvider
+
+    stop_event = threading.Event()
+    pools = [provider.pool for provider in router.providers if isinstance(provider, OllamaProvider)]
+
+    def warm_host(pool, host):
+        if pull_and_warm(host, models, keep_alive, stop_event):
+            pool.mark_warm(host, models)
+            if not readiness.ready:
+                readiness.mark_ready()
+
+    for pool in pools:
+        for host in pool.hosts:
+            threading.Thread(target=warm_host, args=(pool, host), name=f'llm-warm-{host.url}', daemon=True).start()
+    if not pools:
+        router.refresh_health()
+        readiness.mark_ready()
+
+    threading.Thread(target=maintenance_loop, args=(pools, models, keep_alive, router, stop_event),
+                     name='llm-maintenance', daemon=True).start()
+    return stop_event
@@ -1,38 +1,27 @@
+import logging
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
+from llms.prompts import build_system_prompt, build_user_prompt
+from llms.providers import NIMProvider
 
 # Load environment variables
 load_dotenv()
 
-# Check if NVIDIA_API_KEY is set
-api_key = os.getenv("NVIDIA_API_KEY")
-if not api_key:
+# Check if NVIDIA_API_KEY is set (not needed when BTB_NIM_BASE_URL points at a local stand-in)
+if not os.getenv("NVIDIA_API_KEY") and not os.getenv("BTB_NIM_BASE_URL"):
     raise ValueError("NVIDIA_API_KEY environment variable not set")
 
-# Configure the NVIDIA OpenAI client
-client = OpenAI(
-    base_url="https://integrate.api.nvidia.com/v1",
-    api_key=api_key
-)
+# NVIDIA NIM through the shared OpenAI-compatible provider
+provider = NIMProvider()
 
-def generate_content_from_model(prompt: str):
+def generate_content_from_model(extracted_text: str, fields: list) -> str:
     try:
-        completion = client.chat.completions.create(
-        model="nvidia/llama-3.1-nemotron-51b-instruct",
-                    messages=[{"role": "user", "content": prompt}],
-        temperature=0.5,
-        top_p=1,
-        max_tokens=1024,
-        stream=True
-        )
-        for chunk in completion:
-            if chunk.choices[0].delta.content is not None:
-                print(chunk.choices[0].delta.content, end="")
+        response = provider.generate(build_system_prompt(tuple(fields)), build_user_prompt(extracted_text))
+        return response['response']
     except Exception as e:
-        print(f"An error occurred: {e}")
-
-
+        logging.error(f'NIM request failed: {e}')
+        raise RuntimeError(f"Failed to get a response from LLM: {str(e)}")
 
 if __name__ == "__main__":
-    generate_content_from_model("hello")
+    print(generate_content_from_model("Under 62.5 . Totals WON Result Under 62.5 Mississippi at LSU 10/12/24 6.30 PM Stake Odds Payout (inc Stake) 525.00 -110 547.73 Details",
+                                      ['bet_id', 'away_team', 'home_team', 'odds', 'stake', 'payout', 'outcome']))
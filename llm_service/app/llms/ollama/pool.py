@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+import time
+from ollama import Client
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Consecutive failures before a host is ejected, how long it stays out, and the ramp-up after it returns
+btb_ollama_ejection_threshold = int(os.getenv('BTB_OLLAMA_EJECTION_THRESHOLD', '3'))
+btb_ollama_ejection_seconds = float(os.getenv('BTB_OLLAMA_EJECTION_SECONDS', '30'))
+btb_ollama_slow_start_seconds = float(os.getenv('BTB_OLLAMA_SLOW_START_SECONDS', '60'))
+
+class OllamaHost:
+    def __init__(self, url: str):
+        self.url = url
+        self.client = Client(host=url)
+        self.in_flight = 0
+        self.loaded_models = set()
+        self.warm = False
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.entered_at = 0.0
+
+    def available(self, now: float) -> bool:
+        return self.warm and now >= self.ejected_until
+
+    # Share of normal traffic a host takes while slow-starting after (re-)entry, ramping from 10% to 100%
+    def weight(self, now: float, slow_start_seconds: float) -> float:
+        if slow_start_seconds <= 0:
+            return 1.0
+        return min(1.0, max(0.1, (now - self.entered_at) / slow_start_seconds))
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available(now),
+            "warm": self.warm,
+            "in_flight": self.in_flight,
+            "loaded_models": sorted(self.loaded_models),
+            "consecutive_failures": self.consecutive_failures,
+            "ejected_for_seconds": max(0.0, round(self.ejected_until - now, 1)),
+        }
+
+# Spreads generations over several Ollama servers, preferring hosts that already have the model loaded
+class OllamaHostPool:
+    def __init__(self, urls: list, ejection_threshold: int = btb_ollama_ejection_threshold,
+                 ejection_seconds: float = btb_ollama_ejection_seconds, slow_start_seconds: float = btb_ollama_slow_start_seconds):
+        self.hosts = [OllamaHost(url) for url in urls]
+        self.ejection_threshold = ejection_threshold
+        self.ejection_seconds = ejection_seconds
+        self.slow_start_seconds = slow_start_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return sum(host.in_flight for host in self.hosts)
+
+    # Order usable hosts for a request: warm-for-this-model first, then by in-flight load scaled by slow-start weight
+    def candidates(self, model: str) -> list:
+        now = time.time()
+        with self._lock:
+            hosts = [host for host in self.hosts if host.available(now)]
+            if not hosts:
+                # Nothing is known-good; let the caller try every host rather than fail outright
+                hosts = list(self.hosts)
+            return sorted(hosts, key=lambda host: (model not in host.loaded_models,
+                                                   (host.in_flight + 1) / host.weight(now, self.slow_start_seconds)))
+
+    def acquire(self, host: OllamaHost):
+        with self._lock:
+            host.in_flight += 1
+
+    def release(self, host: OllamaHost, succeeded: bool, model: str = None):
+        with self._lock:
+            host.in_flight -= 1
+            if succeeded:
+                host.consecutive_failures = 0
+                if model:
+                    host.loaded_models.add(model)
+                return
+            self._record_failure(host)
+
+    # Callers hold the lock
+    def _record_failure(self, host: OllamaHost):
+        host.consecutive_failures += 1
+        if host.consecutive_failures >= self.ejection_threshold and time.time() >= host.ejected_until:
+            host.ejected_until = time.time() + self.ejection_seconds
+            host.loaded_models.clear()
+            logging.warning(f'Ejecting Ollama host {host.url} for {self.ejection_seconds}s')
+
+    # Record a host as warm; a host returning from ejection slow-starts
+    def mark_warm(self, host: OllamaHost, models: list):
+        with self._lock:
+            host.warm = True
+            host.consecutive_failures = 0
+            host.ejected_until = 0.0
+            host.entered_at = time.time()
+            host.loaded_models.update(models)
+        logging.info(f'Ollama host {host.url} in rotation with {sorted(host.loaded_models)}')
+
+    # Poll each host for loaded models; unreachable hosts count failures toward ejection.
+    # Returns ejected hosts that answer again so the caller can re-warm them before they re-enter.
+    def refresh(self) -> list:
+        returned = []
+        for host in self.hosts:
+            try:
+                response = host.client.ps()
+                models = response.get('models') or []
+                loaded = {model.get('model') or model.get('name') for model in models}
+                # Ollama reports tags in full ("mistral:latest"); keep the bare name too so lookups match config
+                loaded |= {name.split(':')[0] for name in loaded if name and name.endswith(':latest')}
+                with self._lock:
+                    was_ejected = host.warm and time.time() < host.ejected_until
+                    host.loaded_models = {name for name in loaded if name}
+                    if not was_ejected:
+                        host.consecutive_failures = 0
+                if was_ejected:
+                    returned.append(host)
+            except Exception as e:
+                logging.warning(f'Health check failed for Ollama host {host.url}: {e}')
+                with self._lock:
+                    self._record_failure(host)
+        return returned
+
+    def snapshot(self) -> list:
+        now = time.time()
+        with self._lock:
+            return [host.snapshot(now) for host in self.hosts]
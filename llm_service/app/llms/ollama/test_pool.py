@@ -0,0 +1,40 @@
+import time
+import unittest
+
+from llms.ollama.pool import OllamaHostPool
+
+class TestOllamaHostPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = OllamaHostPool(["http://a:11434", "http://b:11434"], ejection_threshold=2,
+                                   ejection_seconds=60, slow_start_seconds=0)
+        self.a, self.b = self.pool.hosts
+        for host in self.pool.hosts:
+            self.pool.mark_warm(host, [])
+
+    def test_prefers_warm_model_then_fewest_in_flight(self):
+        self.b.loaded_models.add("mistral")
+        self.assertIs(self.pool.candidates("mistral")[0], self.b)
+
+        self.pool.acquire(self.a)
+        self.assertIs(self.pool.candidates("qwen2.5")[0], self.b)
+
+    def test_repeated_failures_eject_host(self):
+        for _ in range(2):
+            self.pool.acquire(self.a)
+            self.pool.release(self.a, False)
+
+        self.assertEqual(self.pool.candidates("mistral"), [self.b])
+
+    def test_returning_host_slow_starts(self):
+        self.pool.slow_start_seconds = 60
+        self.pool.mark_warm(self.a, ["mistral"])
+        self.b.entered_at = time.time() - 120
+        self.b.loaded_models.add("mistral")
+        self.pool.acquire(self.b)
+
+        # b carries one request at full weight, a is idle but only at 10% weight
+        self.assertIs(self.pool.candidates("mistral")[0], self.b)
+
+if __name__ == '__main__':
+    unittest.main()
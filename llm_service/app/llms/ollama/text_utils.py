@@ -5,25 +5,6 @@ import logging
 logging.basicConfig(level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Fallback extraction function using regex
-def extract_fallback_field(field_name: str, text: str) -> str:
-    logging.info('Extracting fallback field for %s', field_name)
-    # Define context-based regex for different fields
-    if field_name == "risk":
-        match = re.search(r'(Stake\s+|\bRisk\b)\$?(\d+(\.\d{2})?)', text, re.IGNORECASE)
-    elif field_name == "to_win":
-        match = re.search(r'Payout\s+\(inc Stake\)\s+\$?(\d+(\.\d{2})?)', text, re.IGNORECASE)
-    elif field_name == "payout":
-        match = re.search(r'Payout\s+\$?(\d+(\.\d{2})?)', text, re.IGNORECASE)
-    elif field_name in ["away_team", "home_team"]:
-        teams = re.findall(r'\b[A-Z][a-z]+\s(?:[A-Z][a-z]+\s)*[A-Z][a-z]+\b', text)  # Match team names
-        if teams:
-            return teams[0] if field_name == "away_team" else (teams[1] if len(teams) > 1 else None)
-    else:
-        match = None
-
-    return match.group(2) if match else None
-
 # Function to split context into manageable batches while avoiding splits within betslips
 def split_context_for_batches(text: str, max_chunk_size: int = 10) -> list:
     logging.info('Splitting context into batches')
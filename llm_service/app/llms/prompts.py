@@ -0,0 +1,113 @@
+import json
+import os
+from functools import lru_cache
+
+# Prompt templates are versioned so prompt-eval cost and accuracy can be compared between revisions.
+# Everything static lives in the system prefix; only the slip text changes per request, which keeps the
+# prefix byte-identical across calls so the backend's KV/prefix cache can reuse it.
+btb_prompt_version = os.getenv('BTB_PROMPT_VERSION', 'v2')
+
+# Worked examples shared by the templates, keyed by BetExtractionDetails field names
+PROMPT_EXAMPLES = [
+    {
+        "text": "Under 21 Ist Half Totals LOST Result Over 21 New Orleans Saints at Atlanta Falcons 9/29/24 12.02 PM Stake Odds Payout (inc Stake) 550.00 -130 Details",
+        "output": {
+            "bet_id": None, "result": "Over 21", "league": "NFL", "date": "9/29/24 12:02 PM",
+            "away_team": "New Orleans Saints", "home_team": "Atlanta Falcons", "wager_team": None,
+            "bet_type": "Totals", "selection": "Under 21 1st Half Totals", "odds": "-130",
+            "stake": "50.00", "payout": "0.00", "outcome": "LOST",
+        },
+    },
+    {
+        "text": "Arkansas +5.5 Spread WON Result Arkansas +5.5 Arkansas at Texas A&M (Neutral Venue) 9/28/24 2.30 PM Stake Odds Payout (inc Stake) 515.00 -105 529.29 Details",
+        "output": {
+            "bet_id": None, "result": "Arkansas +5.5", "league": "NCAAF", "date": "9/28/24 2:30 PM",
+            "away_team": "Arkansas", "home_team": "Texas A&M", "wager_team": "Arkansas",
+            "bet_type": "Spread", "selection": "Arkansas +5.5", "odds": "-105",
+            "stake": "15.00", "payout": "29.29", "outcome": "WON",
+        },
+    },
+]
+
+PROMPT_TEMPLATES = {
+    # Original long-form instructions, kept for A/B comparison of prompt-eval time
+    'v1': {
+        "instructions": """You are a highly capable model tasked with parsing betting slip information. The text may contain OCR errors.
+Please extract the relevant information for each bet from the following text and populate a list of JSON objects based on the schema provided.
+
+Important Instructions:
+- Dollar signs ($) might be misread as 'S' or '5'. Make corrections where applicable. There won't be bets greater than $100, so any value above that should be assumed to be an OCR error.
+- Match the fields to the correct types. For example:
+    - "outcome" must be one of ['WON', 'LOST', 'PUSH', 'PENDING'].
+- Multiple monetary values may be present. Distinguish between "risk", "payout", and "to_win".
+- Use the context of words like 'BET', 'PAYOUT', 'Settled' to determine appropriate values.
+- Dates are in the format 'MMM DD, YYYY at HH:MM AM/PM' in most cases.
+- Extract all bets if there are multiple in the text.
+
+Extract the following fields into valid JSON format:
+{schema}""",
+        "example": "\n\nExample Input:\n{text}\n\nExample Output:\n{output}",
+        "footer": "\n\nDo not add any additional text, commentary, or formatting. Ensure the JSON is fully compliant and properly formatted.",
+        "indent": 2,
+    },
+    # Compact rules and one-line examples, about two thirds the size of v1
+    'v2': {
+        "instructions": """Parse sportsbook betting slip text (OCR output, may contain errors) into JSON.
+Reply with only a JSON list holding one object per bet, using exactly these keys:
+{schema}
+Rules:
+- outcome is one of WON, LOST, PUSH, PENDING.
+- bet_type is one of Moneyline, Spread, Totals, Prop, Future, Other.
+- OCR may read "$" as "S" or "5", so "525.00" means 25.00. Stakes above 100 are OCR errors.
+- stake is the amount risked; payout includes the stake and is "0.00" for a lost bet.
+- odds keep their sign, e.g. "-110" or "+150".
+- Use null for anything not in the text.""",
+        "example": "\nText: {text}\nJSON: {output}",
+        "footer": "",
+        "indent": None,
+    },
+}
+
+# Build the static system prefix once per (fields, version) so repeated calls send identical bytes
+@lru_cache(maxsize=32)
+def build_system_prompt(fields: tuple, version: str = None) -> str:
+    template = PROMPT_TEMPLATES[version or btb_prompt_version]
+    indent = template["indent"]
+    separators = None if indent else (',', ':')
+
+    schema = json.dumps({field: None for field in fields}, indent=indent, separators=separators)
+    prompt = template["instructions"].format(schema=schema)
+    for example in PROMPT_EXAMPLES:
+        output = [{field: example["output"].get(field) for field in fields}]
+        prompt += template["example"].format(text=example["text"], output=json.dumps(output, indent=indent, separators=separators))
+    return prompt + template["footer"]
+
+# The per-request part of the prompt is only the slip text
+def build_user_prompt(extracted_text: str) -> str:
+    return f"Text: {extracted_text.strip()}\nJSON:"
+
+# Batched requests reuse the single-request prefix and append the keyed-output instruction,
+# so the shared part of the prefix stays cached across both call types
+@lru_cache(maxsize=32)
+def build_batch_system_prompt(fields: tuple, version: str = None) -> str:
+    return build_system_prompt(fields, version) + """
+The input may hold several independent slips, each under a "### Request N" header.
+Extract each one separately and reply with a single JSON object mapping every request number (as a string) to that slip's JSON list, e.g. {"0": [...], "1": [...]}."""
+
+def build_batch_user_prompt(extracted_texts: list) -> str:
+    sections = [f"### Request {index}\nText: {text.strip()}" for index, text in enumerate(extracted_texts)]
+    return "\n\n".join(sections) + "\nJSON:"
+
+# Targeted re-prompt for a few fields of one bet that could not be repaired from the OCR text.
+# Kept tiny on purpose: no examples, and only the missing keys in the schema.
+@lru_cache(maxsize=64)
+def build_field_system_prompt(fields: tuple) -> str:
+    schema = json.dumps({field: None for field in fields}, separators=(',', ':'))
+    return f"""Read one bet from sportsbook betting slip text (OCR output, may contain errors).
+Reply with only a JSON object with exactly these keys: {schema}
+Rules: outcome is one of WON, LOST, PUSH, PENDING. bet_type is one of Moneyline, Spread, Totals, Prop, Future, Other.
+odds keep their sign, e.g. "-110". OCR may read "$" as "S" or "5". Use null for anything not in the text."""
+
+# The bet's already-known fields identify it when the text holds several slips
+def build_field_user_prompt(extracted_text: str, known: dict) -> str:
+    return f"Bet: {json.dumps(known, separators=(',', ':'))}\nText: {extracted_text.strip()}\nJSON:"
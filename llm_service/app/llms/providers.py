@@ -0,0 +1,118 @@
+import logging
+import os
+import time
+
+import httpx
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+btb_llm_providers = [name.strip() for name in os.getenv('BTB_LLM_PROVIDERS', 'ollama').split(',') if name.strip()]
+btb_llm_timeout = float(os.getenv('BTB_LLM_TIMEOUT', '300'))
+
+# Common interface for every generation backend. Results are plain dicts shaped like Ollama's
+# /api/generate response ('response', 'model', 'prompt_eval_count', 'eval_count', '*_duration' in ns)
+# so prompt logging and telemetry work the same regardless of backend.
+class LLMProvider:
+    name = 'provider'
+
+    def __init__(self, default_model: str):
+        self.default_model = default_model
+
+    # Whether this backend can run the requested model; None means the backend's default model
+    def serves(self, model: str = None) -> bool:
+        return model is None or model == self.default_model
+
+    def generate(self, system: str, prompt: str, model: str = None, json_mode: bool = False, options: dict = None) -> dict:
+        raise NotImplementedError
+
+    def health(self) -> bool:
+        raise NotImplementedError
+
+# Any backend exposing the OpenAI chat completions API (NVIDIA NIM, Gemini, vLLM, llama.cpp server, ...)
+class OpenAICompatibleProvider(LLMProvider):
+    name = 'openai'
+
+    def __init__(self, base_url: str, default_model: str, api_key: str = None, timeout: float = btb_llm_timeout):
+        super().__init__(default_model)
+        self.base_url = base_url.rstrip('/')
+        headers = {'Authorization': f'Bearer {api_key}'} if api_key else {}
+        self.http = httpx.Client(base_url=self.base_url, headers=headers, timeout=timeout)
+
+    def generate(self, system: str, prompt: str, model: str = None, json_mode: bool = False, options: dict = None) -> dict:
+        options = options or {}
+        payload = {
+            'model': model or self.default_model,
+            'messages': [{'role': 'system', 'content': system}, {'role': 'user', 'content': prompt}],
+            'temperature': options.get('temperature', 0),
+        }
+        if options.get('num_predict'):
+            payload['max_tokens'] = options['num_predict']
+        if json_mode:
+            payload['response_format'] = {'type': 'json_object'}
+
+        start_time = time.perf_counter_ns()
+        response = self.http.post('/chat/completions', json=payload)
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get('usage') or {}
+        return {
+            'provider': self.name,
+            'model': body.get('model', payload['model']),
+            'response': body['choices'][0]['message']['content'] or '',
+            'prompt_eval_count': usage.get('prompt_tokens'),
+            'eval_count': usage.get('completion_tokens'),
+            'total_duration': time.perf_counter_ns() - start_time,
+        }
+
+    def health(self) -> bool:
+        try:
+            return self.http.get('/models', timeout=5).status_code == 200
+        except httpx.HTTPError:
+            return False
+
+class NIMProvider(OpenAICompatibleProvider):
+    name = 'nim'
+
+    def __init__(self):
+        super().__init__(
+            base_url=os.getenv('BTB_NIM_BASE_URL', 'https://integrate.api.nvidia.com/v1'),
+            default_model=os.getenv('BTB_NIM_MODEL', 'nvidia/llama-3.1-nemotron-51b-instruct'),
+            api_key=os.getenv('NVIDIA_API_KEY'),
+        )
+
+# Gemini is reached through Google's OpenAI-compatible endpoint so it shares the same request path
+class GeminiProvider(OpenAICompatibleProvider):
+    name = 'gemini'
+
+    def __init__(self):
+        super().__init__(
+            base_url=os.getenv('BTB_GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta/openai'),
+            default_model=os.getenv('BTB_GEMINI_MODEL', 'gemini-1.5-flash'),
+            api_key=os.getenv('GOOGLE_API_KEY'),
+        )
+
+# Build the providers named in BTB_LLM_PROVIDERS, skipping hosted backends without credentials
+def build_providers() -> list:
+    # Imported here so the hosted backends can be used without the Ollama package installed
+    from llms.ollama.client import OllamaProvider
+
+    factories = {'ollama': OllamaProvider, 'nim': NIMProvider, 'gemini': GeminiProvider}
+    required_keys = {'nim': 'NVIDIA_API_KEY', 'gemini': 'GOOGLE_API_KEY'}
+    local_overrides = {'nim': 'BTB_NIM_BASE_URL', 'gemini': 'BTB_GEMINI_BASE_URL'}
+
+    providers = []
+    for name in btb_llm_providers:
+        if name not in factories:
+            logging.error(f'Unknown LLM provider "{name}", skipping')
+            continue
+        # A local stand-in (base URL override) does not need real credentials
+        if name in required_keys and not os.getenv(required_keys[name]) and not os.getenv(local_overrides[name]):
+            logging.warning(f'{required_keys[name]} not set, skipping LLM provider "{name}"')
+            continue
+        providers.append(factories[name]())
+    if not providers:
+        raise ValueError("No LLM providers configured; check BTB_LLM_PROVIDERS")
+    logging.info(f'LLM providers: {[provider.name for provider in providers]}')
+    return providers
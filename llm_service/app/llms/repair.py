@@ -0,0 +1,284 @@
+import json
+import logging
+import os
+import re
+from decimal import Decimal
+from functools import lru_cache
+
+from llms.metrics import metrics
+from llms.validation import btb_max_stake, normalize_text, parse_amount, team_in_text, validate_bet
+from service_models.models import BetType
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Whether fields left unresolved after pattern repair are re-requested from the model with a targeted prompt
+btb_repair_reprompt = os.getenv('BTB_REPAIR_REPROMPT', 'true').lower() in ('1', 'true', 'yes')
+
+repaired_fields = metrics.counter('llm_repair_fields_total', 'Bet fields by repair method (normalized, pattern, reprompt, unresolved)')
+
+# Precompiled OCR patterns, applied to the text of a single betslip
+# The API copies the two slip patterns to skip stored betslips before extraction (api/app/sportsbooks/mgm/ingestion.py)
+SLIP_SPLIT_PATTERN = re.compile(r'(?=Betslip ID)', re.IGNORECASE)
+BET_ID_PATTERN = re.compile(r'Betslip ID:?\s*(\w+)', re.IGNORECASE)
+# "$37.50 -110 $71.59" under the "Stake Odds Payout" header; the payout is absent on lost slips
+WAGER_PATTERN = re.compile(r'([$S]?\d[\d,]*\.\d{2})\s+([+\-−]\d{3,5}|EVEN)(?![\d.])(?:\s+([$S]?\d[\d,]*\.\d{2}))?', re.IGNORECASE)
+# Sportsbooks print the outcome glued to the payout ("$71.59WON"), so no leading word boundary
+OUTCOME_PATTERN = re.compile(r'(?<![A-Z])(WON|LOST|PUSH|PENDING)(?![A-Z])')
+BET_TYPE_PATTERN = re.compile(r'(?<![a-z])(Moneyline|Money Line|Spread|Totals?|Props?|Futures?)(?![a-z])', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'(\d{1,2}/\d{1,2}/\d{2,4})\s*[•·.,]?\s*(\d{1,2})[:.](\d{2})\s*([AP]M)', re.IGNORECASE)
+ODDS_DIGITS_PATTERN = re.compile(r'\d{3,5}')
+TEAM = r"[A-Z][\w&.'-]*(?:\s+[A-Z][\w&.'-]*)*"
+MATCHUP_PATTERN = re.compile(rf'({TEAM})\s+(?:at|vs\.?|@)\s+({TEAM})')
+
+OUTCOME_ALIASES = {"WIN": "WON", "WINNER": "WON", "LOSS": "LOST", "LOSE": "LOST", "LOSER": "LOST", "VOID": "PUSH", "OPEN": "PENDING"}
+BET_TYPE_ALIASES = {bet_type.value.lower(): bet_type.value for bet_type in BetType}
+BET_TYPE_ALIASES.update({"ml": "Moneyline", "money line": "Moneyline", "total": "Totals", "over/under": "Totals",
+                         "props": "Prop", "player prop": "Prop", "futures": "Future", "point spread": "Spread"})
+PAYOUT_TOLERANCE = Decimal('0.02')  # Sportsbooks round each leg, so allow a couple of cents
+
+def normalize_amount(value, max_amount: Decimal = None):
+    if value is None or isinstance(value, bool):
+        return None
+    text = str(value).strip().replace(',', '')
+    # "S" is an OCR'd "$"
+    if text[:1] in ('S', 's'):
+        text = text[1:]
+    amount = parse_amount(text)
+    if amount is None:
+        return None
+    # A "$" read as a leading "5" turns 25.00 into 525.00
+    if max_amount is not None and amount > max_amount and text.lstrip('$').startswith('5'):
+        amount = parse_amount(text.lstrip('$')[1:]) or amount
+    return f'{amount:.2f}'
+
+def normalize_odds(value):
+    if value is None:
+        return None
+    odds = str(value).strip().replace('−', '-').upper()
+    if odds in ('EV', 'EVEN'):
+        return 'EVEN'
+    if ODDS_DIGITS_PATTERN.fullmatch(odds):
+        return f'+{odds}'
+    return odds
+
+def normalize_outcome(value):
+    if value is None:
+        return None
+    outcome = str(value).strip().upper()
+    return OUTCOME_ALIASES.get(outcome, outcome)
+
+def normalize_bet_type(value):
+    if value is None:
+        return None
+    return BET_TYPE_ALIASES.get(str(value).strip().lower(), str(value).strip())
+
+def normalize_date(value):
+    if value is None:
+        return None
+    match = DATE_PATTERN.search(str(value))
+    if not match:
+        return str(value).strip()
+    day, hour, minute, meridiem = match.groups()
+    return f'{day} {int(hour)}:{minute} {meridiem.upper()}'
+
+NORMALIZERS = {
+    "stake": lambda value: normalize_amount(value, btb_max_stake),
+    "payout": normalize_amount,
+    "odds": normalize_odds,
+    "outcome": normalize_outcome,
+    "bet_type": normalize_bet_type,
+    "date": normalize_date,
+}
+
+# American odds to the full payout (stake included) the slip should show for a settled outcome
+def expected_payout(stake: str, odds: str, outcome: str):
+    stake_amount = parse_amount(stake)
+    if stake_amount is None:
+        return None
+    if outcome == 'LOST':
+        return Decimal('0.00')
+    if outcome == 'PUSH':
+        return stake_amount
+    if outcome not in ('WON', 'PENDING'):
+        return None
+    if odds == 'EVEN':
+        return stake_amount * 2
+    try:
+        price = int(odds)
+    except (TypeError, ValueError):
+        return None
+    if abs(price) < 100:
+        return None
+    profit = stake_amount * price / 100 if price > 0 else stake_amount * 100 / abs(price)
+    return (stake_amount + profit).quantize(Decimal('0.01'))
+
+def _payout_matches(payout: str, expected: Decimal) -> bool:
+    amount = parse_amount(payout)
+    return amount is not None and abs(amount - expected) <= PAYOUT_TOLERANCE
+
+# Split (possibly JSON-encoded segment) text into one chunk per betslip
+def split_slips(text: str) -> list:
+    try:
+        decoded = json.loads(text)
+        if isinstance(decoded, list):
+            text = '\n\n'.join(str(part) for part in decoded)
+    except (TypeError, ValueError):
+        pass
+    slips = [slip.strip() for slip in SLIP_SPLIT_PATTERN.split(text) if slip.strip()]
+    if len(slips) > 1 and not BET_ID_PATTERN.match(slips[0]):
+        # Text before the first "Betslip ID" is a header, not a slip
+        slips = slips[1:]
+    return slips or [text]
+
+# Field values read directly from one betslip's OCR text
+@lru_cache(maxsize=256)
+def _extract_slip_fields(slip_text: str) -> tuple:
+    found = {}
+    if match := BET_ID_PATTERN.search(slip_text):
+        found["bet_id"] = match.group(1)
+    if match := WAGER_PATTERN.search(slip_text):
+        found["stake"], found["odds"], payout = match.groups()
+        if payout:
+            found["payout"] = payout
+    if match := OUTCOME_PATTERN.search(slip_text):
+        found["outcome"] = match.group(1)
+    if match := BET_TYPE_PATTERN.search(slip_text):
+        found["bet_type"] = match.group(1)
+    if match := DATE_PATTERN.search(slip_text):
+        found["date"] = match.group(0)
+    if match := MATCHUP_PATTERN.search(slip_text):
+        found["away_team"], found["home_team"] = match.group(1).strip(), match.group(2).strip()
+    return tuple((field, NORMALIZERS.get(field, str)(value)) for field, value in found.items())
+
+def extract_slip_fields(slip_text: str) -> dict:
+    return dict(_extract_slip_fields(slip_text))
+
+# Typed rules: the acceptance rules from llms/validation.py plus the enum/format fields they do not cover
+def bet_issues(bet: dict, source_text: str, fields: list) -> dict:
+    issues = validate_bet(bet, source_text)
+    if "bet_type" in fields and bet.get("bet_type") not in BET_TYPE_ALIASES.values():
+        issues["bet_type"] = f"invalid bet type {bet.get('bet_type')!r}"
+    if "date" in fields and not bet.get("date"):
+        issues["date"] = "no date extracted"
+    if "away_team" in issues and bet.get("away_team") is None and bet.get("home_team") is None:
+        issues["home_team"] = issues["away_team"]
+    return {field: reason for field, reason in issues.items() if field in fields}
+
+def _normalize_bet(bet: dict, fields: list) -> dict:
+    normalized = {}
+    for field, value in bet.items():
+        if field in NORMALIZERS:
+            new_value = NORMALIZERS[field](value)
+            if new_value != value and value is not None:
+                repaired_fields.inc(field=field, method='normalized')
+            value = new_value
+        # Downstream models declare string fields, so numbers from the model are kept as text
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        normalized[field] = value
+    for field in fields:
+        normalized.setdefault(field, None)
+    return normalized
+
+# Reconcile the payout with stake, odds and outcome. Boosted payouts legitimately disagree with the odds,
+# so a mismatch only changes the value when a printed amount (or its OCR-prefix variant) agrees.
+def _reconcile_payout(bet: dict, found: dict) -> bool:
+    expected = expected_payout(bet.get("stake"), bet.get("odds"), bet.get("outcome"))
+    if expected is None or bet.get("outcome") == 'PENDING':
+        return False
+    if bet.get("payout") is not None and _payout_matches(bet["payout"], expected):
+        return False
+    # Prefer an amount printed on the slip, including its OCR-prefix variant, that agrees with stake and odds
+    candidates = [bet.get("payout"), found.get("payout")]
+    candidates += [str(candidate).lstrip('$S')[1:] for candidate in candidates if candidate and str(candidate).lstrip('$S').startswith('5')]
+    for candidate in candidates:
+        amount = normalize_amount(candidate)
+        if amount is not None and _payout_matches(amount, expected):
+            bet["payout"] = amount
+            return True
+    # Lost and pushed slips settle to a known amount even when it is not printed
+    if bet.get("outcome") in ('LOST', 'PUSH') or parse_amount(bet.get("payout")) is None:
+        bet["payout"] = f'{expected:.2f}'
+        return True
+    return False
+
+# Fill fields that break a rule from the slip's own OCR text
+def _repair_from_text(bet: dict, issues: dict, slip_text: str, fields: list):
+    found = extract_slip_fields(slip_text)
+    normalized_slip = normalize_text(slip_text)
+    for field in issues:
+        candidate = found.get(field)
+        if candidate is None:
+            continue
+        if field in ("away_team", "home_team") and not team_in_text(candidate, normalized_slip):
+            continue
+        bet[field] = candidate
+        repaired_fields.inc(field=field, method='pattern')
+    if "payout" in fields and _reconcile_payout(bet, found):
+        repaired_fields.inc(field='payout', method='pattern')
+
+def _slip_for_bet(bet: dict, index: int, bets: list, slips: list):
+    if len(slips) == 1:
+        return slips[0]
+    bet_id = bet.get("bet_id")
+    if bet_id:
+        for slip in slips:
+            if str(bet_id) in slip:
+                return slip
+    if len(slips) == len(bets):
+        return slips[index]
+    return None
+
+# Ask the model for just the unresolved fields, keeping only answers that pass the rules
+def _repair_with_reprompt(bet: dict, issues: dict, text: str, fields: list, reprompt):
+    known = {field: value for field, value in bet.items() if value is not None and field not in issues}
+    try:
+        answer = reprompt(text, list(issues), known)
+    except Exception as e:
+        logging.error(f'Targeted re-prompt for {list(issues)} failed: {e}')
+        return
+    if not isinstance(answer, dict):
+        return
+    for field in issues:
+        if answer.get(field) is None:
+            continue
+        previous = bet.get(field)
+        bet[field] = NORMALIZERS.get(field, str)(answer[field])
+        if field in bet_issues(bet, text, fields):
+            bet[field] = previous
+        else:
+            repaired_fields.inc(field=field, method='reprompt')
+
+# Validate each extracted bet and repair broken fields: normalization first, then OCR patterns,
+# then (optionally) one tiny re-prompt per bet for whatever is still unresolved
+def repair_extraction(parsed_data, source_text: str, fields: list, reprompt=None):
+    if isinstance(parsed_data, dict):
+        parsed_data = [parsed_data]
+    if not parsed_data or not isinstance(parsed_data, list):
+        return parsed_data
+
+    slips = split_slips(source_text)
+    repaired = []
+    for index, bet in enumerate(parsed_data):
+        if not isinstance(bet, dict):
+            repaired.append(bet)
+            continue
+        bet = _normalize_bet(bet, fields)
+        slip_text = _slip_for_bet(bet, index, parsed_data, slips)
+        issues = bet_issues(bet, slip_text or source_text, fields)
+        if slip_text:
+            _repair_from_text(bet, issues, slip_text, fields)
+            issues = bet_issues(bet, slip_text, fields)
+        if issues and reprompt is not None and btb_repair_reprompt:
+            _repair_with_reprompt(bet, issues, slip_text or source_text, fields, reprompt)
+            if "payout" in fields and _reconcile_payout(bet, extract_slip_fields(slip_text) if slip_text else {}):
+                repaired_fields.inc(field='payout', method='pattern')
+            issues = bet_issues(bet, slip_text or source_text, fields)
+        for field in issues:
+            repaired_fields.inc(field=field, method='unresolved')
+        if issues:
+            logging.warning(f'Unresolved fields after repair: {issues}')
+        repaired.append(bet)
+    return repaired
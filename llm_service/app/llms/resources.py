@@ -0,0 +1,106 @@
+import logging
+import os
+import shutil
+import subprocess
+import threading
+
+from llms.metrics import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+btb_resource_sample_interval = float(os.getenv('BTB_RESOURCE_SAMPLE_INTERVAL_SECONDS', '15'))
+
+cpu_utilization = metrics.gauge('llm_host_cpu_utilization', 'Host CPU utilization (0-1) over the last sample interval')
+load_average = metrics.gauge('llm_host_load_average', 'Host 1-minute load average')
+memory_available_bytes = metrics.gauge('llm_host_memory_available_bytes', 'Host memory available')
+memory_total_bytes = metrics.gauge('llm_host_memory_total_bytes', 'Host memory total')
+process_rss_bytes = metrics.gauge('llm_process_rss_bytes', 'Resident memory of the LLM service process')
+gpu_utilization = metrics.gauge('llm_gpu_utilization', 'GPU utilization (0-1) per device, when nvidia-smi is available')
+gpu_memory_used_bytes = metrics.gauge('llm_gpu_memory_used_bytes', 'GPU memory used per device, when nvidia-smi is available')
+
+# Portable resource sampler: /proc on any Linux host (CPU-only included), plus nvidia-smi when present
+class ResourceSampler:
+    def __init__(self):
+        self._last_cpu = None
+        self._nvidia_smi = shutil.which('nvidia-smi')
+
+    def _read_cpu_times(self):
+        with open('/proc/stat') as stat:
+            values = [int(value) for value in stat.readline().split()[1:]]
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        return sum(values), idle
+
+    def _read_meminfo(self) -> dict:
+        meminfo = {}
+        with open('/proc/meminfo') as file:
+            for line in file:
+                name, value = line.split(':', 1)
+                meminfo[name] = int(value.split()[0]) * 1024
+        return meminfo
+
+    def _read_rss(self) -> int:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def _sample_gpus(self) -> list:
+        result = subprocess.run(
+            [self._nvidia_smi, '--query-gpu=index,utilization.gpu,memory.used', '--format=csv,noheader,nounits'],
+            stdout=subprocess.PIPE, text=True, timeout=10, check=True,
+        )
+        gpus = []
+        for line in result.stdout.strip().splitlines():
+            index, utilization, memory_used = [part.strip() for part in line.split(',')]
+            gpus.append({"index": index, "utilization": float(utilization) / 100, "memory_used_bytes": float(memory_used) * 1024 * 1024})
+        return gpus
+
+    def sample(self) -> dict:
+        sample = {}
+        try:
+            total, idle = self._read_cpu_times()
+            if self._last_cpu:
+                total_delta, idle_delta = total - self._last_cpu[0], idle - self._last_cpu[1]
+                if total_delta > 0:
+                    sample["cpu_utilization"] = 1 - idle_delta / total_delta
+            self._last_cpu = (total, idle)
+            sample["load_average"] = os.getloadavg()[0]
+            meminfo = self._read_meminfo()
+            sample["memory_total_bytes"] = meminfo.get('MemTotal', 0)
+            sample["memory_available_bytes"] = meminfo.get('MemAvailable', 0)
+            sample["process_rss_bytes"] = self._read_rss()
+        except (OSError, ValueError) as e:
+            logging.warning(f'Could not read /proc resource stats: {e}')
+        if self._nvidia_smi:
+            try:
+                sample["gpus"] = self._sample_gpus()
+            except (OSError, ValueError, subprocess.SubprocessError) as e:
+                logging.warning(f'Error retrieving GPU status: {e}')
+        return sample
+
+    def record(self) -> dict:
+        sample = self.sample()
+        if "cpu_utilization" in sample:
+            cpu_utilization.set(sample["cpu_utilization"])
+        for key, gauge in (("load_average", load_average), ("memory_total_bytes", memory_total_bytes),
+                           ("memory_available_bytes", memory_available_bytes), ("process_rss_bytes", process_rss_bytes)):
+            if key in sample:
+                gauge.set(sample[key])
+        for gpu in sample.get("gpus", []):
+            gpu_utilization.set(gpu["utilization"], gpu=gpu["index"])
+            gpu_memory_used_bytes.set(gpu["memory_used_bytes"], gpu=gpu["index"])
+        return sample
+
+def start_resource_sampler(stop_event: threading.Event):
+    sampler = ResourceSampler()
+
+    def run():
+        sampler.record()
+        while not stop_event.wait(btb_resource_sample_interval):
+            sampler.record()
+
+    threading.Thread(target=run, name='llm-resources', daemon=True).start()
+    return sampler
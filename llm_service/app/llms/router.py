@@ -0,0 +1,129 @@
+import logging
+import os
+import threading
+import time
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Consecutive failures before a provider is taken out of rotation, and how long it stays out
+btb_router_failure_threshold = int(os.getenv('BTB_ROUTER_FAILURE_THRESHOLD', '3'))
+btb_router_cooldown_seconds = float(os.getenv('BTB_ROUTER_COOLDOWN_SECONDS', '30'))
+# Weight of the newest latency sample in the moving average
+btb_router_ewma_alpha = float(os.getenv('BTB_ROUTER_EWMA_ALPHA', '0.3'))
+
+class ProviderStats:
+    def __init__(self):
+        self.latency = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+    # Expected wait: observed latency scaled by the requests already queued on the backend.
+    # Providers without samples score zero so each one gets tried at least once.
+    def score(self) -> float:
+        return (self.latency or 0.0) * (self.in_flight + 1)
+
+# Picks a provider per request from observed latency, queue depth and health, failing over on errors
+class ProviderRouter:
+    def __init__(self, providers: list, failure_threshold: int = btb_router_failure_threshold,
+                 cooldown_seconds: float = btb_router_cooldown_seconds, ewma_alpha: float = btb_router_ewma_alpha):
+        self.providers = providers
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.ewma_alpha = ewma_alpha
+        self.stats = {provider.name: ProviderStats() for provider in providers}
+        self._lock = threading.Lock()
+
+    def candidates(self, model: str = None) -> list:
+        now = time.time()
+        with self._lock:
+            eligible = [provider for provider in self.providers if provider.serves(model)]
+            healthy = [provider for provider in eligible if self.stats[provider.name].healthy(now)]
+            # With every backend marked down, still try them rather than failing outright
+            ordered = healthy or eligible
+            return sorted(ordered, key=lambda provider: self.stats[provider.name].score())
+
+    def _record_start(self, provider):
+        with self._lock:
+            stats = self.stats[provider.name]
+            stats.in_flight += 1
+            stats.requests += 1
+
+    def _record_success(self, provider, elapsed: float):
+        with self._lock:
+            stats = self.stats[provider.name]
+            stats.in_flight -= 1
+            stats.consecutive_failures = 0
+            stats.unhealthy_until = 0.0
+            stats.latency = elapsed if stats.latency is None else self.ewma_alpha * elapsed + (1 - self.ewma_alpha) * stats.latency
+
+    def _record_failure(self, provider):
+        with self._lock:
+            stats = self.stats[provider.name]
+            stats.in_flight -= 1
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= self.failure_threshold:
+                stats.unhealthy_until = time.time() + self.cooldown_seconds
+                logging.warning(f'LLM provider {provider.name} marked unhealthy for {self.cooldown_seconds}s')
+
+    def mark_health(self, provider, healthy: bool):
+        with self._lock:
+            stats = self.stats[provider.name]
+            if healthy:
+                stats.consecutive_failures = 0
+                stats.unhealthy_until = 0.0
+            else:
+                stats.unhealthy_until = time.time() + self.cooldown_seconds
+
+    # Actively probe every provider, e.g. from a background task
+    def refresh_health(self):
+        for provider in self.providers:
+            try:
+                healthy = provider.health()
+            except Exception:
+                healthy = False
+            self.mark_health(provider, healthy)
+
+    def generate(self, system: str, prompt: str, model: str = None, json_mode: bool = False, options: dict = None) -> dict:
+        candidates = self.candidates(model)
+        if not candidates:
+            raise ValueError(f"No LLM provider serves model {model}")
+
+        last_error = None
+        for provider in candidates:
+            self._record_start(provider)
+            start_time = time.time()
+            try:
+                response = provider.generate(system, prompt, model=model, json_mode=json_mode, options=options)
+            except Exception as e:
+                self._record_failure(provider)
+                logging.error(f'LLM provider {provider.name} failed: {e}. Failing over.')
+                last_error = e
+                continue
+            self._record_success(provider, time.time() - start_time)
+            return response
+        raise last_error
+
+    def status(self) -> list:
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "provider": provider.name,
+                    "default_model": provider.default_model,
+                    "healthy": self.stats[provider.name].healthy(now),
+                    "latency_seconds": self.stats[provider.name].latency,
+                    "in_flight": self.stats[provider.name].in_flight,
+                    "requests": self.stats[provider.name].requests,
+                    "failures": self.stats[provider.name].failures,
+                }
+                for provider in self.providers
+            ]
@@ -0,0 +1,134 @@
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from llms.telemetry import record_retry
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Thread-safe progress counters for a single multi-segment extraction job
+class SegmentProgress:
+    def __init__(self, job_id: str, total: int):
+        self.job_id = job_id
+        self.total = total
+        self.waiting = total
+        self.in_progress = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.started_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def segment_started(self):
+        with self._lock:
+            self.waiting -= 1
+            self.in_progress += 1
+
+    def segment_retried(self):
+        with self._lock:
+            self.retries += 1
+
+    def segment_finished(self, succeeded: bool):
+        with self._lock:
+            self.in_progress -= 1
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def close(self):
+        with self._lock:
+            self.finished_at = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.job_id,
+                "total": self.total,
+                "waiting": self.waiting,
+                "in_progress": self.in_progress,
+                "completed": self.completed,
+                "failed": self.failed,
+                "retries": self.retries,
+                "done": self.finished_at is not None,
+                "elapsed_seconds": round(end - self.started_at, 3),
+            }
+
+    def __str__(self):
+        snapshot = self.snapshot()
+        return (f"Job {snapshot['job_id']} - Total: {snapshot['total']}, Completed: {snapshot['completed']}, "
+                f"Failed: {snapshot['failed']}, In-progress: {snapshot['in_progress']}, Waiting: {snapshot['waiting']}")
+
+# Keeps the most recent jobs so their progress can be polled over HTTP
+class ProgressRegistry:
+    def __init__(self, max_jobs: int = 50):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, total: int, job_id: str = None) -> SegmentProgress:
+        progress = SegmentProgress(job_id or str(uuid.uuid4()), total)
+        with self._lock:
+            self._jobs[progress.job_id] = progress
+            self._jobs.move_to_end(progress.job_id)
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return progress
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.snapshot() for job in jobs]
+
+progress_registry = ProgressRegistry()
+
+# Run one segment with retries, treating exceptions and empty results as failures
+def _run_segment(index: int, segment, worker, retries: int, backoff_in_seconds: float, progress: SegmentProgress):
+    progress.segment_started()
+    for attempt in range(retries + 1):
+        try:
+            result = worker(segment)
+            if result:
+                progress.segment_finished(True)
+                return result
+            logging.warning(f'Segment {index} returned no data (attempt {attempt + 1} of {retries + 1})')
+        except Exception as e:
+            logging.error(f'Error processing segment {index} (attempt {attempt + 1} of {retries + 1}): {e}')
+        if attempt < retries:
+            progress.segment_retried()
+            record_retry('segment')
+            time.sleep(backoff_in_seconds * (2 ** attempt) + random.uniform(0, backoff_in_seconds))
+    progress.segment_finished(False)
+    return None
+
+# Process segments concurrently and return one result per segment in the original order
+def process_segments(segments: list, worker, max_workers: int = 1, retries: int = 1,
+                     backoff_in_seconds: float = 1, progress: SegmentProgress = None) -> list:
+    progress = progress or progress_registry.create(len(segments))
+    max_workers = max(1, min(max_workers, len(segments) or 1))
+    results = [None] * len(segments)
+
+    logging.info(f'Processing {len(segments)} segments with {max_workers} workers')
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_index = {
+            executor.submit(_run_segment, index, segment, worker, retries, backoff_in_seconds, progress): index
+            for index, segment in enumerate(segments)
+        }
+        for future in concurrent.futures.as_completed(future_to_index):
+            results[future_to_index[future]] = future.result()
+            logging.info(str(progress))
+
+    progress.close()
+    return results
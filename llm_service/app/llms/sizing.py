@@ -0,0 +1,60 @@
+import logging
+import math
+import os
+import re
+import threading
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Context window limits. Ollama restarts the model runner whenever num_ctx changes, so sizes are rounded up
+# to power-of-two buckets to keep the number of distinct values (and reloads) small.
+btb_min_num_ctx = int(os.getenv('BTB_MIN_NUM_CTX', '2048'))
+btb_max_num_ctx = int(os.getenv('BTB_MAX_NUM_CTX', '8192'))
+# Output budget: a compact JSON bet object is roughly 120 tokens, plus list/object overhead
+btb_tokens_per_bet = int(os.getenv('BTB_TOKENS_PER_BET', '160'))
+btb_min_num_predict = int(os.getenv('BTB_MIN_NUM_PREDICT', '256'))
+btb_max_num_predict = int(os.getenv('BTB_MAX_NUM_PREDICT', '4096'))
+
+BETSLIP_PATTERN = re.compile(r'Betslip ID', re.IGNORECASE)
+BATCH_REQUEST_PATTERN = re.compile(r'^### Request \d+', re.MULTILINE)
+
+# Characters-per-token ratio calibrated from the backend's reported prompt_eval_count
+class TokenEstimator:
+    def __init__(self, chars_per_token: float = 3.5, alpha: float = 0.2):
+        self.chars_per_token = chars_per_token
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def estimate(self, text_length: int) -> int:
+        return math.ceil(text_length / self.chars_per_token)
+
+    def observe(self, text_length: int, prompt_eval_count: int):
+        if not prompt_eval_count or not text_length:
+            return
+        # Prefix-cache hits only count the uncached tail, so only near-full evaluations are used as samples
+        if prompt_eval_count < 0.8 * self.estimate(text_length):
+            return
+        with self._lock:
+            sample = text_length / prompt_eval_count
+            self.chars_per_token = self.alpha * sample + (1 - self.alpha) * self.chars_per_token
+
+token_estimator = TokenEstimator()
+
+def expected_bet_count(prompt: str) -> int:
+    return max(len(BETSLIP_PATTERN.findall(prompt)), len(BATCH_REQUEST_PATTERN.findall(prompt)), 1)
+
+def _bucket(tokens: int) -> int:
+    return 2 ** math.ceil(math.log2(max(tokens, 1)))
+
+# Size num_ctx and num_predict for one request from its prompt length and expected number of bets
+def generation_options(system: str, prompt: str) -> dict:
+    prompt_tokens = token_estimator.estimate(len(system) + len(prompt))
+    bets = expected_bet_count(prompt)
+    num_predict = min(max(btb_tokens_per_bet * bets, btb_min_num_predict), btb_max_num_predict)
+    num_ctx = min(max(_bucket(prompt_tokens + num_predict), btb_min_num_ctx), btb_max_num_ctx)
+    if prompt_tokens + num_predict > num_ctx:
+        logging.warning(f'Prompt (~{prompt_tokens} tokens) plus output budget exceeds the {num_ctx} token context limit')
+    logging.info(f'Sizing: ~{prompt_tokens} prompt tokens, {bets} expected bets -> num_ctx={num_ctx}, num_predict={num_predict}')
+    return {'num_ctx': num_ctx, 'num_predict': num_predict}
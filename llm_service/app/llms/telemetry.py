@@ -0,0 +1,58 @@
+import logging
+
+from llms.metrics import LATENCY_BUCKETS, metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 40, 80, 160)
+
+generation_seconds = metrics.histogram('llm_generation_seconds', 'Total generation time reported by the backend', LATENCY_BUCKETS)
+load_seconds = metrics.histogram('llm_load_seconds', 'Time spent loading the model before generating', LATENCY_BUCKETS)
+prompt_eval_tokens = metrics.histogram('llm_prompt_eval_tokens', 'Prompt tokens evaluated (cached prefix tokens excluded)', TOKEN_BUCKETS)
+prompt_eval_seconds = metrics.histogram('llm_prompt_eval_seconds', 'Prompt evaluation time', LATENCY_BUCKETS)
+eval_tokens = metrics.histogram('llm_eval_tokens', 'Tokens generated', TOKEN_BUCKETS)
+eval_seconds = metrics.histogram('llm_eval_seconds', 'Token generation time', LATENCY_BUCKETS)
+eval_tokens_per_second = metrics.histogram('llm_eval_tokens_per_second', 'Generation throughput', RATE_BUCKETS)
+prompt_tokens_per_second = metrics.histogram('llm_prompt_eval_tokens_per_second', 'Prompt evaluation throughput', (50, 100, 200, 400, 800, 1600, 3200, 6400))
+parse_results = metrics.counter('llm_parse_results_total', 'Model outputs by parse result (ok, partial, failed)')
+retries = metrics.counter('llm_retries_total', 'Retried generation attempts by reason')
+
+def _seconds(nanoseconds) -> float:
+    return (nanoseconds or 0) / 1e9
+
+# Record Ollama-style timing fields from one generation, tagged by model and request type
+def record_generation(response: dict, request_type: str, prompt_version: str):
+    labels = {"model": response.get('model'), "provider": response.get('provider'), "request_type": request_type}
+    total = _seconds(response.get('total_duration'))
+    load = _seconds(response.get('load_duration'))
+    prompt_count = response.get('prompt_eval_count') or 0
+    prompt_duration = _seconds(response.get('prompt_eval_duration'))
+    eval_count = response.get('eval_count') or 0
+    eval_duration = _seconds(response.get('eval_duration'))
+
+    generation_seconds.observe(total, **labels)
+    prompt_eval_tokens.observe(prompt_count, **labels)
+    eval_tokens.observe(eval_count, **labels)
+    # OpenAI-compatible backends only report token counts, not per-phase durations
+    if response.get('load_duration') is not None:
+        load_seconds.observe(load, **labels)
+    if prompt_duration:
+        prompt_eval_seconds.observe(prompt_duration, **labels)
+        prompt_tokens_per_second.observe(prompt_count / prompt_duration, **labels)
+    if eval_duration:
+        eval_seconds.observe(eval_duration, **labels)
+        eval_tokens_per_second.observe(eval_count / eval_duration, **labels)
+
+    tokens_per_second = f'{eval_count / eval_duration:.1f} tok/s' if eval_duration else 'n/a'
+    logging.info(f'Generation ({response.get("provider")}/{response.get("model")}, {request_type}, {prompt_version}): '
+                 f'prompt {prompt_count} tokens in {prompt_duration * 1000:.1f} ms, output {eval_count} tokens at {tokens_per_second}, '
+                 f'load {load * 1000:.1f} ms, total {total * 1000:.1f} ms')
+
+def record_parse(result: str, request_type: str):
+    parse_results.inc(result=result, request_type=request_type)
+
+def record_retry(reason: str):
+    retries.inc(reason=reason)
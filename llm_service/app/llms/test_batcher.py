@@ -0,0 +1,40 @@
+import asyncio
+import unittest
+
+from llms.batcher import MicroBatcher
+
+def make_bet(team):
+    return {"odds": "-110", "outcome": "WON", "stake": "10.00", "away_team": team, "home_team": None}
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_batched_results_fan_out_and_missing_keys_retry_individually(self):
+        calls = []
+
+        def batch_fn(texts, fields):
+            calls.append(("batch", len(texts)))
+            # Request 1 is missing from the keyed output and must be retried on its own
+            return {str(index): [make_bet(text.split()[-1])] for index, text in enumerate(texts) if index != 1}
+
+        def single_fn(text, fields):
+            calls.append(("single", text))
+            return [make_bet(text.split()[-1])]
+
+        async def run():
+            batcher = MicroBatcher(batch_fn, single_fn, max_batch_size=4, max_wait_ms=50)
+            return await asyncio.gather(*(batcher.submit(f"slip Team{index}", ["odds"]) for index in range(4)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual([result[0]["away_team"] for result in results], ["Team0", "Team1", "Team2", "Team3"])
+        self.assertEqual(calls, [("batch", 4), ("single", "slip Team1")])
+
+    def test_long_texts_bypass_the_batch(self):
+        async def run():
+            batcher = MicroBatcher(lambda texts, fields: {}, lambda text, fields: ["single"], max_text_chars=10)
+            return await batcher.submit("x" * 50, ["odds"])
+
+        self.assertEqual(asyncio.run(run()), ["single"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+# The client configures itself at import; pointing it at a stand-in endpoint needs no API key and no network
+os.environ.setdefault('BTB_GEMINI_API_ENDPOINT', 'http://localhost:11435')
+
+from google.api_core import exceptions as google_exceptions
+
+from llms import gemini_client
+from llms.gemini_client import RateLimitBackoff
+from llms.telemetry import retries
+
+def quota_error(retry_delay: str) -> Exception:
+    # Shaped like the REST client's 429, with the server's RetryInfo in details
+    return google_exceptions.TooManyRequests('Resource has been exhausted (e.g. check quota).', details=[{'retryDelay': retry_delay}])
+
+class TestRateLimitBackoff(unittest.TestCase):
+
+    def test_server_retry_delay_is_honoured(self):
+        backoff = RateLimitBackoff(base_seconds=0.01, max_seconds=60)
+        delay = backoff.penalize(0, quota_error('7s'))
+        self.assertTrue(7 <= delay <= 7.01)
+        self.assertAlmostEqual(backoff.paused_until - time.time(), delay, delta=0.1)
+
+    def test_delay_without_retry_info_backs_off_exponentially_up_to_the_cap(self):
+        backoff = RateLimitBackoff(base_seconds=1, max_seconds=5)
+        self.assertTrue(4 <= backoff.penalize(2, google_exceptions.ServiceUnavailable('overloaded')) <= 5)
+        self.assertTrue(5 <= backoff.penalize(6, google_exceptions.ServiceUnavailable('overloaded')) <= 6)
+
+    def test_one_quota_error_pauses_every_worker(self):
+        backoff = RateLimitBackoff(base_seconds=0.01, max_seconds=60)
+        start = time.time()
+        backoff.penalize(0, quota_error('0.3s'))
+        resumed = []
+        workers = [threading.Thread(target=lambda: (backoff.wait(), resumed.append(time.time() - start))) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(len(resumed), 4)
+        self.assertTrue(all(elapsed >= 0.3 for elapsed in resumed))
+
+    def test_shorter_delay_does_not_shorten_the_pause(self):
+        backoff = RateLimitBackoff(base_seconds=0.01, max_seconds=60)
+        backoff.penalize(0, quota_error('5s'))
+        paused_until = backoff.paused_until
+        backoff.penalize(0, quota_error('1s'))
+        self.assertEqual(backoff.paused_until, paused_until)
+
+class TestGenerateWithBackoff(unittest.TestCase):
+
+    def test_rate_limited_request_is_retried_after_the_pause(self):
+        model = mock.Mock()
+        model.generate_content.side_effect = [quota_error('0.2s'), 'response']
+        before = retries.value(reason='rate_limit')
+        start = time.time()
+        with mock.patch.object(gemini_client, 'rate_limit_backoff', RateLimitBackoff(base_seconds=0.01, max_seconds=60)):
+            self.assertEqual(gemini_client.generate_with_backoff(model, 'prompt'), 'response')
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertEqual(model.generate_content.call_count, 2)
+        self.assertEqual(retries.value(reason='rate_limit') - before, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import app as llm_app
+from llms import lifecycle
+from llms.lifecycle import ServiceReadiness, pull_and_warm, start_background_tasks
+
+class StopOnWait(threading.Event):
+    """Stops the retry loop the first time it backs off instead of sleeping."""
+
+    def wait(self, timeout=None):
+        self.set()
+        return True
+
+class RetryAtOnce(threading.Event):
+    """Retries without sleeping through the backoff."""
+
+    def wait(self, timeout=None):
+        return self.is_set()
+
+def host(pull_errors=()):
+    client = mock.Mock()
+    client.pull.side_effect = [*pull_errors, None]
+    client.generate.return_value = {"model": "mistral", "load_duration": 0}
+    return SimpleNamespace(url="http://ollama-test:11434", client=client)
+
+class TestServiceReadiness(unittest.TestCase):
+
+    def setUp(self):
+        self.readiness = ServiceReadiness()
+        patcher = mock.patch.object(lifecycle, "readiness", self.readiness)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_not_ready_until_marked(self):
+        self.assertFalse(self.readiness.ready)
+        self.assertEqual(self.readiness.snapshot()["status"], "starting")
+        self.assertIsNone(self.readiness.snapshot()["time_to_ready_seconds"])
+
+        self.readiness.mark_ready()
+        snapshot = self.readiness.snapshot()
+        self.assertTrue(snapshot["ready"])
+        self.assertEqual(snapshot["status"], "ready")
+        self.assertGreaterEqual(snapshot["time_to_ready_seconds"], 0)
+
+    def test_unreachable_host_reports_why_it_is_waiting(self):
+        ollama = host(pull_errors=[ConnectionError("connection refused")] * 10)
+        self.assertFalse(pull_and_warm(ollama, ["mistral"], "30m", StopOnWait()))
+        snapshot = self.readiness.snapshot()
+        self.assertFalse(snapshot["ready"])
+        self.assertEqual(snapshot["status"], "waiting for http://ollama-test:11434")
+        self.assertEqual(snapshot["error"], "connection refused")
+        ollama.client.generate.assert_not_called()
+
+    def test_host_that_comes_up_is_warmed(self):
+        ollama = host(pull_errors=[ConnectionError("connection refused")])
+        self.assertTrue(pull_and_warm(ollama, ["mistral"], "30m", RetryAtOnce()))
+        self.assertEqual(ollama.client.pull.call_count, 2)
+        ollama.client.generate.assert_called_once()
+        self.assertFalse(self.readiness.ready)
+
+    def test_ready_at_once_without_ollama_hosts(self):
+        router = mock.Mock(providers=[])
+        stop_event = start_background_tasks(router, ["mistral"], "30m")
+        stop_event.set()
+        self.assertTrue(self.readiness.ready)
+        router.refresh_health.assert_called()
+
+class TestReadyEndpoint(unittest.TestCase):
+
+    def test_ready_gates_on_warm_up(self):
+        readiness = ServiceReadiness()
+        readiness.set_status("loading mistral on http://ollama-test:11434")
+        # Without entering the client the lifespan does not run, so no real warm-up starts
+        client = TestClient(llm_app.app)
+        with mock.patch.object(llm_app, "readiness", readiness), mock.patch.object(lifecycle, "readiness", readiness):
+            response = client.get("/ready")
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()["status"], "loading mistral on http://ollama-test:11434")
+
+            readiness.mark_ready()
+            response = client.get("/ready")
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()["ready"])
+
+if __name__ == '__main__':
+    unittest.main()
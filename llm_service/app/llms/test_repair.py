@@ -0,0 +1,86 @@
+import json
+import unittest
+
+from llms.extraction import attempt_partial_json_parsing
+from llms.repair import expected_payout, repair_extraction, split_slips
+
+FIELDS = ["bet_id", "result", "league", "date", "away_team", "home_team", "wager_team",
+          "bet_type", "selection", "odds", "stake", "payout", "outcome"]
+
+SLIP = """Betslip ID: 1ZR948E37C
+Result:Under 35.5
+Los Angeles Chargers at Pittsburgh Steelers
+9/22/24 • 12:00 PM
+Bet placement Stake Odds Payout (inc Stake)
+9/20/24 • 1:52 PM $37.50 -110 $71.59WON
+Under 35.5Totals"""
+
+OTHER_SLIP = """Betslip ID: 2AB123C45D
+Arkansas +5.5 Spread
+Arkansas at Texas A&M
+9/28/24 • 2:30 PM
+Stake Odds Payout (inc Stake)
+515.00 -105 529.29WON"""
+
+def good_bet(**overrides):
+    bet = {"bet_id": "1ZR948E37C", "result": "Under 35.5", "league": "NFL", "date": "9/22/24 12:00 PM",
+           "away_team": "Los Angeles Chargers", "home_team": "Pittsburgh Steelers", "wager_team": None,
+           "bet_type": "Totals", "selection": "Under 35.5", "odds": "-110", "stake": "37.50",
+           "payout": "71.59", "outcome": "WON"}
+    bet.update(overrides)
+    return bet
+
+class TestRepairExtraction(unittest.TestCase):
+
+    def test_fields_are_repaired_from_the_slip_text(self):
+        bet = good_bet(odds=None, stake="537.50", outcome="won", away_team="Las Vegas Raiders", bet_type="total")
+        repaired = repair_extraction([bet], SLIP, FIELDS)
+        self.assertEqual(repaired, [good_bet()])
+
+    def test_multi_slip_text_repairs_each_bet_from_its_own_slip(self):
+        text = json.dumps([SLIP, OTHER_SLIP])
+        bets = [good_bet(odds=None), good_bet(bet_id="2AB123C45D", odds=None, stake=None, payout="529.29",
+                                              away_team="Arkansas", home_team="Texas A&M")]
+        repaired = repair_extraction(bets, text, FIELDS)
+        self.assertEqual(repaired[0]["odds"], "-110")
+        self.assertEqual((repaired[1]["odds"], repaired[1]["stake"], repaired[1]["payout"]), ("-105", "15.00", "29.29"))
+
+    def test_reprompt_only_asks_for_unresolved_fields(self):
+        calls = []
+
+        def reprompt(text, fields, known):
+            calls.append(fields)
+            return {"outcome": "LOST"}
+
+        slip = "Chargers at Steelers $20.00 -110"
+        bet = {"away_team": "Chargers", "home_team": "Steelers", "odds": "-110", "stake": "20.00", "outcome": None}
+        repaired = repair_extraction([bet], slip, ["away_team", "home_team", "odds", "stake", "payout", "outcome"], reprompt=reprompt)
+        self.assertEqual(calls, [["outcome"]])
+        self.assertEqual(repaired[0]["outcome"], "LOST")
+        self.assertEqual(repaired[0]["payout"], "0.00")
+
+    def test_reprompt_answers_that_break_the_rules_are_discarded(self):
+        bet = {"away_team": "Chargers", "home_team": "Steelers", "odds": "-110", "stake": "20.00", "outcome": None}
+        repaired = repair_extraction([bet], "Chargers at Steelers", list(bet), reprompt=lambda *args: {"outcome": "MAYBE"})
+        self.assertIsNone(repaired[0]["outcome"])
+
+    def test_numbers_from_the_model_become_strings(self):
+        repaired = repair_extraction([good_bet(stake=37.5, payout=71.59)], SLIP, FIELDS)
+        self.assertEqual((repaired[0]["stake"], repaired[0]["payout"]), ("37.50", "71.59"))
+
+class TestHelpers(unittest.TestCase):
+
+    def test_expected_payout_from_american_odds(self):
+        self.assertEqual(str(expected_payout("37.50", "-110", "WON")), "71.59")
+        self.assertEqual(str(expected_payout("10.00", "+150", "WON")), "25.00")
+        self.assertEqual(str(expected_payout("10.00", "+150", "LOST")), "0.00")
+
+    def test_split_slips_drops_header(self):
+        self.assertEqual(len(split_slips("My Bets\n" + SLIP + "\n" + OTHER_SLIP)), 2)
+
+    def test_partial_json_keeps_complete_objects(self):
+        content = '[{"odds": "-110", "teams": {"away": "A"}}, {"odds": "+1'
+        self.assertEqual(attempt_partial_json_parsing(content), [{"odds": "-110", "teams": {"away": "A"}}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from llms.providers import LLMProvider
+from llms.router import ProviderRouter
+
+class FakeProvider(LLMProvider):
+
+    def __init__(self, name, default_model="mistral", fail=False):
+        super().__init__(default_model)
+        self.name = name
+        self.fail = fail
+        self.calls = 0
+
+    def generate(self, system, prompt, model=None, json_mode=False, options=None):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError(f"{self.name} is down")
+        return {"provider": self.name, "response": "[]"}
+
+    def health(self):
+        return not self.fail
+
+class TestProviderRouter(unittest.TestCase):
+
+    def test_fails_over_and_ejects_unhealthy_provider(self):
+        down, up = FakeProvider("down", fail=True), FakeProvider("up")
+        router = ProviderRouter([down, up], failure_threshold=1, cooldown_seconds=60)
+
+        self.assertEqual(router.generate("system", "prompt")["provider"], "up")
+        self.assertEqual(router.generate("system", "prompt")["provider"], "up")
+        self.assertEqual(down.calls, 1)
+
+    def test_prefers_lower_latency_times_queue_depth(self):
+        slow, fast = FakeProvider("slow"), FakeProvider("fast")
+        router = ProviderRouter([slow, fast])
+        router.stats["slow"].latency = 10.0
+        router.stats["fast"].latency = 2.0
+        self.assertEqual(router.candidates()[0].name, "fast")
+
+        router.stats["fast"].in_flight = 5
+        self.assertEqual(router.candidates()[0].name, "slow")
+
+    def test_pinned_model_only_routes_to_providers_serving_it(self):
+        router = ProviderRouter([FakeProvider("nim", default_model="nemotron"), FakeProvider("ollama")])
+        self.assertEqual([provider.name for provider in router.candidates("mistral")], ["ollama"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+
+from llms.segments import ProgressRegistry, process_segments
+
+class TestProcessSegments(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ProgressRegistry()
+
+    def test_results_keep_segment_order(self):
+        # Later segments finish first, results must still line up with the input
+        def worker(segment):
+            time.sleep(0.05 * (4 - segment))
+            return [segment]
+
+        progress = self.registry.create(4)
+        results = process_segments([0, 1, 2, 3], worker, max_workers=4, progress=progress)
+
+        self.assertEqual(results, [[0], [1], [2], [3]])
+        self.assertEqual(progress.snapshot()["completed"], 4)
+
+    def test_failed_segment_is_retried_in_isolation(self):
+        attempts = {}
+        lock = threading.Lock()
+
+        def worker(segment):
+            with lock:
+                attempts[segment] = attempts.get(segment, 0) + 1
+            if segment == "bad" and attempts[segment] == 1:
+                raise RuntimeError("malformed JSON")
+            return [segment]
+
+        progress = self.registry.create(3)
+        results = process_segments(["a", "bad", "c"], worker, max_workers=2, retries=1, backoff_in_seconds=0, progress=progress)
+
+        self.assertEqual(results, [["a"], ["bad"], ["c"]])
+        self.assertEqual(attempts, {"a": 1, "bad": 2, "c": 1})
+        self.assertEqual(progress.snapshot()["retries"], 1)
+
+    def test_exhausted_segment_does_not_drop_others(self):
+        progress = self.registry.create(3)
+        results = process_segments(["a", "", "c"], lambda segment: [segment] if segment else [],
+                                   max_workers=3, retries=1, backoff_in_seconds=0, progress=progress)
+
+        snapshot = progress.snapshot()
+        self.assertEqual(results, [["a"], None, ["c"]])
+        self.assertEqual((snapshot["completed"], snapshot["failed"], snapshot["waiting"], snapshot["in_progress"]), (2, 1, 0, 0))
+        self.assertTrue(snapshot["done"])
+
+    def test_registry_evicts_oldest_jobs(self):
+        registry = ProgressRegistry(max_jobs=2)
+        first = registry.create(1)
+        registry.create(1)
+        registry.create(1)
+
+        self.assertIsNone(registry.get(first.job_id))
+        self.assertEqual(len(registry.list()), 2)
+
+if __name__ == '__main__':
+    unittest.main()
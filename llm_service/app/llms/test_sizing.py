@@ -0,0 +1,61 @@
+import unittest
+
+from llms import sizing
+from llms.sizing import TokenEstimator, expected_bet_count, generation_options
+
+SLIP = """Betslip ID: 1ZR948E37C
+Result:Under 35.5
+Los Angeles Chargers at Pittsburgh Steelers
+9/22/24 • 12:00 PM
+Bet placement Stake Odds Payout (inc Stake)
+9/20/24 • 1:52 PM $37.50 -110 $71.59WON
+Under 35.5Totals
+"""
+
+class TestGenerationOptions(unittest.TestCase):
+
+    def setUp(self):
+        # Sizing reads the shared estimator, which other tests may have calibrated
+        self.estimator = sizing.token_estimator
+        sizing.token_estimator = TokenEstimator()
+
+    def tearDown(self):
+        sizing.token_estimator = self.estimator
+
+    def test_small_prompt_gets_the_minimums(self):
+        options = generation_options("system", SLIP)
+        self.assertEqual(options, {"num_ctx": sizing.btb_min_num_ctx, "num_predict": sizing.btb_min_num_predict})
+
+    def test_output_budget_scales_with_betslips(self):
+        options = generation_options("system", SLIP * 10)
+        self.assertEqual(options["num_predict"], 10 * sizing.btb_tokens_per_bet)
+        self.assertGreater(options["num_predict"], generation_options("system", SLIP * 5)["num_predict"])
+
+    def test_sizes_stay_within_the_limits(self):
+        options = generation_options("system", SLIP * 200)
+        self.assertEqual(options, {"num_ctx": sizing.btb_max_num_ctx, "num_predict": sizing.btb_max_num_predict})
+
+    def test_num_ctx_is_a_power_of_two_bucket(self):
+        num_ctx = generation_options("system", SLIP * 20)["num_ctx"]
+        self.assertTrue(sizing.btb_min_num_ctx <= num_ctx <= sizing.btb_max_num_ctx)
+        self.assertEqual(num_ctx & (num_ctx - 1), 0)
+
+    def test_text_without_betslips_counts_as_one_bet(self):
+        self.assertEqual(expected_bet_count("Chargers at Steelers, Under 35.5 -110, $37.50 WON"), 1)
+        self.assertEqual(expected_bet_count("### Request 1\nA\n### Request 2\nB"), 2)
+        options = generation_options("system", "x" * 40000)
+        self.assertEqual(options["num_predict"], sizing.btb_min_num_predict)
+        self.assertEqual(options["num_ctx"], sizing.btb_max_num_ctx)
+
+class TestTokenEstimator(unittest.TestCase):
+
+    def test_calibrates_from_full_evaluations_only(self):
+        estimator = TokenEstimator(chars_per_token=4.0, alpha=0.5)
+        estimator.observe(3000, 1000)
+        self.assertAlmostEqual(estimator.chars_per_token, 3.5)
+        # A prefix-cache hit reports far fewer tokens than were sent and is ignored
+        estimator.observe(6000, 10)
+        self.assertAlmostEqual(estimator.chars_per_token, 3.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from unittest import mock
+
+from llms import extraction
+from llms.resources import ResourceSampler
+from llms.telemetry import eval_tokens_per_second, load_seconds, record_generation, retries
+
+class TestRecordGeneration(unittest.TestCase):
+
+    def test_ollama_timings_feed_throughput(self):
+        response = {
+            "model": "telemetry-test", "provider": "ollama",
+            "total_duration": 3_000_000_000, "load_duration": 500_000_000,
+            "prompt_eval_count": 400, "prompt_eval_duration": 200_000_000,
+            "eval_count": 100, "eval_duration": 2_000_000_000,
+        }
+        record_generation(response, "single", "v2")
+        labels = '{model="telemetry-test",provider="ollama",request_type="single"}'
+        self.assertEqual(eval_tokens_per_second.snapshot()[labels]["sum"], 50.0)
+        self.assertEqual(load_seconds.snapshot()[labels]["sum"], 0.5)
+
+    def test_token_only_responses_skip_phase_timings(self):
+        # OpenAI-compatible backends report counts but no per-phase durations
+        response = {"model": "telemetry-hosted", "provider": "nim", "total_duration": 1_000_000_000,
+                    "prompt_eval_count": 400, "eval_count": 100}
+        record_generation(response, "batch", "v2")
+        labels = '{model="telemetry-hosted",provider="nim",request_type="batch"}'
+        self.assertNotIn(labels, eval_tokens_per_second.snapshot())
+        self.assertNotIn(labels, load_seconds.snapshot())
+
+class TestResourceSampler(unittest.TestCase):
+
+    def test_second_sample_reports_cpu_utilization(self):
+        sampler = ResourceSampler()
+        sampler.sample()
+        sample = sampler.sample()
+        self.assertGreater(sample["memory_total_bytes"], 0)
+        self.assertGreater(sample["process_rss_bytes"], 0)
+        if "cpu_utilization" in sample:
+            self.assertTrue(0 <= sample["cpu_utilization"] <= 1)
+
+class TestGenerationRetries(unittest.TestCase):
+
+    def test_failing_generation_is_counted_as_retries(self):
+        before = retries.value(reason="ConnectionError")
+        with mock.patch.object(extraction.router, "generate", side_effect=ConnectionError("backend down")) as generate, \
+                mock.patch.object(extraction.time, "sleep"):
+            result = extraction.generate_content_from_model("Betslip ID: 1ZR948E37C", ["bet_id"])
+        self.assertEqual(result, [])
+        self.assertEqual(generate.call_count, 3)
+        # Three attempts are two retries
+        self.assertEqual(retries.value(reason="ConnectionError") - before, 2)
+
+if __name__ == '__main__':
+    unittest.main()
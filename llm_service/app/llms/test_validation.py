@@ -0,0 +1,31 @@
+import unittest
+
+from llms.validation import validate_bet, validate_extraction, is_valid
+
+SLIP_TEXT = "Under 62.5 . Totals WON Result Under 62.5 Mississippi at LSU 10/12/24 6.30 PM Stake Odds Payout (inc Stake) 525.00 -110 547.73 Details"
+
+class TestValidateBet(unittest.TestCase):
+
+    def setUp(self):
+        self.bet = {
+            "bet_id": None, "result": "Under 62.5", "league": "NCAAF", "date": "10/12/24 6:30 PM",
+            "away_team": "Mississippi", "home_team": "LSU", "wager_team": None, "bet_type": "Totals",
+            "selection": "Under 62.5", "odds": "-110", "stake": "25.00", "payout": "47.73", "outcome": "WON",
+        }
+
+    def test_clean_bet_passes(self):
+        self.assertEqual(validate_bet(self.bet, SLIP_TEXT), {})
+
+    def test_rule_violations_are_reported_per_field(self):
+        self.bet.update({"odds": "110", "outcome": "WIN", "stake": "525.00", "home_team": "Alabama"})
+
+        issues = validate_bet(self.bet, SLIP_TEXT)
+
+        self.assertEqual(set(issues), {"odds", "outcome", "stake", "home_team"})
+
+    def test_empty_output_is_rejected(self):
+        self.assertFalse(is_valid(validate_extraction([], SLIP_TEXT)))
+        self.assertTrue(is_valid(validate_extraction(self.bet, SLIP_TEXT)))
+
+if __name__ == '__main__':
+    unittest.main()
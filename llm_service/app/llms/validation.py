@@ -0,0 +1,79 @@
+import os
+import re
+from decimal import Decimal, InvalidOperation
+
+from service_models.models import BetOutcome
+
+# Rules applied to extracted bets before they are accepted from a model tier
+# Matches the prompt's assumption that stakes above $100 are OCR errors (e.g. '$25.00' read as '525.00')
+btb_max_stake = Decimal(os.getenv('BTB_MAX_STAKE', '100'))
+
+ODDS_PATTERN = re.compile(r'^[+-]\d{3,5}$|^EVEN$', re.IGNORECASE)
+VALID_OUTCOMES = {outcome.value for outcome in BetOutcome}
+_NON_WORD = re.compile(r'[^a-z0-9&]+')
+
+def normalize_text(text: str) -> str:
+    return _NON_WORD.sub(' ', str(text).lower()).strip()
+
+def parse_amount(value):
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value).replace('$', '').replace(',', '').strip())
+    except InvalidOperation:
+        return None
+
+# A team counts as present if the full name or every significant word of it appears in the OCR text
+def team_in_text(team: str, normalized_text: str) -> bool:
+    normalized_team = normalize_text(team)
+    if not normalized_team:
+        return False
+    if normalized_team in normalized_text:
+        return True
+    words = [word for word in normalized_team.split() if len(word) > 2]
+    text_words = set(normalized_text.split())
+    return bool(words) and all(word in text_words for word in words)
+
+# Validate one extracted bet, returning {field: reason} for every rule it breaks
+def validate_bet(bet: dict, source_text: str) -> dict:
+    if not isinstance(bet, dict):
+        return {"bet": f"expected an object, got {type(bet).__name__}"}
+
+    issues = {}
+    odds = bet.get("odds")
+    if odds is None or not ODDS_PATTERN.match(str(odds).strip()):
+        issues["odds"] = f"invalid odds {odds!r}"
+
+    outcome = str(bet.get("outcome") or '').upper()
+    if outcome not in VALID_OUTCOMES:
+        issues["outcome"] = f"invalid outcome {bet.get('outcome')!r}"
+
+    stake = parse_amount(bet.get("stake"))
+    if stake is None or stake <= 0 or stake > btb_max_stake:
+        issues["stake"] = f"implausible stake {bet.get('stake')!r}"
+
+    if bet.get("payout") is not None:
+        payout = parse_amount(bet.get("payout"))
+        if payout is None or payout < 0:
+            issues["payout"] = f"invalid payout {bet.get('payout')!r}"
+
+    normalized_text = normalize_text(source_text)
+    teams = [field for field in ("away_team", "home_team") if bet.get(field)]
+    if not teams:
+        issues["away_team"] = "no teams extracted"
+    for field in teams:
+        if not team_in_text(bet[field], normalized_text):
+            issues[field] = f"{bet[field]!r} not found in text"
+
+    return issues
+
+# Validate a full model output; an empty or non-list result is always rejected
+def validate_extraction(parsed_data, source_text: str) -> list:
+    if isinstance(parsed_data, dict):
+        parsed_data = [parsed_data]
+    if not parsed_data or not isinstance(parsed_data, list):
+        return [{"bet": "no bets extracted"}]
+    return [validate_bet(bet, source_text) for bet in parsed_data]
+
+def is_valid(issues: list) -> bool:
+    return not any(issues)
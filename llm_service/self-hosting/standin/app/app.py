@@ -0,0 +1,394 @@
+# External Python Dependencies
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+# Internal Python Dependencies
+from corpus import ResponseCorpus, build_reply
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+APP_DIR = Path(__file__).resolve().parent
+# Only set when running from a checkout; the image runs from /app, which has no repository around it
+REPO_DIR = APP_DIR.parents[3] if len(APP_DIR.parents) > 3 else None
+
+# Recorded outputs to replay; the dockerfile copies them into ./recordings
+default_recordings = [APP_DIR / 'recordings' / 'steps.log', APP_DIR / 'recordings' / 'mgm_latest.json']
+if REPO_DIR is not None:
+    default_recordings += [
+        REPO_DIR / 'docs' / 'demo' / 'steps.log',
+        REPO_DIR / 'api' / 'app' / 'sportsbooks' / 'mgm' / 'processed' / 'mgm_latest.json',
+    ]
+standin_recordings = os.getenv('STANDIN_RECORDINGS') or ','.join(str(path) for path in default_recordings)
+# Models reported by /api/tags and /v1/models (any other name is pulled on demand)
+standin_models = [model.strip() for model in os.getenv('STANDIN_MODELS', 'mistral').split(',') if model.strip()]
+# Fixed per-request overhead, drawn from fixed | uniform | normal | lognormal with the given mean and spread
+standin_latency_distribution = os.getenv('STANDIN_LATENCY_DISTRIBUTION', 'lognormal')
+standin_latency_ms = float(os.getenv('STANDIN_LATENCY_MS', '150'))
+standin_latency_jitter_ms = float(os.getenv('STANDIN_LATENCY_JITTER_MS', '50'))
+# Generation and prompt-evaluation rates, roughly a 7B model on a single consumer GPU
+standin_tokens_per_second = float(os.getenv('STANDIN_TOKENS_PER_SECOND', '40'))
+standin_prompt_tokens_per_second = float(os.getenv('STANDIN_PROMPT_TOKENS_PER_SECOND', '1000'))
+standin_chars_per_token = float(os.getenv('STANDIN_CHARS_PER_TOKEN', '3.5'))
+# Model (re)load time: first use of a model and any change of num_ctx, as with a real Ollama runner
+standin_load_ms = float(os.getenv('STANDIN_LOAD_MS', '3000'))
+# Concurrent generations (OLLAMA_NUM_PARALLEL) and queued requests before answering 503 (OLLAMA_MAX_QUEUE)
+standin_parallel = int(os.getenv('STANDIN_PARALLEL', '4'))
+standin_max_queue = int(os.getenv('STANDIN_MAX_QUEUE', '512'))
+# Fault injection: malformed JSON output and HTTP 500s, as fractions of requests
+standin_malformed_rate = float(os.getenv('STANDIN_MALFORMED_RATE', '0'))
+standin_malformed_modes = [mode.strip() for mode in os.getenv('STANDIN_MALFORMED_MODES', 'truncate,prose,trailing_comma,single_quotes').split(',') if mode.strip()]
+standin_error_rate = float(os.getenv('STANDIN_ERROR_RATE', '0'))
+# Hosted-API quota for the OpenAI and Gemini routes: requests per minute before answering 429 (0 disables)
+standin_rate_limit_rpm = int(os.getenv('STANDIN_RATE_LIMIT_RPM', '0'))
+# Multiplies every simulated delay; 0 answers instantly with the same reported timings
+standin_time_scale = float(os.getenv('STANDIN_TIME_SCALE', '1'))
+standin_seed = os.getenv('STANDIN_SEED', '0')
+
+corpus = ResponseCorpus().load([path for path in standin_recordings.split(',') if path])
+app = FastAPI()
+
+# Shared simulator state: loaded models, cached prompt prefixes, slot usage and counters
+class StandinState:
+    def __init__(self):
+        self.slots = asyncio.Semaphore(standin_parallel)
+        self.queued = 0
+        self.in_flight = 0
+        self.loaded = {}
+        self.cached_prefixes = set()
+        self.attempts = Counter()
+        self.stats = Counter()
+        self.recent_requests = deque()
+
+state = StandinState()
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text or '') / standin_chars_per_token)
+
+# Seeded per request and attempt so a run is reproducible while retries of the same prompt can still differ
+def request_rng(model: str, system: str, prompt: str) -> random.Random:
+    digest = hashlib.sha256(f'{model}\0{system}\0{prompt}'.encode('utf-8')).hexdigest()
+    state.attempts[digest] += 1
+    return random.Random(f'{standin_seed}:{digest}:{state.attempts[digest]}')
+
+def sample_latency_ms(rng: random.Random) -> float:
+    mean, spread = standin_latency_ms, standin_latency_jitter_ms
+    if standin_latency_distribution == 'fixed' or spread <= 0:
+        return mean
+    if standin_latency_distribution == 'uniform':
+        return max(0.0, rng.uniform(mean - spread, mean + spread))
+    if standin_latency_distribution == 'normal':
+        return max(0.0, rng.gauss(mean, spread))
+    # Lognormal with the requested mean and standard deviation: a long right tail like real serving latency
+    sigma = math.sqrt(math.log(1 + (spread / mean) ** 2)) if mean > 0 else 0.0
+    return rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma) if mean > 0 else 0.0
+
+def corrupt(text: str, rng: random.Random) -> str:
+    mode = rng.choice(standin_malformed_modes)
+    state.stats[f'malformed_{mode}'] += 1
+    if mode == 'truncate':
+        return text[:max(1, int(len(text) * rng.uniform(0.5, 0.95)))]
+    if mode == 'prose':
+        return f'Here is the extracted data:\n```json\n{text}\n```'
+    if mode == 'trailing_comma':
+        return text[:-1] + ',' + text[-1:] if text else text
+    return text.replace('"', "'")
+
+# Produce the reply text plus Ollama-style timings (nanoseconds) for one generation
+def simulate(model: str, system: str, prompt: str, options: dict) -> dict:
+    rng = request_rng(model, system, prompt)
+    options = options or {}
+    num_ctx = options.get('num_ctx', 2048)
+
+    load_ms = 0.0
+    if state.loaded.get(model) != num_ctx:
+        load_ms = standin_load_ms
+        state.loaded[model] = num_ctx
+        state.cached_prefixes = {prefix for prefix in state.cached_prefixes if prefix[0] != model}
+
+    # A system prefix evaluated before on this model is served from the KV cache
+    prefix_key = (model, hashlib.sha256((system or '').encode('utf-8')).hexdigest())
+    prompt_eval_count = count_tokens(prompt) + (0 if prefix_key in state.cached_prefixes else count_tokens(system))
+    state.cached_prefixes.add(prefix_key)
+
+    if not (prompt or '').strip():
+        text, done_reason = '', 'load'
+    else:
+        text = json.dumps(build_reply(corpus, system or '', prompt), separators=(',', ':'))
+        done_reason = 'stop'
+        if rng.random() < standin_malformed_rate:
+            text = corrupt(text, rng)
+        # num_predict caps output exactly like the real runner, so undersized budgets truncate the JSON
+        num_predict = options.get('num_predict', -1)
+        if num_predict and num_predict > 0 and count_tokens(text) > num_predict:
+            text = text[:int(num_predict * standin_chars_per_token)]
+            done_reason = 'length'
+            state.stats['truncated_by_num_predict'] += 1
+
+    eval_count = count_tokens(text)
+    overhead_ms = sample_latency_ms(rng)
+    prompt_eval_ms = prompt_eval_count / standin_prompt_tokens_per_second * 1000
+    eval_ms = eval_count / standin_tokens_per_second * 1000 if eval_count else 0.0
+    return {
+        "text": text,
+        "done_reason": done_reason,
+        "fail": rng.random() < standin_error_rate,
+        "load_ms": load_ms,
+        "overhead_ms": overhead_ms,
+        "prompt_eval_ms": prompt_eval_ms,
+        "eval_ms": eval_ms,
+        "prompt_eval_count": prompt_eval_count,
+        "eval_count": eval_count,
+    }
+
+def timings(result: dict) -> dict:
+    total_ms = result["load_ms"] + result["overhead_ms"] + result["prompt_eval_ms"] + result["eval_ms"]
+    return {
+        "total_duration": int(total_ms * 1e6),
+        "load_duration": int(result["load_ms"] * 1e6),
+        "prompt_eval_count": result["prompt_eval_count"],
+        "prompt_eval_duration": int(result["prompt_eval_ms"] * 1e6),
+        "eval_count": result["eval_count"],
+        "eval_duration": int(result["eval_ms"] * 1e6),
+    }
+
+async def sleep_ms(milliseconds: float):
+    if standin_time_scale > 0 and milliseconds > 0:
+        await asyncio.sleep(milliseconds * standin_time_scale / 1000)
+
+def busy_response():
+    state.stats['rejected_busy'] += 1
+    return JSONResponse(status_code=503, content={"error": "server busy, please try again.  maximum pending requests exceeded"})
+
+# Sliding one-minute window; returns seconds until a slot frees up, or 0 when the request may proceed
+def rate_limit_delay() -> float:
+    if standin_rate_limit_rpm <= 0:
+        return 0.0
+    now = time.time()
+    while state.recent_requests and now - state.recent_requests[0] >= 60:
+        state.recent_requests.popleft()
+    if len(state.recent_requests) >= standin_rate_limit_rpm:
+        state.stats['rejected_rate_limit'] += 1
+        return 60 - (now - state.recent_requests[0])
+    state.recent_requests.append(now)
+    return 0.0
+
+def error_response():
+    state.stats['injected_errors'] += 1
+    return JSONResponse(status_code=500, content={"error": "injected stand-in failure"})
+
+def release_slot():
+    state.in_flight -= 1
+    state.slots.release()
+
+# Run one generation inside a parallel slot. Non-streaming requests hold the slot for the whole
+# simulated duration; streaming requests hand it to the token generator, which releases it when done.
+async def run_generation(model: str, system: str, prompt: str, options: dict, stream_chunk, finish):
+    if state.queued >= standin_max_queue:
+        return busy_response()
+    state.queued += 1
+    await state.slots.acquire()
+    state.queued -= 1
+    state.in_flight += 1
+    state.stats['requests'] += 1
+    streaming = False
+    try:
+        result = simulate(model, system, prompt, options)
+        if result["fail"]:
+            await sleep_ms(result["overhead_ms"])
+            return error_response()
+        await sleep_ms(result["load_ms"] + result["overhead_ms"] + result["prompt_eval_ms"])
+        if stream_chunk is None:
+            await sleep_ms(result["eval_ms"])
+            return finish(result)
+        streaming = True
+        return stream_tokens(result, stream_chunk, finish)
+    finally:
+        if not streaming:
+            release_slot()
+
+async def stream_tokens(result: dict, stream_chunk, finish):
+    try:
+        text = result["text"]
+        step = max(1, int(standin_chars_per_token))
+        per_token_ms = 1000 / standin_tokens_per_second
+        for start in range(0, len(text), step):
+            await sleep_ms(per_token_ms)
+            yield stream_chunk(text[start:start + step])
+        yield finish(result)
+    finally:
+        release_slot()
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+def _ndjson(payload: dict) -> str:
+    return json.dumps(payload) + '\n'
+
+def _model_entry(name: str) -> dict:
+    digest = hashlib.sha256(name.encode('utf-8')).hexdigest()
+    return {"name": name, "model": name, "modified_at": _now(), "size": 4_100_000_000, "digest": digest,
+            "details": {"format": "gguf", "family": "standin", "parameter_size": "7B", "quantization_level": "Q4_0"}}
+
+# Ollama: /api/generate
+@app.post('/api/generate')
+async def generate(request: Request):
+    body = await request.json()
+    model, system, prompt = body.get('model') or standin_models[0], body.get('system') or '', body.get('prompt') or ''
+    base = {"model": model}
+
+    def chunk(piece):
+        return _ndjson({**base, "created_at": _now(), "response": piece, "done": False})
+
+    def finish(result):
+        payload = {**base, "created_at": _now(), "response": "" if body.get('stream', True) else result["text"],
+                   "done": True, "done_reason": result["done_reason"], **timings(result)}
+        return _ndjson(payload) if body.get('stream', True) else payload
+
+    result = await run_generation(model, system, prompt, body.get('options'), chunk if body.get('stream', True) else None, finish)
+    if isinstance(result, (dict, JSONResponse)):
+        return result
+    return StreamingResponse(result, media_type='application/x-ndjson')
+
+# Ollama: /api/chat
+@app.post('/api/chat')
+async def chat(request: Request):
+    body = await request.json()
+    model = body.get('model') or standin_models[0]
+    messages = body.get('messages') or []
+    system = '\n'.join(message.get('content', '') for message in messages if message.get('role') == 'system')
+    prompt = next((message.get('content', '') for message in reversed(messages) if message.get('role') == 'user'), '')
+    stream = body.get('stream', True)
+
+    def chunk(piece):
+        return _ndjson({"model": model, "created_at": _now(), "message": {"role": "assistant", "content": piece}, "done": False})
+
+    def finish(result):
+        payload = {"model": model, "created_at": _now(), "message": {"role": "assistant", "content": "" if stream else result["text"]},
+                   "done": True, "done_reason": result["done_reason"], **timings(result)}
+        return _ndjson(payload) if stream else payload
+
+    result = await run_generation(model, system, prompt, body.get('options'), chunk if stream else None, finish)
+    if isinstance(result, (dict, JSONResponse)):
+        return result
+    return StreamingResponse(result, media_type='application/x-ndjson')
+
+# Ollama: /api/pull always succeeds instantly; the first generation pays the load time instead
+@app.post('/api/pull')
+async def pull(request: Request):
+    body = await request.json()
+    model = body.get('model') or body.get('name')
+    if model not in standin_models:
+        standin_models.append(model)
+    if body.get('stream', True):
+        lines = [{"status": "pulling manifest"}, {"status": "verifying sha256 digest"}, {"status": "success"}]
+        return StreamingResponse((_ndjson(line) for line in lines), media_type='application/x-ndjson')
+    return {"status": "success"}
+
+# Ollama: /api/ps lists models currently loaded
+@app.get('/api/ps')
+async def ps():
+    expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat()
+    return {"models": [{**_model_entry(model), "expires_at": expires_at, "size_vram": 4_100_000_000, "context_length": num_ctx}
+                       for model, num_ctx in state.loaded.items()]}
+
+# Ollama: /api/tags lists models available locally
+@app.get('/api/tags')
+async def tags():
+    return {"models": [_model_entry(model) for model in standin_models]}
+
+# OpenAI-compatible: /v1/chat/completions (NIM, Gemini's OpenAI endpoint and most hosted APIs)
+@app.post('/v1/chat/completions')
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get('model') or standin_models[0]
+    messages = body.get('messages') or []
+    system = '\n'.join(message.get('content', '') for message in messages if message.get('role') == 'system')
+    prompt = next((message.get('content', '') for message in reversed(messages) if message.get('role') == 'user'), '')
+    options = {"num_predict": body.get('max_tokens')} if body.get('max_tokens') else {}
+    completion_id = f'chatcmpl-{uuid.uuid4().hex[:12]}'
+    created = int(time.time())
+    stream = body.get('stream', False)
+
+    def chunk(piece):
+        return 'data: ' + json.dumps({"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                                      "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}) + '\n\n'
+
+    def finish(result):
+        finish_reason = 'length' if result["done_reason"] == 'length' else 'stop'
+        usage = {"prompt_tokens": result["prompt_eval_count"], "completion_tokens": result["eval_count"],
+                 "total_tokens": result["prompt_eval_count"] + result["eval_count"]}
+        if stream:
+            final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}], "usage": usage}
+            return 'data: ' + json.dumps(final) + '\n\ndata: [DONE]\n\n'
+        return {"id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": result["text"]}, "finish_reason": finish_reason}],
+                "usage": usage}
+
+    if delay := rate_limit_delay():
+        return JSONResponse(status_code=429, headers={"retry-after": str(math.ceil(delay))},
+                            content={"error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}})
+    result = await run_generation(model, system, prompt, options, chunk if stream else None, finish)
+    if isinstance(result, (dict, JSONResponse)):
+        return result
+    return StreamingResponse(result, media_type='text/event-stream')
+
+def _gemini_text(content) -> str:
+    if not content:
+        return ''
+    return ''.join(part.get('text', '') for part in content.get('parts', []))
+
+# Gemini REST: generateContent, as called by google-generativeai with transport='rest'
+@app.post('/v1beta/models/{model}:generateContent')
+async def gemini_generate_content(model: str, request: Request):
+    body = await request.json()
+    system = _gemini_text(body.get('systemInstruction') or body.get('system_instruction'))
+    contents = body.get('contents') or []
+    prompt = _gemini_text(next((content for content in reversed(contents) if content.get('role', 'user') == 'user'), None))
+    config = body.get('generationConfig') or body.get('generation_config') or {}
+    max_tokens = config.get('maxOutputTokens') or config.get('max_output_tokens')
+    options = {"num_predict": max_tokens} if max_tokens else {}
+
+    # Quota errors carry a RetryInfo detail, like the real API
+    if delay := rate_limit_delay():
+        return JSONResponse(status_code=429, content={"error": {
+            "code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED",
+            "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{math.ceil(delay)}s"}]}})
+
+    def finish(result):
+        return {
+            "candidates": [{"content": {"parts": [{"text": result["text"]}], "role": "model"},
+                            "finishReason": "MAX_TOKENS" if result["done_reason"] == 'length' else "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": result["prompt_eval_count"], "candidatesTokenCount": result["eval_count"],
+                              "totalTokenCount": result["prompt_eval_count"] + result["eval_count"]},
+            "modelVersion": model,
+        }
+
+    return await run_generation(model, system, prompt, options, None, finish)
+
+@app.get('/v1/models')
+async def models():
+    return {"object": "list", "data": [{"id": model, "object": "model", "created": 0, "owned_by": "standin"} for model in standin_models]}
+
+# Stand-in Status Endpoint
+@app.get('/standin/stats')
+async def stats():
+    return {"in_flight": state.in_flight, "queued": state.queued, "parallel": standin_parallel,
+            "loaded": state.loaded, "counters": dict(state.stats)}
+
+@app.get('/')
+async def root():
+    return 'Ollama is running'
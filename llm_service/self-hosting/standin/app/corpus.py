@@ -0,0 +1,168 @@
+import ast
+import hashlib
+import json
+import logging
+import re
+from pathlib import Path
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Keys of BetExtractionDetails, used when a prompt's schema cannot be read
+DEFAULT_KEYS = ("bet_id", "result", "league", "date", "away_team", "home_team", "wager_team",
+                "bet_type", "selection", "odds", "stake", "payout", "outcome")
+
+EXTRACTED_TEXT_PATTERN = re.compile(r'llm_service\S*\s+\|.*? - Extracted text: (.*)$')
+PARSED_DATA_PATTERN = re.compile(r'llm_service\S*\s+\|.*? - Parsed data: (.*)$')
+BET_ID_PATTERN = re.compile(r'Betslip ID:?\s*(\w+)', re.IGNORECASE)
+SLIP_SPLIT_PATTERN = re.compile(r'(?=Betslip ID)', re.IGNORECASE)
+REQUEST_PATTERN = re.compile(r'^### Request (\d+)\nText: (.*?)(?=\n\n### Request \d+\n|\nJSON:\s*$)', re.MULTILINE | re.DOTALL)
+TEXT_PATTERN = re.compile(r'Text: (.*?)\nJSON:\s*$', re.DOTALL)
+KNOWN_PATTERN = re.compile(r'^Bet: (\{.*\})$', re.MULTILINE)
+# Loose patterns for slips that were never recorded, so synthesized bets still look like the text
+WAGER_PATTERN = re.compile(r'[$S]?(\d+\.\d{2})\s+([+-]\d{3,5}|EVEN)\b(?:\s+[$S]?(\d+\.\d{2}))?')
+MATCHUP_PATTERN = re.compile(r"([A-Z][\w&.'-]*(?:\s+[A-Z][\w&.'-]*)*)\s+(?:at|vs\.?|@)\s+([A-Z][\w&.'-]*(?:\s+[A-Z][\w&.'-]*)*)")
+OUTCOME_PATTERN = re.compile(r'(?<![A-Z])(WON|LOST|PUSH|PENDING)(?![A-Z])')
+BET_TYPE_PATTERN = re.compile(r'(?<![a-z])(Moneyline|Spread|Totals|Prop|Future)(?![a-z])', re.IGNORECASE)
+DATE_PATTERN = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}\s*[•.]?\s*\d{1,2}[:.]\d{2}\s*[AP]M')
+
+def _normalize(text: str) -> str:
+    return ' '.join(str(text).split()).lower()
+
+# Recorded extractions to replay: LLM-service log pairs and processed MGM exports
+class ResponseCorpus:
+    def __init__(self):
+        self.by_text = {}
+        self.by_bet_id = {}
+
+    def load(self, paths: list):
+        for path in paths:
+            path = Path(path)
+            if not path.exists():
+                logging.warning(f'Recording {path} not found, skipping')
+                continue
+            if path.suffix == '.json':
+                self.load_processed_bets(path)
+            else:
+                self.load_service_log(path)
+        logging.info(f'Loaded {len(self.by_text)} recorded texts and {len(self.by_bet_id)} recorded bets')
+        return self
+
+    # Pair each "Extracted text" line from the LLM service with the next "Parsed data" line
+    def load_service_log(self, path: Path):
+        pending_text = None
+        for line in path.read_text(encoding='utf-8').splitlines():
+            if match := EXTRACTED_TEXT_PATTERN.search(line):
+                pending_text = match.group(1)
+            elif (match := PARSED_DATA_PATTERN.search(line)) and pending_text is not None:
+                try:
+                    bets = ast.literal_eval(match.group(1))
+                except (ValueError, SyntaxError):
+                    continue
+                bets = bets if isinstance(bets, list) else [bets]
+                self.by_text[_normalize(pending_text)] = bets
+                for bet in bets:
+                    if isinstance(bet, dict) and bet.get('bet_id'):
+                        self.by_bet_id[bet['bet_id']] = bet
+                pending_text = None
+
+    # Processed exports use the older risk/to_win names for stake/payout
+    def load_processed_bets(self, path: Path):
+        for bet in json.loads(path.read_text(encoding='utf-8')):
+            if not isinstance(bet, dict) or not bet.get('bet_id'):
+                continue
+            bet = dict(bet)
+            bet.setdefault('stake', bet.pop('risk', None))
+            bet.setdefault('payout', bet.pop('to_win', None))
+            bet.pop('user_id', None)
+            bet.pop('upload_timestamp', None)
+            self.by_bet_id[bet['bet_id']] = bet
+
+    def lookup(self, text: str) -> list:
+        text = _decode_segment(text)
+        if (bets := self.by_text.get(_normalize(text))) is not None:
+            return [dict(bet) for bet in bets]
+        slips = [slip for slip in SLIP_SPLIT_PATTERN.split(text) if slip.strip()] or [text]
+        bets = []
+        for slip in slips:
+            match = BET_ID_PATTERN.search(slip)
+            if match and match.group(1) in self.by_bet_id:
+                bets.append(dict(self.by_bet_id[match.group(1)]))
+            elif match or len(slips) == 1:
+                bets.append(synthesize_bet(slip))
+        return bets
+
+def _decode_segment(text: str) -> str:
+    # Segment requests carry a JSON list of slip texts
+    try:
+        decoded = json.loads(text)
+        if isinstance(decoded, list):
+            return '\n\n'.join(str(part) for part in decoded)
+    except ValueError:
+        pass
+    return text
+
+# A stable bet derived from the slip text, for slips that were never recorded
+def synthesize_bet(text: str) -> dict:
+    digest = int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16)
+    bet = {key: None for key in DEFAULT_KEYS}
+    if match := BET_ID_PATTERN.search(text):
+        bet["bet_id"] = match.group(1)
+    if match := MATCHUP_PATTERN.search(text):
+        bet["away_team"], bet["home_team"] = match.group(1), match.group(2)
+    else:
+        bet["away_team"], bet["home_team"] = f'Team {digest % 97}', f'Team {digest % 89 + 100}'
+    if match := WAGER_PATTERN.search(text):
+        bet["stake"], bet["odds"], bet["payout"] = match.groups()
+    else:
+        bet["stake"], bet["odds"] = f'{10 + digest % 40}.00', ('-110', '+120', '-105', '+150')[digest % 4]
+    if match := OUTCOME_PATTERN.search(text):
+        bet["outcome"] = match.group(1)
+    else:
+        bet["outcome"] = ('WON', 'LOST')[digest % 2]
+    if match := BET_TYPE_PATTERN.search(text):
+        bet["bet_type"] = match.group(1).capitalize()
+    else:
+        bet["bet_type"] = ('Moneyline', 'Spread', 'Totals')[digest % 3]
+    if match := DATE_PATTERN.search(text):
+        bet["date"] = match.group(0)
+    return bet
+
+# The schema in every extraction prompt is a JSON object whose values are all null
+def requested_keys(system: str) -> tuple:
+    decoder = json.JSONDecoder()
+    position = system.find('{')
+    while position != -1:
+        try:
+            value, _ = decoder.raw_decode(system, position)
+            if isinstance(value, dict) and value and all(field is None for field in value.values()):
+                return tuple(value)
+        except ValueError:
+            pass
+        position = system.find('{', position + 1)
+    return DEFAULT_KEYS
+
+def _project(bet: dict, keys: tuple) -> dict:
+    return {key: bet.get(key) for key in keys}
+
+# Build the reply the real model would give for one of the LLM service's prompt shapes
+def build_reply(corpus: ResponseCorpus, system: str, prompt: str):
+    keys = requested_keys(system or '')
+    # Batched prompt: {"0": [...], "1": [...]}
+    requests = REQUEST_PATTERN.findall(prompt)
+    if requests:
+        return {index: [_project(bet, keys) for bet in corpus.lookup(text)] for index, text in requests}
+
+    match = TEXT_PATTERN.search(prompt)
+    text = match.group(1) if match else prompt
+    bets = corpus.lookup(text)
+    # Targeted field re-prompt: a single object holding only the requested keys
+    if known_match := KNOWN_PATTERN.search(prompt):
+        try:
+            known = json.loads(known_match.group(1))
+        except ValueError:
+            known = {}
+        bet = next((bet for bet in bets if known.get('bet_id') and bet.get('bet_id') == known.get('bet_id')), bets[0] if bets else {})
+        return _project(bet, keys)
+    return [_project(bet, keys) for bet in bets]
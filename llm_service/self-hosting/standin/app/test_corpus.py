@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from corpus import ResponseCorpus, build_reply, requested_keys
+
+APP_DIR = Path(__file__).resolve().parent
+REPO_DIR = Path(__file__).resolve().parents[4]
+SYSTEM = 'Reply with only a JSON list using exactly these keys:\n{"bet_id":null,"odds":null,"stake":null}\nRules: ...'
+RECORDED_TEXT = ("Under 62.5 . Totals WON Result Under 62.5 Mississippi at LSU 10/12/24 6.30 PM "
+                 "Stake Odds Payout (inc Stake) 525.00 -110 547.73 Details")
+
+class TestBuildReply(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = ResponseCorpus().load([
+            REPO_DIR / 'docs' / 'demo' / 'steps.log',
+            REPO_DIR / 'api' / 'app' / 'sportsbooks' / 'mgm' / 'processed' / 'mgm_latest.json',
+        ])
+
+    def test_schema_keys_are_read_from_the_system_prompt(self):
+        self.assertEqual(requested_keys(SYSTEM), ("bet_id", "odds", "stake"))
+
+    def test_recorded_text_replays_the_recorded_output(self):
+        reply = build_reply(self.corpus, SYSTEM, f"Text: {RECORDED_TEXT}\nJSON:")
+        self.assertEqual(reply, [{"bet_id": None, "odds": "-110", "stake": "25.00"}])
+
+    def test_segments_replay_recorded_bets_by_betslip_id(self):
+        segment = json.dumps(["Betslip ID: 1ZRZWRLCGX\nMichigan at Washington", "Betslip ID: 1ZRZAF9B68\nArmy at Tulsa"])
+        reply = build_reply(self.corpus, SYSTEM, f"Text: {segment}\nJSON:")
+        self.assertEqual([bet["bet_id"] for bet in reply], ["1ZRZWRLCGX", "1ZRZAF9B68"])
+        self.assertEqual(reply[0]["stake"], "15.00")
+
+    def test_batched_and_field_prompts_keep_their_shapes(self):
+        batch = build_reply(self.corpus, SYSTEM, f"### Request 0\nText: {RECORDED_TEXT}\n\n### Request 1\nText: Chargers at Steelers $20.00 -110\nJSON:")
+        self.assertEqual(set(batch), {"0", "1"})
+        self.assertEqual(batch["1"][0]["odds"], "-110")
+
+        field_system = 'Reply with only a JSON object with exactly these keys: {"outcome":null}'
+        reply = build_reply(self.corpus, field_system, 'Bet: {"bet_id":"1ZRZAF9B68"}\nText: Betslip ID: 1ZRZAF9B68\nJSON:')
+        self.assertEqual(reply, {"outcome": "WON"})
+
+    def test_unrecorded_slips_are_stable(self):
+        prompt = "Text: Betslip ID: NEW123\nChargers at Steelers\nJSON:"
+        self.assertEqual(build_reply(self.corpus, SYSTEM, prompt), build_reply(self.corpus, SYSTEM, prompt))
+
+class TestImageLayout(unittest.TestCase):
+
+    def test_app_imports_from_a_shallow_directory(self):
+        # The image runs app.py from /app with the recordings copied next to it
+        with tempfile.TemporaryDirectory() as directory:
+            if len(Path(directory).resolve().parents) > 3:
+                self.skipTest(f"{directory} is too deep to stand in for /app")
+            for name in ('app.py', 'corpus.py'):
+                shutil.copy(APP_DIR / name, directory)
+            os.mkdir(os.path.join(directory, 'recordings'))
+            shutil.copy(REPO_DIR / 'api' / 'app' / 'sportsbooks' / 'mgm' / 'processed' / 'mgm_latest.json', os.path.join(directory, 'recordings'))
+            env = {key: value for key, value in os.environ.items() if key != 'STANDIN_RECORDINGS'}
+            result = subprocess.run([sys.executable, '-c', 'import app; print(app.REPO_DIR, len(app.corpus.by_bet_id) > 0)'],
+                                    cwd=directory, env=env, capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ['None', 'True'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+from pathlib import Path
+import httpx
+from PyPDF2 import PdfReader
+
+# Drives the Gemini client's MGM path against the stand-in's generateContent route (llm_service/self-hosting/standin).
+# Start the stand-in, e.g. docker compose --profile standin up ollama_standin (published on 11435), optionally with
+# STANDIN_RATE_LIMIT_RPM set to exercise the shared 429 backoff. The client is configured at import, so the endpoint
+# must be set before it is imported.
+STANDIN_URL = os.getenv("BTB_GEMINI_API_ENDPOINT", "http://localhost:11435")
+os.environ["BTB_GEMINI_API_ENDPOINT"] = STANDIN_URL
+REPO_DIR = Path(__file__).resolve().parents[2]
+sys.path[:0] = [str(REPO_DIR / "llm_service" / "app"), str(REPO_DIR)]
+
+from llms.gemini_client import btb_gemini_max_concurrency, parse_mgm_pdf_inputs
+from llms.telemetry import retries
+
+DEFAULT_PDF = REPO_DIR / "api" / "app" / "sportsbooks" / "mgm" / "BetMGM.pdf"
+
+def extract_text(path: Path) -> str:
+    """PDF text as the API's MGM ingestion extracts it, or a text file as is."""
+    if path.suffix.lower() != ".pdf":
+        return path.read_text(encoding="utf-8")
+    return "".join(page.extract_text() for page in PdfReader(str(path)).pages)
+
+def standin_counters() -> dict:
+    return httpx.get(f"{STANDIN_URL}/standin/stats").json()["counters"]
+
+def run_load_test(path: Path, runs: int):
+    """Parse the export runs times and report bets, stand-in requests, 429s and wall time per run."""
+    text = extract_text(path)
+    betslips = text.count("Betslip ID")
+    print(f"{path.name}: {betslips} betslips, concurrency {btb_gemini_max_concurrency}")
+    for run in range(runs):
+        before, retries_before = standin_counters(), retries.value(reason="rate_limit")
+        start = time.perf_counter()
+        bets = parse_mgm_pdf_inputs(text, job_id=f"gemini-load-{run}")
+        elapsed = time.perf_counter() - start
+        after = standin_counters()
+        requests = after.get("requests", 0) - before.get("requests", 0)
+        rejected = after.get("rejected_rate_limit", 0) - before.get("rejected_rate_limit", 0)
+        print(f"run {run + 1}: {len(bets)} bets from {betslips} betslips in {elapsed:.2f}s, {requests} generateContent requests, "
+              f"{rejected} answered 429, {retries.value(reason='rate_limit') - retries_before:.0f} rate-limit retries")
+
+if __name__ == "__main__":
+    # Usage: python load_test_gemini_standin.py [pdf or text file] [runs]
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PDF
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    run_load_test(path, runs)
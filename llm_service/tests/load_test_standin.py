@@ -0,0 +1,69 @@
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import httpx
+
+# Load test for the LLM service backed by the deterministic stand-in (llm_service/self-hosting/standin).
+# Start the stand-in and point the LLM service at it, e.g. BTB_OLLAMA_HOSTS=http://localhost:11434
+URL = os.getenv("BTB_LLM_URL", "http://localhost:9002")
+RECORDED_SLIP = ("Under 62.5 . Totals WON Result Under 62.5 Mississippi at LSU 10/12/24 6.30 PM "
+                 "Stake Odds Payout (inc Stake) 525.00 -110 547.73 Details")
+TEAMS = [("Michigan", "Washington"), ("Nevada", "San Jose State"), ("Army", "Tulsa"), ("Navy", "Air Force")]
+
+def make_slip(index: int) -> str:
+    """A distinct small slip per request, so prompts are not byte-identical across requests."""
+    away, home = TEAMS[index % len(TEAMS)]
+    return (f"Betslip ID: LOAD{index:06d}\n{away} Moneyline\n{away} at {home}\n10/5/24 • 6:30 PM\n"
+            f"Stake Odds Payout (inc Stake)\n${10 + index % 40}.00 -110 WON")
+
+async def post(client, path, payload, latencies, failures):
+    start = time.perf_counter()
+    try:
+        response = await client.post(f"{URL}{path}", json=payload)
+        body = response.json()
+        if response.status_code != 200 or (isinstance(body, dict) and body.get("error")) or not body:
+            failures.append(f"{response.status_code}: {json.dumps(body)[:200]}")
+    except Exception as e:
+        failures.append(str(e))
+    latencies.append(time.perf_counter() - start)
+
+def report(name, latencies, failures, elapsed):
+    """Print throughput and latency percentiles for one scenario."""
+    ordered = sorted(latencies)
+    percentile = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+    print(f"{name}: {len(latencies)} requests in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s), "
+          f"{len(failures)} failed, p50 {percentile(0.5) * 1000:.0f} ms, p95 {percentile(0.95) * 1000:.0f} ms, "
+          f"p99 {percentile(0.99) * 1000:.0f} ms, mean {statistics.mean(latencies) * 1000:.0f} ms")
+    for failure in failures[:5]:
+        print(f"  {failure}")
+
+async def run_load_test(num_requests, num_documents, slips_per_document):
+    """Run concurrent single-slip and multi-slip document requests against the LLM service."""
+    async with httpx.AsyncClient(timeout=300) as client:
+        latencies, failures = [], []
+        start = time.perf_counter()
+        payloads = [{"extracted_text": RECORDED_SLIP if i == 0 else make_slip(i)} for i in range(num_requests)]
+        await asyncio.gather(*(post(client, "/llm", payload, latencies, failures) for payload in payloads))
+        report("/llm", latencies, failures, time.perf_counter() - start)
+
+        latencies, failures = [], []
+        start = time.perf_counter()
+        documents = [{"extracted_text": "\n".join(make_slip(d * slips_per_document + s) for s in range(slips_per_document)),
+                      "job_id": f"load-{d}"} for d in range(num_documents)]
+        await asyncio.gather(*(post(client, "/llm-extraction/mgm", payload, latencies, failures) for payload in documents))
+        report("/llm-extraction/mgm", latencies, failures, time.perf_counter() - start)
+
+        metrics = (await client.get(f"{URL}/metrics")).text
+        for line in metrics.splitlines():
+            if line.startswith(("llm_parse_results_total", "llm_retries_total", "llm_repair_fields_total", "llm_batch_fallbacks_total")):
+                print(line)
+
+if __name__ == "__main__":
+    # Usage: python load_test_standin.py [requests] [documents] [slips per document]
+    num_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    num_documents = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    slips_per_document = int(sys.argv[3]) if len(sys.argv) > 3 else 11
+    asyncio.run(run_load_test(num_requests, num_documents, slips_per_document))
@@ -7,6 +7,7 @@ from enum import Enum
 
 class LLMRequestModel(BaseModel):
     extracted_text: str
+    job_id: Optional[str] = None  # Optional caller-supplied id for polling extraction progress
     # output_json: dict
     
 class LLMParsedDataResponse(BaseModel):
@@ -53,6 +54,7 @@ class BetDetails(BetExtractionDetails):
     user_id: str = "Nate"
     upload_timestamp: Optional[str] = Field(default_factory=lambda: str(datetime.utcnow()))
     profit_loss: Optional[Decimal] = None
+    sportsbook: Optional[str] = None  # Where the slip came from, e.g. "MGM"
 
     @classmethod
     def validate(cls, value):
@@ -62,4 +64,9 @@ class BetDetails(BetExtractionDetails):
     
 class UserDetails(BaseModel):
     user_id: str
-    bankroll: Decimal
\ No newline at end of file
+    bankroll: Decimal
+
+class BetSettlement(BaseModel):
+    user_id: str
+    bet_id: str
+    outcome: BetOutcome
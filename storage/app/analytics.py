@@ -0,0 +1,159 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# Configure logging to output to standard output
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+# Bet attributes the analytics read, used as the query projection
+ANALYTICS_ATTRIBUTES = ('bet_id', 'league', 'bet_type', 'event_date', 'date', 'odds', 'stake', 'profit_loss', 'outcome', 'upload_timestamp')
+
+# American odds buckets, lower edge inclusive
+ODDS_BUCKET_EDGES = [-np.inf, -300, -150, -100, 150, 300, np.inf]
+ODDS_BUCKET_LABELS = ['< -300', '-300 to -151', '-150 to -101', '-100 to +149', '+150 to +299', '+300 and up']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Sportsbook slips print event times as "9/22/24 • 12:00 PM"
+SLIP_DATE_FORMAT = '%m/%d/%y %I:%M %p'
+
+# Sportsbook values repeat heavily (a few dozen stakes, odds and dates), so text cleanup runs once per
+# distinct value and the results are broadcast back with the factorized codes
+def _per_unique(values: pd.Series, convert) -> pd.Series:
+    codes, uniques = pd.factorize(values)
+    converted = convert(pd.Series(uniques, dtype=object).astype(str))
+    # The extra trailing slot is NaN/NaT, which is exactly where missing values (code -1) land
+    converted = converted.reindex(range(len(uniques) + 1)).to_numpy()
+    return pd.Series(converted[codes], index=values.index)
+
+def _clean_number(values: pd.Series) -> pd.Series:
+    cleaned = values.str.replace(r'[$,\s]', '', regex=True).str.replace(r'(?i)^even$', '+100', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce')
+
+def _clean_datetime(values: pd.Series) -> pd.Series:
+    cleaned = values.str.replace('•', ' ', regex=False).str.split().str.join(' ')
+    parsed = pd.to_datetime(cleaned, format=SLIP_DATE_FORMAT, errors='coerce').dt.as_unit('us')
+    # Only values that are not in the slip format pay for format inference
+    unparsed = parsed.isna()
+    if unparsed.any():
+        parsed[unparsed] = pd.to_datetime(cleaned[unparsed], format='mixed', errors='coerce').dt.as_unit('us')
+    return parsed
+
+# Numbers as printed on slips ("$11.00", "-110", "EVEN") to floats, NaN where unreadable
+def to_number(values: pd.Series) -> pd.Series:
+    return _per_unique(values, _clean_number).astype(float)
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    return pd.to_datetime(_per_unique(values, _clean_datetime))
+
+# Load bets into typed columns once; every breakdown below works on these arrays
+def bets_frame(bets: list) -> pd.DataFrame:
+    raw = pd.DataFrame.from_records(bets, columns=list(ANALYTICS_ATTRIBUTES))
+    frame = pd.DataFrame({
+        'league': raw['league'].fillna('Unknown').astype(str),
+        'bet_type': raw['bet_type'].fillna('Unknown').astype(str),
+        'odds': to_number(raw['odds']),
+        'stake': to_number(raw['stake']).fillna(0.0),
+        'profit_loss': to_number(raw['profit_loss']).fillna(0.0),
+        'outcome': _per_unique(raw['outcome'], lambda outcomes: outcomes.str.upper()).fillna(''),
+    })
+    # event_date is normalized at write time; older bets fall back to the slip date, then the upload time
+    event_time = pd.to_datetime(raw['event_date'], format='ISO8601', errors='coerce').dt.as_unit('us')
+    undated = event_time.isna()
+    if undated.any():
+        event_time[undated] = _to_datetime(raw.loc[undated, 'date'])
+    undated = event_time.isna()
+    if undated.any():
+        upload_time = pd.to_datetime(raw.loc[undated, 'upload_timestamp'], format='ISO8601', errors='coerce')
+        event_time[undated] = upload_time.dt.as_unit('us')
+    frame['event_time'] = event_time
+    frame['won'] = frame['outcome'].eq('WON')
+    frame['lost'] = frame['outcome'].eq('LOST')
+    # Decimal odds average meaningfully, American odds do not
+    odds = frame['odds'].to_numpy(dtype=float)
+    frame['decimal_odds'] = np.where(odds > 0, 1 + odds / 100, np.where(odds < 0, 1 + 100 / np.abs(odds), np.nan))
+    frame['odds_bucket'] = pd.cut(frame['odds'], ODDS_BUCKET_EDGES, labels=ODDS_BUCKET_LABELS, right=False)
+    return frame
+
+def to_american_odds(decimal_odds):
+    if decimal_odds is None or np.isnan(decimal_odds) or decimal_odds <= 1:
+        return None
+    if decimal_odds >= 2:
+        return round((decimal_odds - 1) * 100)
+    return round(-100 / (decimal_odds - 1))
+
+def _ratio(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), np.nan, dtype=float), where=np.asarray(denominator) != 0)
+
+def _clean(value):
+    if isinstance(value, (float, np.floating)):
+        return None if np.isnan(value) else round(float(value), 4)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+def _stats(table: pd.DataFrame) -> pd.DataFrame:
+    table['roi'] = _ratio(table['profit_loss'].to_numpy(dtype=float), table['stake'].to_numpy(dtype=float))
+    table['win_rate'] = _ratio(table['wins'].to_numpy(dtype=float), (table['wins'] + table['losses']).to_numpy(dtype=float))
+    table['average_odds'] = [to_american_odds(value) for value in table.pop('average_decimal_odds')]
+    return table
+
+# Per-group totals for one dimension in a single grouped pass
+def breakdown(frame: pd.DataFrame, key) -> dict:
+    grouped = frame.groupby(key, observed=True, sort=True).agg(
+        bets=('outcome', 'size'),
+        stake=('stake', 'sum'),
+        profit_loss=('profit_loss', 'sum'),
+        wins=('won', 'sum'),
+        losses=('lost', 'sum'),
+        average_decimal_odds=('decimal_odds', 'mean'),
+    )
+    table = _stats(grouped)
+    # Column by column keeps counts as ints; row iteration would upcast them to floats
+    columns = {column: [_clean(value) for value in table[column].tolist()] for column in table.columns}
+    return {str(group): {column: values[index] for column, values in columns.items()} for index, group in enumerate(table.index)}
+
+# Longest consecutive runs of wins and losses in event order; pushes and pending bets are skipped
+def longest_streaks(frame: pd.DataFrame) -> dict:
+    settled = frame.loc[frame['won'] | frame['lost']].sort_values('event_time', kind='stable', na_position='last')
+    if settled.empty:
+        return {'longest_win_streak': 0, 'longest_loss_streak': 0}
+    won = settled['won'].to_numpy()
+    run_ids = np.concatenate(([0], np.cumsum(won[1:] != won[:-1])))
+    run_lengths = np.bincount(run_ids)
+    run_is_win = won[np.r_[0, np.flatnonzero(won[1:] != won[:-1]) + 1]]
+    return {
+        'longest_win_streak': int(run_lengths[run_is_win].max(initial=0)),
+        'longest_loss_streak': int(run_lengths[~run_is_win].max(initial=0)),
+    }
+
+def compute_analytics(bets: list) -> dict:
+    """
+    Compute totals, rates and breakdowns for a user's bets.
+    """
+    frame = bets_frame(bets)
+    wins, losses = int(frame['won'].sum()), int(frame['lost'].sum())
+    stake, profit_loss = float(frame['stake'].sum()), float(frame['profit_loss'].sum())
+    dated = frame.loc[frame['event_time'].notna()]
+    weekdays = breakdown(dated, dated['event_time'].dt.day_name())
+
+    analytics = {
+        'total_bets': len(frame),
+        'total_stake': _clean(stake),
+        'total_profit_loss': _clean(profit_loss),
+        'wins': wins,
+        'losses': losses,
+        'pushes': int(frame['outcome'].eq('PUSH').sum()),
+        'pending': int(frame['outcome'].eq('PENDING').sum()),
+        'roi': _clean(profit_loss / stake) if stake else None,
+        'win_rate': _clean(wins / (wins + losses)) if wins + losses else None,
+        'average_odds': to_american_odds(frame['decimal_odds'].mean()),
+    }
+    analytics.update(longest_streaks(frame))
+    analytics.update({
+        'league_breakdown': breakdown(frame, 'league'),
+        'bet_type_breakdown': breakdown(frame, 'bet_type'),
+        'odds_breakdown': breakdown(frame, 'odds_bucket'),
+        'weekday_breakdown': {day: weekdays[day] for day in WEEKDAYS if day in weekdays},
+        'month_breakdown': breakdown(dated, dated['event_time'].dt.to_period('M')),
+    })
+    return analytics
@@ -1,21 +1,35 @@
+from contextlib import asynccontextmanager
+from datetime import date
 from decimal import Decimal
 import decimal
 import logging
-import boto3
-from boto3.dynamodb.types import TypeSerializer
-from fastapi import FastAPI, HTTPException
-from dynamodb.btb import BTBDynamoDB, convert_floats_to_decimals
-from service_models.models import BetDetails, UserDetails
-from typing import List
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from analytics import ANALYTICS_ATTRIBUTES, compute_analytics
+from bulk import JSONRecordReader, btb_bulk_flush_records
+from export import EXPORT_FIELDS, EXPORT_MEDIA_TYPES, export_chunks, parquet_available
+from engine import StaleVersionError, StorageEngine, bucket_rollups, create_storage_engine
+from service_models.models import BetDetails, BetSettlement, UserDetails
+from settlement import bet_profit_loss
+from typing import List, Optional
 
-# Serialize bet_details to DynamoDB format
-serializer = TypeSerializer()
+# Bet attributes that can be requested from the listing endpoint; event_date is added at write time
+STORED_BET_FIELDS = set(BetDetails.model_fields) | {'event_date'}
 
-app = FastAPI()
-dynamodb_resource = BTBDynamoDB().dynamodb_resource
+# Set up in the lifespan hook, so importing the app does not touch storage
+engine: StorageEngine = None
 
-bets_table = dynamodb_resource.Table('BetsTable')
-users_table = dynamodb_resource.Table('UsersTable')
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global engine
+    engine = create_storage_engine()
+    # Seed the default user the API uploads bets for
+    engine.create_user(convert_floats_to_decimals(UserDetails(user_id="X", bankroll=Decimal('100.00')).dict()))
+    yield
+    engine.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure logging to output to standard output
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
@@ -33,54 +47,6 @@ def convert_floats_to_decimals(item):
         return Decimal(str(item))
     return item
 
-def calculate_user_profit_loss(bets: list) -> Decimal:
-    """
-    Calculate the total profit or loss for a user based on a list of bets.
-    """
-    total_profit_loss = sum(Decimal(str(bet.get("profit_loss", 0))) for bet in bets)
-    return total_profit_loss
-
-def league_breakdown(bets: list) -> dict:
-    """
-    Calculate the profit/loss breakdown by league.
-    """
-    league_summary = {}
-    for bet in bets:
-        league = bet.get("league", "Unknown")
-        profit_loss = Decimal(str(bet.get("profit_loss", 0)))
-        if league not in league_summary:
-            league_summary[league] = Decimal('0.0')
-        league_summary[league] += profit_loss
-    # Round each league's profit/loss value to 4 decimal places
-    league_summary = {league: round(profit, 4) for league, profit in league_summary.items()}
-    return league_summary
-
-def bet_type_breakdown(bets: list) -> dict:
-    """
-    Calculate the profit/loss breakdown by bet type.
-    """
-    bet_type_summary = {}
-    for bet in bets:
-        bet_type = bet.get("bet_type", "Unknown")
-        profit_loss = Decimal(str(bet.get("profit_loss", 0)))
-        if bet_type not in bet_type_summary:
-            bet_type_summary[bet_type] = Decimal('0.0')
-        bet_type_summary[bet_type] += profit_loss
-    # Round each bet type's profit/loss value to 4 decimal places
-    bet_type_summary = {bet_type: round(profit, 4) for bet_type, profit in bet_type_summary.items()}
-    return bet_type_summary
-
-def get_bets_summary(bets: list) -> dict:
-    """
-    Generate a summary of various metrics for a user's bets.
-    """
-    summary = {
-        "total_profit_loss": calculate_user_profit_loss(bets),
-        "league_breakdown": league_breakdown(bets),
-        "bet_type_breakdown": bet_type_breakdown(bets)
-    }
-    return summary
-
 def calculate_profit_loss(bet_details: BetDetails) -> Decimal:
     """
     Calculate the profit or loss for a bet based on American odds.
@@ -101,134 +67,246 @@ def calculate_profit_loss(bet_details: BetDetails) -> Decimal:
             logging.error(f"Invalid decimal value: {value}")
             return Decimal('0.0')
 
-    # Extract the stake and odds from the bet details
-    stake = parse_decimal(bet_details.stake)
-    odds = bet_details.odds
-    outcome = bet_details.outcome.upper()
-
-    # Calculate profit based on American odds
-    if outcome == 'WON':
-        try:
-            # For negative American odds (e.g., -120), the formula is stake * (100 / |odds|)
-            if odds.startswith('-'):
-                profit = stake * (Decimal('100') / Decimal(odds.replace('-', '')))
-            # For positive American odds (e.g., +120), the formula is stake * (odds / 100)
-            elif odds.startswith('+'):
-                profit = stake * (Decimal(odds.replace('+', '')) / Decimal('100'))
-            else:
-                profit = Decimal('0.0')
-        except (ValueError, decimal.InvalidOperation):
-            logging.error(f"Invalid odds: {odds}")
-            profit = Decimal('0.0')
-    elif outcome == 'LOST':
-        # If the bet is lost, the profit is negative the stake (loss)
-        profit = -stake
-    else:
-        # For other outcomes like 'PUSH', no profit or loss
-        profit = Decimal('0.0')
+    # Same odds rule as settlement, so a bet's profit/loss does not depend on the path it arrived by
+    profit = bet_profit_loss(parse_decimal(bet_details.stake), bet_details.odds, bet_details.outcome)
 
     logging.info(f"Calculated profit/loss for bet {bet_details.bet_id}: {profit}")
     return profit
 
-def update_user_bankroll(user_id, profit_loss):
-    # Fetch current bankroll
-    response = users_table.get_item(Key={'user_id': user_id})
-    if 'Item' not in response:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Ensure bankroll is a Decimal
-    current_bankroll = Decimal(str(response['Item'].get('bankroll', 0.0)))
-    
-    # Ensure profit_loss is a Decimal
-    profit_loss = Decimal(str(profit_loss))
-    
-    # Update bankroll
-    new_bankroll = current_bankroll + profit_loss
-    users_table.update_item(
-        Key={'user_id': user_id},
-        UpdateExpression="SET bankroll = :val",
-        ExpressionAttributeValues={':val': new_bankroll}
-    )
-
 # Bets Endpoints
 @app.post("/bets")
-def add_bets(bet_details_list: List[BetDetails]):
+async def add_bets(bet_details_list: List[BetDetails]):
     succeeded_bets = []
     failed_bets = []
-    bet_ids = set()
-    with bets_table.batch_writer() as batch:
-        for bet_details in bet_details_list:
+    duplicate_bets = []
+    bets_by_user = {}
+    for bet_details in bet_details_list:
+        try:
+            # Calculate profit/loss
+            profit_loss = calculate_profit_loss(bet_details)
+            bet_details.profit_loss = profit_loss
+            bets_by_user.setdefault(bet_details.user_id, []).append(convert_floats_to_decimals(bet_details.dict()))
+            logging.info(f"Bet {bet_details.bet_id} Processed: {bet_details.selection} - {bet_details.bet_type} - {bet_details.outcome} - {bet_details.profit_loss}")
+        except Exception as e:
+            logging.error(f"Error processing bet {bet_details.bet_id}: {e}")
+            failed_bets.append(bet_details.bet_id)
+
+    # Store each user's bets together with one atomic bankroll update
+    for user_id, bets in bets_by_user.items():
+        result = await engine.run(engine.write_user_bets, user_id, bets)
+        succeeded_bets.extend(result['written'])
+        duplicate_bets.extend(result['duplicates'])
+        failed_bets.extend(result['failed'])
+
+    return {
+        "message": "Bets uploaded",
+        "succeeded_bets": succeeded_bets,
+        "failed_bets": failed_bets,
+        "duplicate_bets": duplicate_bets
+    }
+
+@app.post("/bets/bulk")
+async def import_bets(request: Request):
+    """
+    Import a JSON array or NDJSON stream of bets of any size, such as a sportsbook history export.
+
+    Records are validated as the body streams in and invalid ones are reported by position
+    rather than failing the import. Valid bets are buffered per user and written in bulk,
+    one bankroll update per user and batch, whenever BTB_BULK_FLUSH_RECORDS of them are
+    buffered, so memory stays bounded however large the body is.
+    """
+    reader = JSONRecordReader()
+    bets_by_user = {}
+    buffered = 0
+    invalid_bets = []
+    received = 0
+    succeeded_bets, failed_bets, duplicate_bets = [], [], []
+
+    async def flush():
+        nonlocal bets_by_user, buffered
+        pending, bets_by_user, buffered = bets_by_user, {}, 0
+        for user_id, bets in pending.items():
+            result = await engine.run(engine.import_user_bets, user_id, bets)
+            succeeded_bets.extend(result['written'])
+            duplicate_bets.extend(result['duplicates'])
+            failed_bets.extend(result['failed'])
+
+    async def accept(records):
+        nonlocal received, buffered
+        for record in records:
+            index, received = received, received + 1
             try:
-                # Calculate profit/loss
-                profit_loss = calculate_profit_loss(bet_details)
-                bet_details.profit_loss = profit_loss
-
-                # Update user's bankroll
-                update_user_bankroll(bet_details.user_id, profit_loss)
-
-                bet_details_dict = convert_floats_to_decimals(bet_details.dict())
-                batch.put_item(Item=bet_details_dict)
-                bet_ids.add(bet_details.bet_id)
-                succeeded_bets.append(bet_details.bet_id)
-                logging.info(f"Bet {bet_details.bet_id} Processed: {bet_details.selection} - {bet_details.bet_type} - {bet_details.outcome} - {bet_details.profit_loss}")
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+                bet_details = BetDetails(**record)
+                bet_details.profit_loss = calculate_profit_loss(bet_details)
+                bets_by_user.setdefault(bet_details.user_id, []).append(convert_floats_to_decimals(bet_details.dict()))
+                buffered += 1
+            except ValidationError as e:
+                invalid_bets.append({"index": index, "bet_id": record.get("bet_id"),
+                                     "error": "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())})
             except Exception as e:
-                logging.error(f"Error processing bet {bet_details.bet_id}: {e}")
-                failed_bets.append(bet_details.bet_id)
-    
+                invalid_bets.append({"index": index, "bet_id": record.get("bet_id") if isinstance(record, dict) else None, "error": str(e)})
+            else:
+                # Outside the try, so a storage error fails the import instead of marking the record invalid
+                if buffered >= btb_bulk_flush_records:
+                    await flush()
+
+    try:
+        async for chunk in request.stream():
+            await accept(reader.feed(chunk))
+        await accept(reader.close())
+    except ValueError as e:
+        # Records before the malformed part may already be written; a corrected retry reports them as duplicates
+        raise HTTPException(status_code=400, detail=f"Malformed bulk body after {received} records, {len(succeeded_bets)} bets already imported: {e}")
+    await flush()
+    logging.info(f"Bulk import of {received} records: {len(succeeded_bets)} written, {len(duplicate_bets)} duplicates, "
+                 f"{len(failed_bets)} failed, {len(invalid_bets)} invalid")
+
     return {
-        "message": "Bets uploaded to DynamoDB - BetsTable",
+        "message": "Bets imported",
+        "received": received,
         "succeeded_bets": succeeded_bets,
-        "failed_bets": failed_bets
+        "failed_bets": failed_bets,
+        "duplicate_bets": duplicate_bets,
+        "invalid_bets": invalid_bets
     }
 
+@app.post("/bets/settle")
+async def settle_bets(settlements: List[BetSettlement]):
+    """
+    Set the outcome of stored bets, e.g. PENDING bets once their games are final.
+
+    Profit/loss is recomputed for every affected bet at once, and each user's summary, daily
+    totals and bankroll move by the net change a single time. Later entries for the same
+    bet replace earlier ones.
+    """
+    outcomes_by_user = {}
+    for settlement in settlements:
+        outcomes_by_user.setdefault(settlement.user_id, {})[settlement.bet_id] = settlement.outcome.value
+
+    response = {"settled_bets": [], "unchanged_bets": [], "not_found_bets": [], "conflicting_bets": [], "failed_bets": [], "bankroll_deltas": {}}
+    for user_id, outcomes in outcomes_by_user.items():
+        result = await engine.run(engine.settle_user_bets, user_id, outcomes)
+        response["settled_bets"].extend(result['settled'])
+        response["unchanged_bets"].extend(result['unchanged'])
+        response["not_found_bets"].extend(result['not_found'])
+        response["conflicting_bets"].extend(result['conflicts'])
+        response["failed_bets"].extend(result['failed'])
+        response["bankroll_deltas"][user_id] = result['bankroll_delta']
+    return {"message": "Bets settled", **response}
+
+@app.get("/bets/{user_id}")
+async def list_user_bets(user_id: str, limit: int = Query(50, ge=1, le=1000), cursor: Optional[str] = None, fields: Optional[str] = None,
+                         start: Optional[date] = Query(None, alias="from"), end: Optional[date] = Query(None, alias="to"),
+                         league: Optional[str] = None, bet_type: Optional[str] = None, outcome: Optional[str] = None, sportsbook: Optional[str] = None):
+    # Comma-separated fields limit what is read from storage; bet_id is always included
+    attributes = None
+    if fields:
+        attributes = list(dict.fromkeys(['bet_id'] + [field.strip() for field in fields.split(',') if field.strip()]))
+        unknown = [field for field in attributes if field not in STORED_BET_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    try:
+        filters = {"league": league, "bet_type": bet_type, "outcome": outcome.upper() if outcome else None, "sportsbook": sportsbook}
+        bets, next_cursor = await engine.run(engine.query_user_bets_page, user_id, limit, cursor=cursor, attributes=attributes, start=start, end=end, filters=filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"bets": bets, "next_cursor": next_cursor}
+
+@app.post("/bets/{user_id}/existing")
+async def find_existing_bets(user_id: str, bet_ids: List[str]):
+    # Bulk existence check the API runs on betslip IDs before paying for LLM extraction
+    return {"existing_bet_ids": await engine.run(engine.existing_bet_ids, user_id, bet_ids)}
+
+@app.get("/bets/{user_id}/export")
+def export_user_bets(user_id: str, export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv|parquet)$"),
+                     after: Optional[str] = None):
+    """
+    Stream a user's full bet history as NDJSON, CSV or Parquet.
+
+    Bets are read page by page and sent as they are read, so memory does not grow with the
+    history. Rows are in bet_id order; an interrupted export resumes from the last bet_id
+    received with after=<bet_id>. Resumed CSV exports leave out the header so the pieces
+    can be concatenated.
+    """
+    if export_format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+    bets = engine.query_user_bets(user_id, attributes=EXPORT_FIELDS, after=after)
+    suffix = f"-after-{after}" if after else ""
+    return StreamingResponse(export_chunks(export_format, bets, header=after is None), media_type=EXPORT_MEDIA_TYPES[export_format],
+                             headers={"Content-Disposition": f'attachment; filename="{user_id}-bets{suffix}.{export_format}"'})
+
 @app.get("/bets/{user_id}/summary")
-def get_user_bets_summary(user_id: str):
-    response = bets_table.query(
-        KeyConditionExpression=boto3.dynamodb.conditions.Key('user_id').eq(user_id)
-    )
-    if not response.get('Items'):
+async def get_user_bets_summary(user_id: str):
+    # A single read on DynamoDB, where it is maintained alongside every bet write; indexed aggregates on SQLite
+    summary = await engine.run(engine.get_user_summary, user_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No bets found for user")
+    return summary
+
+@app.post("/bets/{user_id}/summary/rebuild")
+async def rebuild_user_bets_summary(user_id: str):
+    # Recompute the summary from the stored bets to repair any drift; on DynamoDB this also applies interrupted bulk imports
+    summary = await engine.run(engine.rebuild_user_summary, user_id)
+    if summary is None:
         raise HTTPException(status_code=404, detail="No bets found for user")
-    
-    bets = response['Items']
-    summary = get_bets_summary(bets)
     return summary
 
+@app.get("/bets/{user_id}/timeseries")
+async def get_user_bets_timeseries(user_id: str, start: Optional[date] = Query(None, alias="from"), end: Optional[date] = Query(None, alias="to"),
+                                   bucket: str = Query("day", pattern="^(day|week|month)$")):
+    # Reads only the daily rollup items in range; the running total starts at the first bucket
+    days = await engine.run(engine.query_daily_rollups, user_id, start, end)
+    return {"bucket": bucket, "series": bucket_rollups(days, bucket)}
+
+@app.post("/bets/{user_id}/timeseries/rebuild")
+async def rebuild_user_bets_timeseries(user_id: str):
+    # Recompute daily rollups from the stored bets to repair any drift
+    days = await engine.run(engine.rebuild_daily_rollups, user_id)
+    if not days:
+        raise HTTPException(status_code=404, detail="No bets found for user")
+    return {"message": "Daily rollups rebuilt", "days": days}
+
+@app.post("/bets/{user_id}/reindex")
+async def reindex_user_bets(user_id: str):
+    # Give bets stored before the date and filter indexes existed their index attributes
+    bets = await engine.run(engine.backfill_derived_attributes, user_id)
+    if not bets:
+        raise HTTPException(status_code=404, detail="No bets found for user")
+    return {"message": "Bets reindexed", "bets": len(bets)}
+
+@app.get("/bets/{user_id}/analytics")
+async def get_user_bets_analytics(user_id: str):
+    # Reading the history and the pandas pass both run off the event loop
+    analytics = await engine.run(user_bets_analytics, user_id)
+    if analytics is None:
+        raise HTTPException(status_code=404, detail="No bets found for user")
+    return analytics
+
+def user_bets_analytics(user_id: str):
+    bets = list(engine.query_user_bets(user_id, attributes=ANALYTICS_ATTRIBUTES))
+    return compute_analytics(bets) if bets else None
+
 # Users Endpoints
 @app.get("/users/{user_id}")
-def get_user(user_id: str):
-    response = users_table.get_item(
-        Key={'user_id': user_id}
-    )
-    if 'Item' not in response:
+async def get_user(user_id: str, consistent: bool = False):
+    # Served from the storage engine's user cache unless a consistent read is asked for
+    user = await engine.run(engine.get_user, user_id, consistent_read=consistent)
+    if user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    return response['Item']
+    return user
 
 @app.post("/users")
-def create_user(user_details: UserDetails):
-    # Check if user already exists
-    response = users_table.get_item(Key={'user_id': user_details.user_id})
-    if 'Item' in response:
+async def create_user(user_details: UserDetails):
+    if not await engine.run(engine.create_user, convert_floats_to_decimals(user_details.dict())):
         raise HTTPException(status_code=400, detail="User already exists")
-    users_table.put_item(Item=convert_floats_to_decimals(user_details.dict()))
     return {"message": "User created successfully", "user_id": user_details.user_id}
 
-try:
-    user_details = UserDetails(user_id="X", bankroll=Decimal('100.00'))
-    create_user(user_details)
-except HTTPException as e:
-    if e.status_code == 400 and "User already exists" in e.detail:
-        # print("User already exists, continuing with application startup.")
-        pass
-    else:
-        raise e
-
 @app.put("/users/{user_id}/bankroll")
-def update_bankroll(user_details: UserDetails):
-    # Update the bankroll
-    response = users_table.update_item(
-        Key={'user_id': user_details.user_id},
-        UpdateExpression="SET bankroll = :val",
-        ExpressionAttributeValues={':val': Decimal(str(user_details.bankroll))},
-        ReturnValues="UPDATED_NEW"
-    )
-    return response['Attributes']
+async def update_bankroll(user_details: UserDetails, expected_version: Optional[int] = None):
+    # Update the bankroll; with expected_version the write is refused if another write got there first
+    try:
+        return await engine.run(engine.set_bankroll, user_details.user_id, user_details.bankroll, expected_version=expected_version)
+    except StaleVersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -0,0 +1,80 @@
+import codecs
+import json
+import logging
+import os
+
+# Configure logging to output to standard output
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+# A single bet is a few hundred bytes; anything this large without a complete record is malformed
+btb_bulk_max_record_bytes = int(os.getenv('BTB_BULK_MAX_RECORD_BYTES', str(1024 * 1024)))
+# Valid bets buffered across all users before they are written, which bounds an import's memory whatever the body size
+btb_bulk_flush_records = int(os.getenv('BTB_BULK_FLUSH_RECORDS', '5000'))
+
+class JSONRecordReader:
+    """
+    Incrementally parse a body that is either a JSON array of objects or NDJSON.
+
+    Bytes are fed as they arrive and every complete record is returned straight away,
+    so only the unfinished tail of the body is ever buffered. Raises ValueError for a
+    malformed body.
+    """
+
+    def __init__(self, max_record_bytes: int = None):
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.max_record_bytes = max_record_bytes or btb_bulk_max_record_bytes
+        self.buffer = ''
+        self.array = None
+        self.finished = False
+
+    def feed(self, data: bytes) -> list:
+        self.buffer += self.text_decoder.decode(data)
+        records = self._records(final=False)
+        if len(self.buffer) > self.max_record_bytes:
+            raise ValueError(f"No complete record in {len(self.buffer)} characters")
+        return records
+
+    def close(self) -> list:
+        self.buffer += self.text_decoder.decode(b'', final=True)
+        records = self._records(final=True)
+        if self.buffer.strip():
+            raise ValueError(f"Unexpected data at end of body: {self.buffer.strip()[:50]}")
+        if self.array and not self.finished:
+            raise ValueError("Unterminated JSON array")
+        return records
+
+    def _records(self, final: bool) -> list:
+        records, position = [], 0
+        while True:
+            position = self._skip_separators(position)
+            if position == len(self.buffer):
+                break
+            if self.finished:
+                raise ValueError(f"Unexpected data after JSON array: {self.buffer[position:position + 50]}")
+            if self.array is None:
+                # The first character decides the format: "[" for an array, anything else is NDJSON
+                self.array = self.buffer[position] == '['
+                if self.array:
+                    position += 1
+                continue
+            if self.array and self.buffer[position] == ']':
+                self.finished = True
+                position += 1
+                continue
+            try:
+                record, position = self.decoder.raw_decode(self.buffer, position)
+            except json.JSONDecodeError as e:
+                if final:
+                    raise ValueError(f"Malformed JSON record: {e}") from e
+                # Most likely a record split across chunks; wait for the rest of it
+                break
+            records.append(record)
+        self.buffer = self.buffer[position:]
+        return records
+
+    def _skip_separators(self, position: int) -> int:
+        separators = ' \t\r\n,' if self.array else ' \t\r\n'
+        while position < len(self.buffer) and self.buffer[position] in separators:
+            position += 1
+        return position
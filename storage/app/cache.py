@@ -0,0 +1,86 @@
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+# Configure logging to output to standard output
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+class TTLCache:
+    """
+    Thread-safe in-process cache of small items with a time-to-live and a size bound.
+
+    Read-through callers take a token before reading from storage and pass it to put(). If
+    the key was invalidated in the meantime the put is ignored, so a slow read can never
+    restore an item that a concurrent write has already replaced. Items carrying a
+    "version" are also never replaced by an older version.
+
+    Tokens come from one sequence shared by every key. Only the last max_entries
+    invalidations are remembered per key; a read that started before a forgotten
+    invalidation is not cached, so the bookkeeping stays bounded without ever caching
+    a stale item.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.sequence = 0
+        self.generations = OrderedDict()
+        self.forgotten_generation = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    def get(self, key):
+        """
+        Return a copy of the cached item, or None on a miss or after it expired.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[1])
+
+    def token(self, key) -> int:
+        with self.lock:
+            return self.sequence
+
+    def put(self, key, item: dict, token: int = None):
+        if not self.enabled:
+            return
+        with self.lock:
+            if token is not None and token < self.generations.get(key, self.forgotten_generation):
+                return
+            cached = self.entries.get(key)
+            if cached is not None and int(cached[1].get('version', 0)) > int(item.get('version', 0)):
+                return
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(item))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.sequence += 1
+            self.generations[key] = self.sequence
+            self.generations.move_to_end(key)
+            while len(self.generations) > max(self.max_entries, 1):
+                _, self.forgotten_generation = self.generations.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sequence += 1
+            self.generations.clear()
+            self.forgotten_generation = self.sequence
@@ -1,7 +1,66 @@
 # dynamodb/btb.py
 
+import functools
+import logging
+import os
+import random
+import re
+import time
+import uuid
 import boto3
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from datetime import date, datetime
 from decimal import Decimal
+from cache import TTLCache
+from engine import (FILTER_FIELDS, SUMMARY_GROUPS, StaleVersionError, StorageEngine, bet_event_date, daily_deltas, decode_cursor,
+                    encode_cursor, event_date_end, event_day, summary_deltas, summary_from_item)
+from settlement import bankroll_delta, plan_settlements, settlement_totals
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+btb_dynamodb_endpoint = os.getenv('BTB_DYNAMODB_ENDPOINT', 'http://dynamodb:9005')
+# HTTP connections per client, shared by every thread; room for the storage workers plus bulk and settlement pools
+btb_dynamodb_max_pool_connections = int(os.getenv('BTB_DYNAMODB_MAX_POOL_CONNECTIONS', '64'))
+btb_dynamodb_connect_timeout_seconds = float(os.getenv('BTB_DYNAMODB_CONNECT_TIMEOUT_SECONDS', '2'))
+btb_dynamodb_read_timeout_seconds = float(os.getenv('BTB_DYNAMODB_READ_TIMEOUT_SECONDS', '10'))
+# Adaptive mode also rate-limits the client once DynamoDB starts throttling it
+btb_dynamodb_retry_mode = os.getenv('BTB_DYNAMODB_RETRY_MODE', 'adaptive')
+btb_dynamodb_max_attempts = int(os.getenv('BTB_DYNAMODB_MAX_ATTEMPTS', '5'))
+# DynamoDB accepts up to 100 actions per TransactWriteItems call
+btb_transaction_max_items = int(os.getenv('BTB_TRANSACTION_MAX_ITEMS', '100'))
+btb_transaction_retries = int(os.getenv('BTB_TRANSACTION_RETRIES', '3'))
+# Bulk imports write BatchWriteItem chunks on a small pool and retry UnprocessedItems with backoff
+btb_bulk_workers = int(os.getenv('BTB_BULK_WORKERS', '4'))
+btb_bulk_retries = int(os.getenv('BTB_BULK_RETRIES', '8'))
+# User items are cached in process; 0 disables the cache
+btb_user_cache_ttl_seconds = float(os.getenv('BTB_USER_CACHE_TTL_SECONDS', '30'))
+btb_user_cache_max_entries = int(os.getenv('BTB_USER_CACHE_MAX_ENTRIES', '10000'))
+
+# DynamoDB limits per BatchWriteItem and BatchGetItem call
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_GET_MAX_KEYS = 100
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+# Older DynamoDB Local builds only report cancellation reasons in the message
+CANCELLATION_REASONS_PATTERN = re.compile(r'\[([A-Za-z, ]+)\]$')
+
+# The only bet attributes the summary reads
+SUMMARY_ATTRIBUTES = ('league', 'bet_type', 'stake', 'profit_loss', 'outcome')
+# Settlement recomputes profit/loss and moves the bet between summary groups and days
+SETTLEMENT_ATTRIBUTES = ('bet_id', 'league', 'bet_type', 'odds', 'stake', 'profit_loss', 'outcome', 'event_date', 'date', 'upload_timestamp')
+# Daily rollups also need the day each bet falls on
+ROLLUP_ATTRIBUTES = ('bet_id', 'date', 'upload_timestamp', 'event_date', 'stake', 'profit_loss', 'outcome')
+
+EVENT_DATE_INDEX = 'UserEventDateIndex'
+# Filterable bet fields, each with an index keyed on "<user_id>#<value>" and sorted by event date
+FILTER_INDEXES = dict(zip(FILTER_FIELDS, ('UserLeagueIndex', 'UserBetTypeIndex', 'UserOutcomeIndex', 'UserSportsbookIndex')))
 
 def convert_floats_to_decimals(obj):
     if isinstance(obj, list):
@@ -14,12 +73,30 @@ def convert_floats_to_decimals(obj):
         return obj
 
 
-class BTBDynamoDB():
+class BTBDynamoDB(StorageEngine):
     def __init__(self):
-        self.dynamodb_resource = boto3.resource('dynamodb', region_name='us-west-2', endpoint_url='http://dynamodb:9005')
-        self.dynamodb_client = boto3.client('dynamodb', region_name='us-west-2', endpoint_url='http://dynamodb:9005')
-        self.create_bets_table('BetsTable')
-        self.create_users_table('UsersTable')
+        config = Config(
+            max_pool_connections=btb_dynamodb_max_pool_connections,
+            connect_timeout=btb_dynamodb_connect_timeout_seconds,
+            read_timeout=btb_dynamodb_read_timeout_seconds,
+            retries={'mode': btb_dynamodb_retry_mode, 'max_attempts': btb_dynamodb_max_attempts}
+        )
+        # Separate clients, since the resource's client (de)serializes values that the low-level calls pass typed
+        self.dynamodb_resource = boto3.resource('dynamodb', region_name='us-west-2', endpoint_url=btb_dynamodb_endpoint, config=config)
+        self.dynamodb_client = boto3.client('dynamodb', region_name='us-west-2', endpoint_url=btb_dynamodb_endpoint, config=config)
+        self.bets_table_name = 'BetsTable'
+        self.users_table_name = 'UsersTable'
+        self.summary_table_name = 'UserSummaryTable'
+        self.daily_table_name = 'UserDailyTable'
+        self.imports_table_name = 'UserImportsTable'
+        self.user_cache = TTLCache(btb_user_cache_ttl_seconds, btb_user_cache_max_entries)
+        self.create_bets_table(self.bets_table_name)
+        self.create_users_table(self.users_table_name)
+        # The summary table is keyed by user_id alone, like the users table
+        self.create_users_table(self.summary_table_name)
+        self.create_daily_table(self.daily_table_name)
+        self.create_imports_table(self.imports_table_name)
+        self.ensure_bets_indexes(self.bets_table_name)
     
     def create_bets_table(self, table_name):
         existing_tables = [table.name for table in self.dynamodb_resource.tables.all()]
@@ -33,11 +110,70 @@ class BTBDynamoDB():
                 AttributeDefinitions=[
                     {'AttributeName': 'user_id', 'AttributeType': 'S'},
                     {'AttributeName': 'bet_id', 'AttributeType': 'S'}
-                ],
+                ] + index_attribute_definitions(),
+                GlobalSecondaryIndexes=bets_indexes(),
                 ProvisionedThroughput={'ReadCapacityUnits': 10, 'WriteCapacityUnits': 10}
             )
             table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
 
+    def ensure_bets_indexes(self, table_name):
+        # Tables created before an index existed get it added in place, one index per UpdateTable call
+        for index in bets_indexes():
+            description = self.dynamodb_client.describe_table(TableName=table_name)['Table']
+            if any(existing['IndexName'] == index['IndexName'] for existing in description.get('GlobalSecondaryIndexes', [])):
+                continue
+            logging.info(f"Adding {index['IndexName']} to {table_name}")
+            key_attributes = {key['AttributeName'] for key in index['KeySchema']}
+            self.dynamodb_client.update_table(
+                TableName=table_name,
+                AttributeDefinitions=[definition for definition in index_attribute_definitions() + [{'AttributeName': 'user_id', 'AttributeType': 'S'}]
+                                      if definition['AttributeName'] in key_attributes],
+                GlobalSecondaryIndexUpdates=[{'Create': index}]
+            )
+            self._wait_for_index(table_name, index['IndexName'])
+
+    def _wait_for_index(self, table_name, index_name):
+        while True:
+            description = self.dynamodb_client.describe_table(TableName=table_name)['Table']
+            statuses = {index['IndexName']: index.get('IndexStatus') for index in description.get('GlobalSecondaryIndexes', [])}
+            if statuses.get(index_name) in (None, 'ACTIVE'):
+                return
+            time.sleep(1)
+
+    def create_daily_table(self, table_name):
+        existing_tables = [table.name for table in self.dynamodb_resource.tables.all()]
+        if table_name not in existing_tables:
+            table = self.dynamodb_resource.create_table(
+                TableName=table_name,
+                KeySchema=[
+                    {'AttributeName': 'user_id', 'KeyType': 'HASH'},  # Partition key
+                    {'AttributeName': 'day', 'KeyType': 'RANGE'}      # Sort key, YYYY-MM-DD
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                    {'AttributeName': 'day', 'AttributeType': 'S'}
+                ],
+                ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+            )
+            table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
+
+    def create_imports_table(self, table_name):
+        existing_tables = [table.name for table in self.dynamodb_resource.tables.all()]
+        if table_name not in existing_tables:
+            table = self.dynamodb_resource.create_table(
+                TableName=table_name,
+                KeySchema=[
+                    {'AttributeName': 'user_id', 'KeyType': 'HASH'},   # Partition key
+                    {'AttributeName': 'import_id', 'KeyType': 'RANGE'}  # Sort key
+                ],
+                AttributeDefinitions=[
+                    {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                    {'AttributeName': 'import_id', 'AttributeType': 'S'}
+                ],
+                ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
+            )
+            table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
+
     def create_users_table(self, table_name):
         existing_tables = [table.name for table in self.dynamodb_resource.tables.all()]
         if table_name not in existing_tables:
@@ -52,3 +188,655 @@ class BTBDynamoDB():
                 ProvisionedThroughput={'ReadCapacityUnits': 5, 'WriteCapacityUnits': 5}
             )
             table.meta.client.get_waiter('table_exists').wait(TableName=table_name)
+
+    def get_user(self, user_id: str, consistent_read: bool = False):
+        """
+        Read a user through the in-process cache.
+
+        Every bankroll write made by this process invalidates or refreshes the cached item, so
+        only writes from other replicas can be up to BTB_USER_CACHE_TTL_SECONDS old here. A
+        consistent read skips the cache and refreshes it.
+        """
+        if not consistent_read:
+            user = self.user_cache.get(user_id)
+            if user is not None:
+                return user
+        token = self.user_cache.token(user_id)
+        response = self.dynamodb_resource.Table(self.users_table_name).get_item(Key={'user_id': user_id}, ConsistentRead=consistent_read)
+        user = response.get('Item')
+        if user is not None:
+            self.user_cache.put(user_id, user, token)
+        return user
+
+    def create_user(self, user: dict) -> bool:
+        user = {**user, 'version': 0}
+        try:
+            self.dynamodb_resource.Table(self.users_table_name).put_item(Item=user, ConditionExpression=Attr('user_id').not_exists())
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                return False
+            raise
+        self.user_cache.put(user['user_id'], user)
+        return True
+
+    def set_bankroll(self, user_id: str, bankroll: Decimal, expected_version: int = None) -> dict:
+        update = {
+            'Key': {'user_id': user_id},
+            'UpdateExpression': "SET bankroll = :val ADD version :one",
+            'ExpressionAttributeValues': {':val': Decimal(str(bankroll)), ':one': 1},
+            'ReturnValues': "ALL_NEW"
+        }
+        if expected_version is not None:
+            # Users created before versions were tracked count as version 0; a missing user is refused, not created
+            update['ConditionExpression'] = 'attribute_exists(user_id) AND (version = :expected OR (attribute_not_exists(version) AND :expected = :zero))'
+            update['ExpressionAttributeValues'].update({':expected': expected_version, ':zero': 0})
+        self.user_cache.invalidate(user_id)
+        try:
+            response = self.dynamodb_resource.Table(self.users_table_name).update_item(**update)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise StaleVersionError(f"Bankroll for user {user_id} has changed since version {expected_version}") from e
+            raise
+        self.user_cache.put(user_id, response['Attributes'])
+        return {'bankroll': response['Attributes']['bankroll'], 'version': response['Attributes']['version']}
+
+    def _bankroll_update(self, user_id: str, profit_loss: Decimal) -> dict:
+        # ADD is applied server side, so concurrent uploads cannot overwrite each other's deltas;
+        # the version lets readers tell a cached bankroll from a newer one
+        return {
+            'TableName': self.users_table_name,
+            'Key': {'user_id': {'S': user_id}},
+            'UpdateExpression': 'ADD bankroll :delta, version :one',
+            'ConditionExpression': 'attribute_exists(user_id)',
+            'ExpressionAttributeValues': {':delta': serializer.serialize(Decimal(str(profit_loss))), ':one': {'N': '1'}}
+        }
+
+    def _add_update(self, table_name: str, key: dict, deltas: dict) -> dict:
+        names, values, clauses = {}, {}, []
+        for index, (attribute, delta) in enumerate(sorted(deltas.items())):
+            names[f'#a{index}'] = attribute
+            values[f':v{index}'] = serializer.serialize(delta)
+            clauses.append(f'#a{index} :v{index}')
+        return {
+            'TableName': table_name,
+            'Key': {name: serializer.serialize(value) for name, value in key.items()},
+            'UpdateExpression': 'ADD ' + ', '.join(clauses),
+            'ExpressionAttributeNames': names,
+            'ExpressionAttributeValues': values
+        }
+
+    def _summary_update(self, user_id: str, deltas: dict) -> dict:
+        # ADD only works on top-level attributes, so breakdown totals are stored flat as "league:NFL:stake"
+        return self._add_update(self.summary_table_name, {'user_id': user_id}, {**deltas, 'version': 1})
+
+    def _daily_updates(self, user_id: str, bets: list) -> list:
+        return [self._add_update(self.daily_table_name, {'user_id': user_id, 'day': day}, deltas)
+                for day, deltas in sorted(daily_deltas(bets).items())]
+
+    def _bets_query(self, user_id: str, attributes=None, consistent_read: bool = False) -> dict:
+        query = {'KeyConditionExpression': Key('user_id').eq(user_id), 'ConsistentRead': consistent_read}
+        if attributes:
+            # Placeholders avoid clashes with reserved words such as "date" and "result"
+            names = {f'#p{index}': attribute for index, attribute in enumerate(attributes)}
+            query['ProjectionExpression'] = ', '.join(names)
+            query['ExpressionAttributeNames'] = names
+        return query
+
+    def query_user_bets(self, user_id: str, attributes=None, consistent_read: bool = False, after: str = None):
+        """
+        Yield every bet for a user, following LastEvaluatedKey across 1 MB pages.
+
+        Only the given attributes are read when a projection is supplied. Items come back in
+        bet_id (sort key) order, so after starts the read past that bet_id.
+        """
+        table = self.dynamodb_resource.Table(self.bets_table_name)
+        query = self._bets_query(user_id, attributes, consistent_read)
+        if after:
+            query['ExclusiveStartKey'] = {'user_id': user_id, 'bet_id': after}
+        while True:
+            response = table.query(**query)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def query_user_bets_page(self, user_id: str, limit: int, cursor: str = None, attributes=None,
+                             start: date = None, end: date = None, filters: dict = None) -> tuple:
+        """
+        Read one page of a user's bets, in bet_id order or, with a date range or filters, in event date order.
+
+        Filters on league, bet_type, outcome and sportsbook are served from the index of the
+        most selective filter, so reads scale with the matching bets rather than the history.
+        Any other filters are applied to that index's items.
+
+        Returns the bets and an opaque cursor for the next page, or None after the last page.
+        """
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        query = self._bets_query(user_id, attributes)
+        if filters:
+            field = self._most_selective_filter(user_id, filters)
+            query['IndexName'] = FILTER_INDEXES[field]
+            condition = Key(index_key(field)).eq(f'{user_id}#{filters.pop(field)}')
+            if start or end:
+                condition &= event_date_condition(start, end)
+            query['KeyConditionExpression'] = condition
+            if filters:
+                remaining = [Attr(index_key(name)).eq(f'{user_id}#{value}') for name, value in filters.items()]
+                query['FilterExpression'] = functools.reduce(lambda left, right: left & right, remaining)
+        elif start or end:
+            query['IndexName'] = EVENT_DATE_INDEX
+            query['KeyConditionExpression'] = Key('user_id').eq(user_id) & event_date_condition(start, end)
+        if cursor:
+            query['ExclusiveStartKey'] = decode_cursor(cursor, user_id, CURSOR_KEYS)
+
+        # Limit is applied before FilterExpression, so keep reading until the page is full
+        table = self.dynamodb_resource.Table(self.bets_table_name)
+        items = []
+        while True:
+            query['Limit'] = limit - len(items)
+            response = table.query(**query)
+            items.extend(response.get('Items', []))
+            last_key = response.get('LastEvaluatedKey')
+            if not last_key or len(items) >= limit:
+                return items, encode_cursor(last_key) if last_key else None
+            query['ExclusiveStartKey'] = last_key
+
+    def _most_selective_filter(self, user_id: str, filters: dict) -> str:
+        # The materialized summary already counts bets per league, bet type and outcome
+        summary = self.dynamodb_resource.Table(self.summary_table_name).get_item(Key={'user_id': user_id}).get('Item', {})
+        outcome_counts = {'WON': 'wins', 'LOST': 'losses', 'PUSH': 'pushes'}
+
+        def expected_matches(field):
+            value = filters[field]
+            if field in SUMMARY_GROUPS:
+                return summary.get(f'{field}:{value}:bets', 0)
+            if field == 'outcome' and value in outcome_counts:
+                return summary.get(outcome_counts[value], 0)
+            if field == 'outcome':
+                return summary.get('bets', 0) - sum(summary.get(count, 0) for count in outcome_counts.values())
+            return float('inf')
+        return min((field for field in FILTER_INDEXES if field in filters), key=expected_matches)
+
+    def query_daily_rollups(self, user_id: str, start: date = None, end: date = None) -> list:
+        """
+        Read the daily rollup items for a user, limited to the given days when a range is supplied.
+        """
+        table = self.dynamodb_resource.Table(self.daily_table_name)
+        condition = Key('user_id').eq(user_id)
+        if start and end:
+            condition &= Key('day').between(start.isoformat(), end.isoformat())
+        elif start:
+            condition &= Key('day').gte(start.isoformat())
+        elif end:
+            condition &= Key('day').lte(end.isoformat())
+        query, days = {'KeyConditionExpression': condition}, []
+        while True:
+            response = table.query(**query)
+            days.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return days
+            query['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    def rebuild_daily_rollups(self, user_id: str) -> int:
+        """
+        Recompute a user's daily rollups from their stored bets, backfilling the derived
+        attributes on bets written before they existed. Returns the number of days written.
+
+        Run it while the user is not uploading; writes that land during the rebuild can be
+        overwritten.
+        """
+        bets = self.backfill_derived_attributes(user_id)
+        days = daily_deltas(bets)
+        daily_table = self.dynamodb_resource.Table(self.daily_table_name)
+        stale = [item['day'] for item in self.query_daily_rollups(user_id) if item['day'] not in days]
+        with daily_table.batch_writer() as batch:
+            for day in stale:
+                batch.delete_item(Key={'user_id': user_id, 'day': day})
+            for day, totals in days.items():
+                batch.put_item(Item={'user_id': user_id, 'day': day, **totals})
+        return len(days)
+
+    def backfill_derived_attributes(self, user_id: str) -> list:
+        """
+        Set event_date and the filter index keys on a user's bets that were stored without them.
+
+        Returns the user's bets, projected to what rollups and filters need.
+        """
+        bets_table = self.dynamodb_resource.Table(self.bets_table_name)
+        attributes = tuple(dict.fromkeys(ROLLUP_ATTRIBUTES + tuple(FILTER_INDEXES) + tuple(index_key(field) for field in FILTER_INDEXES)))
+        bets = list(self.query_user_bets(user_id, attributes=attributes, consistent_read=True))
+        for bet in bets:
+            missing = {name: value for name, value in derived_attributes(user_id, bet).items() if bet.get(name) != value}
+            if not missing:
+                continue
+            bet.update(missing)
+            names = {f'#d{index}': name for index, name in enumerate(missing)}
+            bets_table.update_item(Key={'user_id': user_id, 'bet_id': bet['bet_id']},
+                                   UpdateExpression='SET ' + ', '.join(f'{placeholder} = :d{index}' for index, placeholder in enumerate(names)),
+                                   ExpressionAttributeNames=names,
+                                   ExpressionAttributeValues={f':d{index}': value for index, value in enumerate(missing.values())})
+        return bets
+
+    def get_user_summary(self, user_id: str):
+        """
+        Read the materialized summary for a user, or None if they have no bets.
+        """
+        response = self.dynamodb_resource.Table(self.summary_table_name).get_item(Key={'user_id': user_id})
+        if 'Item' not in response:
+            return None
+        return summary_from_item(response['Item'])
+
+    def rebuild_user_summary(self, user_id: str):
+        """
+        Recompute a user's summary from their stored bets and replace the materialized item.
+
+        The replacement is conditional on the summary version read before the scan, so a
+        write that lands during the rebuild makes it start over instead of being lost. Imports
+        that stopped before applying their totals are applied first, which is the only way
+        their bankroll change is recovered.
+        """
+        self.apply_pending_imports(user_id)
+        summary_table = self.dynamodb_resource.Table(self.summary_table_name)
+        for _ in range(btb_transaction_retries + 1):
+            current = summary_table.get_item(Key={'user_id': user_id}, ConsistentRead=True).get('Item')
+            bets = list(self.query_user_bets(user_id, attributes=SUMMARY_ATTRIBUTES, consistent_read=True))
+
+            item = {'user_id': user_id, **summary_deltas(bets)}
+            item['version'] = (current or {}).get('version', 0) + 1
+            if current is None:
+                condition = Attr('user_id').not_exists()
+            else:
+                condition = Attr('version').eq(current.get('version', 0))
+            try:
+                if bets:
+                    summary_table.put_item(Item=item, ConditionExpression=condition)
+                elif current is not None:
+                    summary_table.delete_item(Key={'user_id': user_id}, ConditionExpression=condition)
+                return summary_from_item(item) if bets else None
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                    raise
+                logging.info(f"Summary for user {user_id} changed during rebuild, retrying")
+        raise RuntimeError(f"Summary for user {user_id} kept changing during rebuild")
+
+    def write_user_bets(self, user_id: str, bets: list) -> dict:
+        """
+        Write a user's bets and apply their combined profit/loss to the bankroll.
+
+        Each transaction holds as many bets as the transaction limit allows plus one
+        bankroll ADD, one summary ADD and one ADD per event day for exactly those bets,
+        so none of the aggregates can drift from the stored bets. Bets whose bet_id is already stored are skipped rather than
+        overwritten, which keeps re-uploads from being counted twice.
+
+        Returns the bet_ids that were written, skipped as duplicates and failed.
+        """
+        result = {'written': [], 'duplicates': [], 'failed': []}
+        unique_bets = {}
+        for bet in bets:
+            if bet['bet_id'] in unique_bets:
+                result['duplicates'].append(bet['bet_id'])
+            else:
+                unique_bets[bet['bet_id']] = bet
+
+        for bet in unique_bets.values():
+            bet.update(derived_attributes(user_id, bet))
+
+        for chunk in transaction_chunks(list(unique_bets.values())):
+            try:
+                written, duplicates = self._write_bets_transaction(user_id, chunk)
+                result['written'].extend(written)
+                result['duplicates'].extend(duplicates)
+            except Exception as e:
+                logging.error(f"Error writing {len(chunk)} bets for user {user_id}: {e}")
+                result['failed'].extend(bet['bet_id'] for bet in chunk)
+        # The transactions moved the bankroll, so the next read goes back to the table
+        self.user_cache.invalidate(user_id)
+        return result
+
+    def _write_bets_transaction(self, user_id: str, bets: list) -> tuple:
+        duplicates = []
+        attempt = 0
+        while bets:
+            profit_loss = sum((Decimal(str(bet.get('profit_loss') or 0)) for bet in bets), Decimal('0'))
+            actions = [{
+                'Put': {
+                    'TableName': self.bets_table_name,
+                    'Item': {key: serializer.serialize(value) for key, value in bet.items()},
+                    'ConditionExpression': 'attribute_not_exists(bet_id)'
+                }
+            } for bet in bets]
+            actions.extend({'Update': update} for update in self._daily_updates(user_id, bets))
+            actions.append({'Update': self._summary_update(user_id, summary_deltas(bets))})
+            actions.append({'Update': self._bankroll_update(user_id, profit_loss)})
+            try:
+                self.dynamodb_client.transact_write_items(TransactItems=actions)
+                return [bet['bet_id'] for bet in bets], duplicates
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                reasons = cancellation_reasons(e)
+                if len(reasons) == len(actions) and reasons[-1] == 'ConditionalCheckFailed':
+                    raise LookupError(f"User {user_id} not found") from e
+                if len(reasons) == len(actions) and 'ConditionalCheckFailed' in reasons[:len(bets)]:
+                    # Drop bets that are already stored and retry the rest
+                    duplicates.extend(bet['bet_id'] for bet, reason in zip(bets, reasons) if reason == 'ConditionalCheckFailed')
+                    bets = [bet for bet, reason in zip(bets, reasons) if reason != 'ConditionalCheckFailed']
+                    continue
+                # Another upload for the same user touched the bankroll first
+                attempt += 1
+                if attempt > btb_transaction_retries:
+                    raise
+                time.sleep(0.05 * 2 ** attempt)
+        return [], duplicates
+
+    def import_user_bets(self, user_id: str, bets: list) -> dict:
+        """
+        Bulk-write a user's bets with BatchWriteItem and apply their totals once at the end.
+
+        Bets already stored are found with BatchGetItem and skipped. The new bets are tagged
+        with an import_id and written in 25-item chunks across a small thread pool, retrying
+        UnprocessedItems with exponential backoff. The written bets' daily totals are then
+        added with one update per day, and their summary and bankroll totals in one
+        transaction, instead of one per write transaction.
+
+        A pending record for the import is stored before the first put and deleted by that
+        transaction. If the import stops in between, rebuild_user_summary applies the record
+        from the tagged bets, so the bankroll change is not lost when a retried import reports
+        every bet as a duplicate.
+
+        BatchWriteItem puts cannot be conditional, so this is meant for importing history; a
+        bet uploaded through write_user_bets while the import runs could be counted twice.
+        """
+        result = {'written': [], 'duplicates': [], 'failed': []}
+        unique_bets = {}
+        for bet in bets:
+            if bet['bet_id'] in unique_bets:
+                result['duplicates'].append(bet['bet_id'])
+            else:
+                unique_bets[bet['bet_id']] = bet
+        if self.get_user(user_id) is None:
+            logging.error(f"Error importing {len(unique_bets)} bets: user {user_id} not found")
+            result['failed'].extend(unique_bets)
+            return result
+
+        with ThreadPoolExecutor(max_workers=btb_bulk_workers) as pool:
+            for bet_id in self._get_bets(pool, user_id, list(unique_bets), ('bet_id',)):
+                result['duplicates'].append(bet_id)
+                del unique_bets[bet_id]
+
+            new_bets = list(unique_bets.values())
+            import_id = uuid.uuid4().hex
+            for bet in new_bets:
+                bet.update(derived_attributes(user_id, bet), import_id=import_id)
+            if new_bets:
+                self.dynamodb_resource.Table(self.imports_table_name).put_item(
+                    Item={'user_id': user_id, 'import_id': import_id, 'started_at': datetime.utcnow().isoformat()})
+            chunks = [new_bets[i:i + BATCH_WRITE_MAX_ITEMS] for i in range(0, len(new_bets), BATCH_WRITE_MAX_ITEMS)]
+            for chunk, failed in zip(chunks, pool.map(self._batch_write_bets, chunks)):
+                failed = set(failed)
+                result['failed'].extend(bet['bet_id'] for bet in chunk if bet['bet_id'] in failed)
+                result['written'].extend(bet['bet_id'] for bet in chunk if bet['bet_id'] not in failed)
+
+        written = [unique_bets[bet_id] for bet_id in result['written']]
+        if new_bets:
+            try:
+                for day, deltas in sorted(daily_deltas(written).items()):
+                    self.dynamodb_client.update_item(**self._add_update(self.daily_table_name, {'user_id': user_id, 'day': day}, deltas))
+                self._finish_import(user_id, import_id, written)
+            except ClientError as e:
+                logging.error(f"Could not apply the totals of import {import_id} for user {user_id}, rebuild the summary and timeseries: {e}")
+                raise
+        logging.info(f"Imported {len(written)} bets for user {user_id}: {len(result['duplicates'])} duplicates, {len(result['failed'])} failed")
+        return result
+
+    def existing_bet_ids(self, user_id: str, bet_ids: list) -> list:
+        """
+        Look up which bet_ids are stored with BatchGetItem, projecting only the key.
+
+        Up to 100 keys are read per call, on the bulk thread pool when there are more.
+        """
+        unique_ids = list(dict.fromkeys(bet_ids))
+        if not unique_ids:
+            return []
+        with ThreadPoolExecutor(max_workers=btb_bulk_workers) as pool:
+            stored = self._get_bets(pool, user_id, unique_ids, ('bet_id',))
+        return [bet_id for bet_id in unique_ids if bet_id in stored]
+
+    def _batch_get_bets(self, user_id: str, bet_ids: list, attributes) -> list:
+        """
+        Read up to 100 of a user's bets by bet_id, retrying unprocessed keys. Missing bets are left out.
+        """
+        names = {f'#p{index}': attribute for index, attribute in enumerate(attributes)}
+        keys = [{'user_id': {'S': user_id}, 'bet_id': {'S': bet_id}} for bet_id in bet_ids]
+        request = {self.bets_table_name: {'Keys': keys, 'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}}
+        items = []
+        for attempt in range(btb_bulk_retries + 1):
+            response = self.dynamodb_client.batch_get_item(RequestItems=request)
+            items.extend({key: deserializer.deserialize(value) for key, value in item.items()}
+                         for item in response['Responses'].get(self.bets_table_name, []))
+            request = response.get('UnprocessedKeys')
+            if not request:
+                return items
+            time.sleep(bulk_backoff(attempt))
+        raise RuntimeError(f"Could not read {len(request[self.bets_table_name]['Keys'])} bets for user {user_id} after {btb_bulk_retries} retries")
+
+    def _get_bets(self, pool: ThreadPoolExecutor, user_id: str, bet_ids: list, attributes) -> dict:
+        key_chunks = [bet_ids[i:i + BATCH_GET_MAX_KEYS] for i in range(0, len(bet_ids), BATCH_GET_MAX_KEYS)]
+        read = functools.partial(self._batch_get_bets, user_id, attributes=attributes)
+        return {bet['bet_id']: bet for items in pool.map(read, key_chunks) for bet in items}
+
+    def _finish_import(self, user_id: str, import_id: str, bets: list) -> bool:
+        """
+        Add an import's written bets to the summary and bankroll and delete its pending record, in one transaction.
+
+        Returns False without changing anything if the record was already deleted, so an import is applied at most once.
+        """
+        actions = []
+        if bets:
+            profit_loss = sum((Decimal(str(bet.get('profit_loss') or 0)) for bet in bets), Decimal('0'))
+            actions.append({'Update': self._summary_update(user_id, summary_deltas(bets))})
+            actions.append({'Update': self._bankroll_update(user_id, profit_loss)})
+        actions.append({'Delete': {
+            'TableName': self.imports_table_name,
+            'Key': {'user_id': {'S': user_id}, 'import_id': {'S': import_id}},
+            'ConditionExpression': 'attribute_exists(import_id)'
+        }})
+        try:
+            self.dynamodb_client.transact_write_items(TransactItems=actions)
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'TransactionCanceledException' and cancellation_reasons(e)[-1:] == ['ConditionalCheckFailed']:
+                return False
+            raise
+        finally:
+            self.user_cache.invalidate(user_id)
+        return True
+
+    def apply_pending_imports(self, user_id: str) -> int:
+        """
+        Apply the summary and bankroll totals of imports that stopped after writing some of their bets.
+
+        Each pending import is applied from the bets tagged with its import_id, and the daily
+        rollups are then recomputed. Run it while the user is not importing; an import still
+        in progress would be applied with only the bets written so far. Returns the number of
+        imports applied.
+        """
+        table = self.dynamodb_resource.Table(self.imports_table_name)
+        pending = table.query(KeyConditionExpression=Key('user_id').eq(user_id), ConsistentRead=True).get('Items', [])
+        if not pending:
+            return 0
+        imported = {}
+        for bet in self.query_user_bets(user_id, attributes=SUMMARY_ATTRIBUTES + ('import_id',), consistent_read=True):
+            imported.setdefault(bet.get('import_id'), []).append(bet)
+        applied = sum(self._finish_import(user_id, item['import_id'], imported.get(item['import_id'], [])) for item in pending)
+        logging.info(f"Applied {applied} pending imports for user {user_id}")
+        self.rebuild_daily_rollups(user_id)
+        return applied
+
+    def settle_user_bets(self, user_id: str, outcomes: dict) -> dict:
+        """
+        Settle a batch of a user's bets with conditional transactional updates.
+
+        The bets are read with BatchGetItem and their new profit/loss is computed with the
+        same rule as uploads. Each update sets the outcome, profit/loss and outcome index key,
+        on condition that the outcome is still the one that was read; bets settled concurrently
+        are reported as conflicts instead of being overwritten. Transactions run on the bulk
+        thread pool, and each one carries the net summary, daily and bankroll ADDs of exactly
+        the bets it settles, sized like write transactions to BTB_TRANSACTION_MAX_ITEMS actions.
+        A failed transaction leaves its bets unsettled, so retrying the request settles them
+        and moves the totals once.
+        """
+        result = {'settled': [], 'unchanged': [], 'not_found': [], 'conflicts': [], 'failed': [], 'bankroll_delta': Decimal('0')}
+        with ThreadPoolExecutor(max_workers=btb_bulk_workers) as pool:
+            stored = self._get_bets(pool, user_id, list(outcomes), SETTLEMENT_ATTRIBUTES)
+            result['not_found'] = [bet_id for bet_id in outcomes if bet_id not in stored]
+            changes, result['unchanged'] = plan_settlements(list(stored.values()), outcomes)
+            chunks = transaction_chunks(changes, day=lambda change: event_day(change[0]))
+            for chunk, (settled, conflicts) in zip(chunks, pool.map(functools.partial(self._settle_transaction, user_id), chunks)):
+                result['conflicts'].extend(conflicts)
+                if settled is None:
+                    result['failed'].extend(old['bet_id'] for old, _ in chunk if old['bet_id'] not in conflicts)
+                else:
+                    result['settled'].extend(settled)
+
+        settled = set(result['settled'])
+        changes = [(old, new) for old, new in changes if old['bet_id'] in settled]
+        result['bankroll_delta'] = bankroll_delta(changes)
+        # The transactions moved the bankroll, so the next read goes back to the table
+        self.user_cache.invalidate(user_id)
+        logging.info(f"Settled {len(changes)} bets for user {user_id}: {len(result['unchanged'])} unchanged, {len(result['not_found'])} not found, "
+                     f"{len(result['conflicts'])} conflicts, {len(result['failed'])} failed")
+        return result
+
+    def _settle_transaction(self, user_id: str, changes: list) -> tuple:
+        conflicts = []
+        attempt = 0
+        while changes:
+            summary, days = settlement_totals(changes)
+            actions = [{'Update': self._settle_update(user_id, old, new)} for old, new in changes]
+            actions.extend({'Update': self._add_update(self.daily_table_name, {'user_id': user_id, 'day': day}, deltas)}
+                           for day, deltas in sorted(days.items()))
+            actions.append({'Update': self._summary_update(user_id, summary)})
+            actions.append({'Update': self._bankroll_update(user_id, bankroll_delta(changes))})
+            try:
+                self.dynamodb_client.transact_write_items(TransactItems=actions)
+                return [old['bet_id'] for old, _ in changes], conflicts
+            except ClientError as e:
+                reasons = cancellation_reasons(e) if e.response['Error']['Code'] == 'TransactionCanceledException' else []
+                if len(reasons) == len(actions) and reasons[-1] == 'ConditionalCheckFailed':
+                    logging.error(f"Error settling {len(changes)} bets: user {user_id} not found")
+                    return None, conflicts
+                if len(reasons) == len(actions) and 'ConditionalCheckFailed' in reasons[:len(changes)]:
+                    # Another settlement changed these bets after they were read; keep its result
+                    conflicts.extend(old['bet_id'] for (old, _), reason in zip(changes, reasons) if reason == 'ConditionalCheckFailed')
+                    changes = [change for change, reason in zip(changes, reasons[:len(changes)]) if reason != 'ConditionalCheckFailed']
+                    continue
+                # Another write for the same user touched the summary, a day or the bankroll first
+                attempt += 1
+                if attempt > btb_transaction_retries or not reasons:
+                    logging.error(f"Error settling {len(changes)} bets for user {user_id}: {e}")
+                    return None, conflicts
+                time.sleep(0.05 * 2 ** attempt)
+        return [], conflicts
+
+    def _settle_update(self, user_id: str, old: dict, new: dict) -> dict:
+        values = {':outcome': new['outcome'], ':profit_loss': new['profit_loss'], ':index_key': derived_attributes(user_id, new)[index_key('outcome')]}
+        if old.get('outcome') is None:
+            condition = 'attribute_exists(bet_id) AND (attribute_not_exists(#outcome) OR attribute_type(#outcome, :null))'
+            values[':null'] = 'NULL'
+        else:
+            # Also fails for a bet deleted since it was read, so the update cannot recreate it
+            condition = '#outcome = :previous'
+            values[':previous'] = old['outcome']
+        return {
+            'TableName': self.bets_table_name,
+            'Key': {'user_id': {'S': user_id}, 'bet_id': {'S': old['bet_id']}},
+            'UpdateExpression': f'SET #outcome = :outcome, profit_loss = :profit_loss, {index_key("outcome")} = :index_key',
+            'ConditionExpression': condition,
+            'ExpressionAttributeNames': {'#outcome': 'outcome'},
+            'ExpressionAttributeValues': {name: serializer.serialize(value) for name, value in values.items()}
+        }
+
+    def _batch_write_bets(self, bets: list) -> list:
+        """
+        Write up to 25 bets, retrying unprocessed items. Returns the bet_ids that could not be written.
+        """
+        requests = [{'PutRequest': {'Item': {key: serializer.serialize(value) for key, value in bet.items()}}} for bet in bets]
+        for attempt in range(btb_bulk_retries + 1):
+            try:
+                response = self.dynamodb_client.batch_write_item(RequestItems={self.bets_table_name: requests})
+            except ClientError as e:
+                if e.response['Error']['Code'] not in ('ProvisionedThroughputExceededException', 'ThrottlingException'):
+                    logging.error(f"Error writing {len(requests)} bets: {e}")
+                    break
+            else:
+                requests = response.get('UnprocessedItems', {}).get(self.bets_table_name, [])
+                if not requests:
+                    return []
+            time.sleep(bulk_backoff(attempt))
+        return [request['PutRequest']['Item']['bet_id']['S'] for request in requests]
+
+def event_date_condition(start: date = None, end: date = None):
+    if start and end:
+        return Key('event_date').between(start.isoformat(), event_date_end(end))
+    if start:
+        return Key('event_date').gte(start.isoformat())
+    return Key('event_date').lte(event_date_end(end))
+
+def index_key(field: str) -> str:
+    return f'user_{field}'
+
+# Index queries carry the index's keys in LastEvaluatedKey as well as the table's
+CURSOR_KEYS = ('user_id', 'bet_id', 'event_date') + tuple(index_key(field) for field in FILTER_FIELDS)
+
+def _index(index_name: str, partition_key: str) -> dict:
+    return {
+        'IndexName': index_name,
+        'KeySchema': [
+            {'AttributeName': partition_key, 'KeyType': 'HASH'},
+            {'AttributeName': 'event_date', 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'ALL'},
+        'ProvisionedThroughput': {'ReadCapacityUnits': 10, 'WriteCapacityUnits': 10}
+    }
+
+def bets_indexes() -> list:
+    return [_index(EVENT_DATE_INDEX, 'user_id')] + [_index(index_name, index_key(field)) for field, index_name in FILTER_INDEXES.items()]
+
+def index_attribute_definitions() -> list:
+    return [{'AttributeName': name, 'AttributeType': 'S'} for name in ['event_date'] + [index_key(field) for field in FILTER_INDEXES]]
+
+# Attributes computed from a bet at write time: its normalized event date and the filter index keys
+def derived_attributes(user_id: str, bet: dict) -> dict:
+    derived = {'event_date': bet_event_date(bet)}
+    # Index keys cannot be NULL, so bets without a value stay out of that field's index
+    for field in FILTER_INDEXES:
+        if bet.get(field):
+            value = str(bet[field]).upper() if field == 'outcome' else bet[field]
+            derived[index_key(field)] = f'{user_id}#{value}'
+    return derived
+
+# Split bets, or settlement changes, so that each transaction's bet actions plus its per-day, summary and bankroll updates fit the limit
+def transaction_chunks(bets: list, day=event_day) -> list:
+    chunks, chunk, days = [], [], set()
+    for bet in bets:
+        bet_day = day(bet)
+        actions = len(chunk) + 1 + len(days | {bet_day}) + 2
+        if chunk and actions > btb_transaction_max_items:
+            chunks.append(chunk)
+            chunk, days = [], set()
+        chunk.append(bet)
+        days.add(bet_day)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+# Exponential backoff with full jitter, so the pool's workers do not retry in lockstep
+def bulk_backoff(attempt: int) -> float:
+    return random.uniform(0, min(5.0, 0.05 * 2 ** attempt))
+
+def cancellation_reasons(error: ClientError) -> list:
+    reasons = error.response.get('CancellationReasons')
+    if reasons:
+        return [reason.get('Code', 'None') for reason in reasons]
+    match = CANCELLATION_REASONS_PATTERN.search(error.response['Error'].get('Message', ''))
+    return [reason.strip() for reason in match.group(1).split(',')] if match else []
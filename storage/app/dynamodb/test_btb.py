@@ -0,0 +1,233 @@
+import os
+import unittest
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from botocore.exceptions import ClientError
+
+try:
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+# moto serves the engine's boto3 calls in process when no endpoint is set
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+
+from dynamodb import btb
+from dynamodb.btb import BTBDynamoDB, cancellation_reasons, transaction_chunks
+from engine import StaleVersionError
+
+def bet(bet_id, outcome="WON", league="NFL", bet_type="Spread", profit_loss="10", day=1, user_id="X", **extra):
+    return {"user_id": user_id, "bet_id": bet_id, "league": league, "bet_type": bet_type, "odds": "-110", "stake": "11.00", "outcome": outcome,
+            "profit_loss": Decimal(profit_loss), "date": f"9/{day}/24 • 12:00 PM", "upload_timestamp": "2024-09-30 10:00:00", **extra}
+
+@unittest.skipUnless(mock_aws, "moto is not installed")
+class DynamoDBTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.aws = mock_aws()
+        self.aws.start()
+        endpoint = mock.patch.object(btb, "btb_dynamodb_endpoint", None)
+        endpoint.start()
+        self.addCleanup(endpoint.stop)
+        self.engine = BTBDynamoDB()
+        self.engine.create_user({"user_id": "X", "bankroll": Decimal("100")})
+
+    def tearDown(self):
+        self.aws.stop()
+
+    def bankroll(self, user_id="X"):
+        return self.engine.get_user(user_id, consistent_read=True)["bankroll"]
+
+    def failing_bankroll_writes(self):
+        """Fail every write to the users table, whether on its own or inside a transaction."""
+        client = self.engine.dynamodb_client
+        error = ClientError({"Error": {"Code": "InternalServerError", "Message": "Internal server error"}}, "UpdateItem")
+        transact_write_items, update_item = client.transact_write_items, client.update_item
+
+        def transact(**kwargs):
+            if any(action.get("Update", {}).get("TableName") == self.engine.users_table_name for action in kwargs["TransactItems"]):
+                raise error
+            return transact_write_items(**kwargs)
+
+        def update(**kwargs):
+            if kwargs["TableName"] == self.engine.users_table_name:
+                raise error
+            return update_item(**kwargs)
+        return mock.patch.multiple(client, transact_write_items=transact, update_item=update)
+
+    def assertTotalsMatchRebuild(self, user_id="X"):
+        summary = self.engine.get_user_summary(user_id)
+        days = {item["day"]: item for item in self.engine.query_daily_rollups(user_id)}
+        self.assertEqual(summary, self.engine.rebuild_user_summary(user_id))
+        self.engine.rebuild_daily_rollups(user_id)
+        self.assertEqual(days, {item["day"]: item for item in self.engine.query_daily_rollups(user_id)})
+
+class TestWriteUserBets(DynamoDBTestCase):
+
+    def test_stored_bets_are_found_from_cancellation_reasons(self):
+        result = self.engine.write_user_bets("X", [bet("A"), bet("B", outcome="LOST", profit_loss="-11")])
+        self.assertEqual(result, {"written": ["A", "B"], "duplicates": [], "failed": []})
+        result = self.engine.write_user_bets("X", [bet("C"), bet("A"), bet("C")])
+        self.assertEqual(result, {"written": ["C"], "duplicates": ["C", "A"], "failed": []})
+        self.assertEqual(self.bankroll(), Decimal("109"))
+        self.assertEqual(self.engine.get_user_summary("X")["total_bets"], 3)
+
+    def test_unknown_user_fails_the_whole_write(self):
+        result = self.engine.write_user_bets("nobody", [bet("A", user_id="nobody"), bet("B", user_id="nobody")])
+        self.assertEqual(result, {"written": [], "duplicates": [], "failed": ["A", "B"]})
+        self.assertEqual(self.engine.existing_bet_ids("nobody", ["A", "B"]), [])
+        self.assertIsNone(self.engine.get_user_summary("nobody"))
+
+    def test_transactions_fit_the_action_limit(self):
+        bets = [bet(f"B{index}", day=1 + index % 3) for index in range(12)]
+        with mock.patch.object(btb, "btb_transaction_max_items", 8):
+            chunks = transaction_chunks(bets)
+            # Each chunk's puts, one update per event day, the summary and the bankroll
+            self.assertTrue(all(len(chunk) + len({bet["date"] for bet in chunk}) + 2 <= 8 for chunk in chunks))
+            self.assertEqual(sum(chunks, []), bets)
+            calls = []
+            transact = self.engine.dynamodb_client.transact_write_items
+            with mock.patch.object(self.engine.dynamodb_client, "transact_write_items",
+                                   side_effect=lambda **kwargs: calls.append(len(kwargs["TransactItems"])) or transact(**kwargs)):
+                result = self.engine.write_user_bets("X", bets)
+        self.assertEqual(len(result["written"]), 12)
+        self.assertEqual(len(calls), len(chunks))
+        self.assertTrue(all(actions <= 8 for actions in calls))
+        self.assertEqual(self.bankroll(), Decimal("220"))
+        self.assertTotalsMatchRebuild()
+
+    def test_totals_match_rebuild_after_writes_and_settles(self):
+        self.engine.write_user_bets("X", [bet("A"), bet("B", league="NBA", outcome="LOST", profit_loss="-11", day=2),
+                                          bet("C", outcome="PENDING", profit_loss="0", day=3), bet("D", bet_type="Totals", outcome="PUSH", profit_loss="0")])
+        result = self.engine.settle_user_bets("X", {"A": "LOST", "C": "WON", "D": "PUSH", "E": "WON"})
+        self.assertEqual((sorted(result["settled"]), result["unchanged"], result["not_found"]), (["A", "C"], ["D"], ["E"]))
+        self.assertEqual(self.bankroll(), Decimal("100") - 1 + result["bankroll_delta"])
+        summary = self.engine.get_user_summary("X")
+        self.assertEqual((summary["total_bets"], summary["wins"], summary["losses"], summary["pushes"]), (4, 1, 2, 1))
+        self.assertTotalsMatchRebuild()
+
+    def test_failed_settlement_can_be_retried(self):
+        self.engine.write_user_bets("X", [bet("P1", outcome="PENDING", profit_loss="0")])
+        with self.failing_bankroll_writes():
+            result = self.engine.settle_user_bets("X", {"P1": "WON"})
+        # The bet stays PENDING along with the totals, so the retry settles it and moves them once
+        self.assertEqual((result["settled"], result["failed"], result["bankroll_delta"]), ([], ["P1"], 0))
+        self.assertEqual(self.bankroll(), Decimal("100"))
+        result = self.engine.settle_user_bets("X", {"P1": "WON"})
+        self.assertEqual((result["settled"], result["unchanged"], result["bankroll_delta"]), (["P1"], [], Decimal("10")))
+        self.assertEqual(self.bankroll(), Decimal("110"))
+        self.assertEqual(self.engine.get_user_summary("X")["wins"], 1)
+        self.assertTotalsMatchRebuild()
+
+    def test_settlement_transactions_fit_the_action_limit(self):
+        self.engine.write_user_bets("X", [bet(f"P{index}", outcome="PENDING", profit_loss="0", day=1 + index % 4) for index in range(10)])
+        calls = []
+        transact = self.engine.dynamodb_client.transact_write_items
+        with mock.patch.object(btb, "btb_transaction_max_items", 7), \
+             mock.patch.object(self.engine.dynamodb_client, "transact_write_items",
+                               side_effect=lambda **kwargs: calls.append(len(kwargs["TransactItems"])) or transact(**kwargs)):
+            result = self.engine.settle_user_bets("X", {f"P{index}": "WON" for index in range(10)})
+        self.assertEqual(len(result["settled"]), 10)
+        self.assertGreater(len(calls), 1)
+        self.assertTrue(all(actions <= 7 for actions in calls))
+        self.assertEqual(self.bankroll(), Decimal("100") + result["bankroll_delta"])
+        self.assertTotalsMatchRebuild()
+
+class TestSetBankroll(DynamoDBTestCase):
+
+    def test_conditional_bankroll_write_needs_the_user(self):
+        for expected_version in (3, 0):
+            with self.assertRaises(StaleVersionError):
+                self.engine.set_bankroll("Q", Decimal("5"), expected_version=expected_version)
+        self.assertIsNone(self.engine.get_user("Q", consistent_read=True))
+        self.assertEqual(self.engine.set_bankroll("X", Decimal("5"), expected_version=0), {"bankroll": Decimal("5"), "version": 1})
+        with self.assertRaises(StaleVersionError):
+            self.engine.set_bankroll("X", Decimal("6"), expected_version=0)
+
+class TestImportUserBets(DynamoDBTestCase):
+
+    def test_import_applies_totals_once(self):
+        result = self.engine.import_user_bets("X", [bet(f"I{index}", day=1 + index % 3) for index in range(30)])
+        self.assertEqual((len(result["written"]), result["duplicates"], result["failed"]), (30, [], []))
+        self.assertEqual(self.bankroll(), Decimal("400"))
+        self.assertEqual(self.engine.apply_pending_imports("X"), 0)
+        self.assertTotalsMatchRebuild()
+        self.assertEqual(self.bankroll(), Decimal("400"))
+
+    def test_interrupted_import_is_applied_by_the_summary_rebuild(self):
+        self.engine.write_user_bets("X", [bet("A")])
+        with self.failing_bankroll_writes(), self.assertRaises(ClientError):
+            self.engine.import_user_bets("X", [bet("I1"), bet("I2", outcome="LOST", profit_loss="-11", day=2), bet("A")])
+        self.assertEqual(self.bankroll(), Decimal("110"))
+        # The retried import finds every bet stored, so only the pending record still knows about the totals
+        result = self.engine.import_user_bets("X", [bet("I1"), bet("I2", outcome="LOST", profit_loss="-11", day=2)])
+        self.assertEqual((result["written"], result["duplicates"]), ([], ["I1", "I2"]))
+        summary = self.engine.rebuild_user_summary("X")
+        self.assertEqual((summary["total_bets"], summary["losses"]), (3, 1))
+        self.assertEqual(self.bankroll(), Decimal("109"))
+        self.assertEqual(self.engine.apply_pending_imports("X"), 0)
+        self.assertEqual(self.bankroll(), Decimal("109"))
+        self.assertTotalsMatchRebuild()
+
+class TestCancellationReasons(unittest.TestCase):
+
+    def error(self, response):
+        return ClientError({"Error": {"Code": "TransactionCanceledException", "Message": "Transaction cancelled"}, **response}, "TransactWriteItems")
+
+    def test_reasons_are_read_from_the_response(self):
+        error = self.error({"CancellationReasons": [{"Code": "None"}, {"Code": "ConditionalCheckFailed", "Message": "The conditional request failed"}]})
+        self.assertEqual(cancellation_reasons(error), ["None", "ConditionalCheckFailed"])
+
+    def test_reasons_fall_back_to_the_message(self):
+        error = ClientError({"Error": {"Code": "TransactionCanceledException", "Message":
+                                       "Transaction cancelled, please refer cancellation reasons for specific reasons [None, ConditionalCheckFailed]"}},
+                            "TransactWriteItems")
+        self.assertEqual(cancellation_reasons(error), ["None", "ConditionalCheckFailed"])
+        self.assertEqual(cancellation_reasons(self.error({})), [])
+
+class TestBetPages(DynamoDBTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.engine.write_user_bets("X", [bet(f"B{index}", league=("NFL", "NBA")[index % 2], outcome=("WON", "LOST", "WON")[index % 3], day=20 - index)
+                                          for index in range(10)])
+
+    def read_pages(self, limit, **kwargs):
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = self.engine.query_user_bets_page("X", limit, cursor=cursor, attributes=["bet_id", "event_date"], **kwargs)
+            seen.extend(item["bet_id"] for item in page)
+            pages += 1
+            if not cursor:
+                return seen, pages
+
+    def test_pages_follow_bet_id_without_filters(self):
+        seen, pages = self.read_pages(4)
+        self.assertEqual(seen, [f"B{index}" for index in range(10)])
+        self.assertEqual(pages, 3)
+
+    def test_filtered_pages_follow_event_date_order(self):
+        seen, _ = self.read_pages(2, filters={"league": "NFL"})
+        self.assertEqual(seen, ["B8", "B6", "B4", "B2", "B0"])
+        seen, _ = self.read_pages(2, start=date(2024, 9, 14), end=date(2024, 9, 16))
+        self.assertEqual(seen, ["B6", "B5", "B4"])
+
+    def test_second_filter_is_applied_to_the_most_selective_index(self):
+        # Three of ten bets are LOST and five are NFL, so the outcome index is read
+        self.assertEqual(self.engine._most_selective_filter("X", {"league": "NFL", "outcome": "LOST"}), "outcome")
+        self.assertEqual(self.engine._most_selective_filter("X", {"league": "NBA", "outcome": "WON"}), "league")
+        seen, _ = self.read_pages(1, filters={"league": "NFL", "outcome": "LOST"})
+        self.assertEqual(seen, ["B4"])
+        seen, _ = self.read_pages(2, filters={"league": "NBA", "outcome": "WON"}, start=date(2024, 9, 12))
+        self.assertEqual(seen, ["B5", "B3"])
+
+    def test_cursor_is_bound_to_its_user(self):
+        _, cursor = self.engine.query_user_bets_page("X", 2, filters={"outcome": "WON"})
+        with self.assertRaises(ValueError):
+            self.engine.query_user_bets_page("Y", 2, cursor=cursor, filters={"outcome": "WON"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,297 @@
+# engine.py
+
+import asyncio
+import base64
+import functools
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+# dynamodb (DynamoDB Local) or sqlite (embedded, no JVM needed)
+btb_storage_engine = os.getenv('BTB_STORAGE_ENGINE', 'dynamodb')
+# Threads the endpoints await engine calls on, instead of the server's shared threadpool
+btb_storage_workers = int(os.getenv('BTB_STORAGE_WORKERS', '32'))
+
+# Totals kept for the user and for every league and bet type in the summary
+SUMMARY_STATS = ('bets', 'stake', 'profit_loss', 'wins', 'losses', 'pushes')
+SUMMARY_GROUPS = {'league': 'league_breakdown', 'bet_type': 'bet_type_breakdown'}
+# Bet fields the listing endpoint can filter on
+FILTER_FIELDS = ('league', 'bet_type', 'outcome', 'sportsbook')
+# Slip dates look like "9/29/24 12:02 PM" or "9/22/24 • 12:00 PM"; upload timestamps are str(datetime)
+EVENT_DATE_FORMATS = ('%m/%d/%y %I:%M %p', '%m/%d/%Y %I:%M %p', '%m/%d/%y', '%m/%d/%Y',
+                      '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d')
+
+class StaleVersionError(Exception):
+    """
+    Raised when a conditional bankroll write finds the user at a different version than expected.
+    """
+
+class StorageEngine(ABC):
+    """
+    Storage operations behind the /bets and /users endpoints.
+
+    Bets are dicts shaped like BetDetails with profit_loss already calculated. Engines
+    add event_date when a bet is written.
+    """
+
+    executor: ThreadPoolExecutor = None
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Await a blocking engine call on the engine's own bounded executor.
+
+        At most BTB_STORAGE_WORKERS calls run at once; further requests wait on the event loop
+        rather than queueing for threads that the rest of the server also needs.
+        """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=btb_storage_workers, thread_name_prefix='storage')
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    @abstractmethod
+    def write_user_bets(self, user_id: str, bets: list) -> dict:
+        """
+        Store a user's bets and add their combined profit/loss to the bankroll in the same write.
+
+        Bets whose bet_id is already stored are skipped. Returns the bet_ids that were
+        written, skipped as duplicates and failed.
+        """
+
+    def import_user_bets(self, user_id: str, bets: list) -> dict:
+        """
+        Store a large batch of a user's bets, such as a historical export, with one bankroll update.
+
+        Engines whose regular write is already a single transaction use it as is. Returns
+        the same result as write_user_bets.
+        """
+        return self.write_user_bets(user_id, bets)
+
+    @abstractmethod
+    def settle_user_bets(self, user_id: str, outcomes: dict) -> dict:
+        """
+        Change the outcome of a user's stored bets, keyed by bet_id, and recompute their profit/loss.
+
+        The summary, daily totals and bankroll move by the net change in the same write as the
+        bets they cover, so a failed settlement can be retried without the totals drifting.
+        Returns the bet_ids that were settled, already had that outcome, were not found, changed
+        concurrently (conflicts) or failed, and the bankroll delta applied.
+        """
+
+    @abstractmethod
+    def existing_bet_ids(self, user_id: str, bet_ids: list) -> list:
+        """
+        Return the given bet_ids that are already stored for the user, in the order given.
+
+        A key-only lookup on the (user_id, bet_id) primary key, so callers can drop slips that
+        were already ingested before paying to extract them.
+        """
+
+    @abstractmethod
+    def query_user_bets(self, user_id: str, attributes=None, consistent_read: bool = False, after: str = None):
+        """
+        Yield every bet for a user in bet_id order, limited to the given attributes when supplied.
+
+        When after is given, only bets whose bet_id sorts after it are read.
+        """
+
+    @abstractmethod
+    def query_user_bets_page(self, user_id: str, limit: int, cursor: str = None, attributes=None,
+                             start: date = None, end: date = None, filters: dict = None) -> tuple:
+        """
+        Read one page of a user's bets, optionally within an event date range and matching filters.
+
+        Returns the bets and an opaque cursor for the next page, or None after the last page.
+        Raises ValueError for a cursor that does not belong to this query.
+        """
+
+    @abstractmethod
+    def get_user_summary(self, user_id: str):
+        """
+        Return the user's summary, or None if they have no bets.
+        """
+
+    @abstractmethod
+    def rebuild_user_summary(self, user_id: str):
+        """
+        Recompute the user's summary from their stored bets, or return None if they have no bets.
+        """
+
+    @abstractmethod
+    def query_daily_rollups(self, user_id: str, start: date = None, end: date = None) -> list:
+        """
+        Return per-day totals as dicts with a "day" key and the SUMMARY_STATS.
+        """
+
+    @abstractmethod
+    def rebuild_daily_rollups(self, user_id: str) -> int:
+        """
+        Recompute per-day totals from the stored bets. Returns the number of days.
+        """
+
+    @abstractmethod
+    def backfill_derived_attributes(self, user_id: str) -> list:
+        """
+        Add event_date and any index attributes to bets stored without them. Returns the user's bets.
+        """
+
+    @abstractmethod
+    def get_user(self, user_id: str, consistent_read: bool = False):
+        """
+        Return the user as a dict, or None if they do not exist.
+
+        The user's version counts bankroll changes. Engines may serve the user from a cache
+        unless consistent_read is set.
+        """
+
+    @abstractmethod
+    def create_user(self, user: dict) -> bool:
+        """
+        Store a new user. Returns False if the user already exists.
+        """
+
+    @abstractmethod
+    def set_bankroll(self, user_id: str, bankroll: Decimal, expected_version: int = None) -> dict:
+        """
+        Overwrite a user's bankroll and return the new bankroll and version.
+
+        With expected_version, raises StaleVersionError instead if the bankroll changed since
+        that version was read.
+        """
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+def create_storage_engine(name: str = None) -> StorageEngine:
+    name = (name or btb_storage_engine).lower()
+    logging.info(f"Using the {name} storage engine")
+    # Engines are imported lazily so that each only needs its own client library
+    if name == 'sqlite':
+        from sqlite.btb import BTBSQLite
+        return BTBSQLite()
+    if name == 'dynamodb':
+        from dynamodb.btb import BTBDynamoDB
+        return BTBDynamoDB()
+    raise ValueError(f"Unknown storage engine: {name}")
+
+# Sortable "YYYY-MM-DDTHH:MM" for the slip's event date, falling back to the upload time
+def normalize_event_date(date_text, fallback=None):
+    for text in (date_text, fallback):
+        if not text:
+            continue
+        cleaned = ' '.join(str(text).replace('•', ' ').split())
+        for date_format in EVENT_DATE_FORMATS:
+            try:
+                return datetime.strptime(cleaned, date_format).isoformat(timespec='minutes')
+            except ValueError:
+                continue
+    return None
+
+# Every bet gets an event date so that it appears in date-ordered reads; the write time is the last resort
+def bet_event_date(bet: dict) -> str:
+    event_date = bet.get('event_date') or normalize_event_date(bet.get('date'), bet.get('upload_timestamp'))
+    return event_date or datetime.utcnow().isoformat(timespec='minutes')
+
+def event_day(bet: dict) -> str:
+    event_date = bet.get('event_date') or normalize_event_date(bet.get('date'), bet.get('upload_timestamp'))
+    return event_date[:10] if event_date else 'unknown'
+
+# event_date carries a time, so an end day is included up to its last minute
+def event_date_end(end: date) -> str:
+    return f'{end.isoformat()}T23:59'
+
+def parse_amount(value) -> Decimal:
+    try:
+        return Decimal(str(value).replace('$', '').replace(',', '')) if value is not None else Decimal('0')
+    except ArithmeticError:
+        return Decimal('0')
+
+# Cursors are the last key read, URL-safe encoded
+def encode_cursor(last_key: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(last_key, default=str).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, user_id: str, key_names=('user_id', 'bet_id', 'event_date')) -> dict:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except ValueError as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(key, dict) or key.get('user_id') != user_id or not isinstance(key.get('bet_id'), str):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return {name: key[name] for name in key_names if isinstance(key.get(name), str)}
+
+def _add_stats(deltas: dict, prefix: str, bet: dict):
+    outcome = str(bet.get('outcome') or '').upper()
+    for stat, value in (('bets', 1), ('stake', parse_amount(bet.get('stake'))), ('profit_loss', parse_amount(bet.get('profit_loss'))),
+                        ('wins', int(outcome == 'WON')), ('losses', int(outcome == 'LOST')), ('pushes', int(outcome == 'PUSH'))):
+        deltas[prefix + stat] = deltas.get(prefix + stat, 0) + value
+
+# Summary totals contributed by a list of bets, keyed as flat attributes such as "league:NFL:stake"
+def summary_deltas(bets: list) -> dict:
+    deltas = {}
+    for bet in bets:
+        _add_stats(deltas, '', bet)
+        for group in SUMMARY_GROUPS:
+            _add_stats(deltas, f"{group}:{bet.get(group) or 'Unknown'}:", bet)
+    return deltas
+
+# Rollup totals contributed by a list of bets, keyed by event day
+def daily_deltas(bets: list) -> dict:
+    days = {}
+    for bet in bets:
+        _add_stats(days.setdefault(event_day(bet), {}), '', bet)
+    return days
+
+# Shape flat summary totals into the summary endpoint's response
+def summary_from_item(item: dict) -> dict:
+    summary = {
+        'total_profit_loss': round(Decimal(str(item.get('profit_loss', 0))), 4),
+        'total_bets': item.get('bets', 0),
+        'total_stake': item.get('stake', 0),
+        'wins': item.get('wins', 0),
+        'losses': item.get('losses', 0),
+        'pushes': item.get('pushes', 0)
+    }
+    summary.update({breakdown: {} for breakdown in SUMMARY_GROUPS.values()})
+    details = {group: {} for group in SUMMARY_GROUPS}
+    for attribute, value in item.items():
+        group, _, rest = attribute.partition(':')
+        if group not in SUMMARY_GROUPS or ':' not in rest:
+            continue
+        key, stat = rest.rsplit(':', 1)
+        details[group].setdefault(key, {})[stat] = value
+        if stat == 'profit_loss':
+            summary[SUMMARY_GROUPS[group]][key] = round(Decimal(str(value)), 4)
+    summary['league_details'] = details['league']
+    summary['bet_type_details'] = details['bet_type']
+    return summary
+
+# Group daily totals into day, week (starting Monday) or month buckets with a running total
+def bucket_rollups(days: list, bucket: str) -> list:
+    buckets = {}
+    for item in days:
+        if item['day'] == 'unknown':
+            continue
+        day = date.fromisoformat(item['day'])
+        if bucket == 'week':
+            key = (day - timedelta(days=day.weekday())).isoformat()
+        elif bucket == 'month':
+            key = day.isoformat()[:7]
+        else:
+            key = day.isoformat()
+        totals = buckets.setdefault(key, {stat: 0 for stat in SUMMARY_STATS})
+        for stat in SUMMARY_STATS:
+            totals[stat] += item.get(stat, 0)
+    series, cumulative = [], Decimal('0')
+    for key in sorted(buckets):
+        totals = buckets[key]
+        cumulative += Decimal(str(totals['profit_loss']))
+        series.append({'bucket': key, **totals, 'profit_loss': round(Decimal(str(totals['profit_loss'])), 4),
+                       'cumulative_profit_loss': round(cumulative, 4)})
+    return series
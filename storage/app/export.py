@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import logging
+import os
+from decimal import Decimal
+from service_models.models import BetDetails
+
+# Parquet export is only offered when pyarrow is installed
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Configure logging to output to standard output
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+# Rows per Parquet row group; each group is sent as soon as it is written
+btb_export_row_group_size = int(os.getenv('BTB_EXPORT_ROW_GROUP_SIZE', '10000'))
+# NDJSON and CSV rows are sent in chunks of this many rows
+EXPORT_CHUNK_ROWS = 500
+
+# Columns of every export, in a fixed order so that resumed exports line up
+EXPORT_FIELDS = tuple(BetDetails.model_fields) + ('event_date',)
+EXPORT_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+def parquet_available() -> bool:
+    return pq is not None
+
+def _chunks(rows, size: int):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# Decimals are written as numbers, as the JSON endpoints do
+def _json_default(value):
+    return float(value) if isinstance(value, Decimal) else str(value)
+
+def ndjson_chunks(bets):
+    for chunk in _chunks(bets, EXPORT_CHUNK_ROWS):
+        yield ''.join(json.dumps({field: bet.get(field) for field in EXPORT_FIELDS}, default=_json_default) + '\n' for bet in chunk).encode('utf-8')
+
+def csv_chunks(bets, header: bool = True):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+    if header:
+        writer.writeheader()
+    for chunk in _chunks(bets, EXPORT_CHUNK_ROWS):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+class _ParquetSink:
+    """
+    Write-only file that hands written bytes back to the response instead of keeping them.
+
+    The writer records column chunk offsets from tell(), so the position keeps counting
+    across drains.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.pending.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data, self.pending = b''.join(self.pending), []
+        return data
+
+def parquet_schema():
+    # Bet fields are stored as text; profit/loss is the only computed number
+    return pa.schema([(field, pa.float64() if field == 'profit_loss' else pa.string()) for field in EXPORT_FIELDS])
+
+def parquet_chunks(bets, row_group_size: int = None):
+    schema = parquet_schema()
+    sink = _ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for chunk in _chunks(bets, row_group_size or btb_export_row_group_size):
+            columns = {field: [None if bet.get(field) is None else str(bet[field]) for bet in chunk] for field in EXPORT_FIELDS}
+            columns['profit_loss'] = [None if bet.get('profit_loss') is None else float(bet['profit_loss']) for bet in chunk]
+            writer.write_table(pa.table(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_chunks(export_format: str, bets, header: bool = True):
+    """
+    Encode bets as NDJSON, CSV or Parquet, yielding bytes as each chunk or row group is ready.
+    """
+    if export_format == 'parquet':
+        return parquet_chunks(bets)
+    if export_format == 'csv':
+        return csv_chunks(bets, header=header)
+    return ndjson_chunks(bets)
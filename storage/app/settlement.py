@@ -0,0 +1,98 @@
+import decimal
+import logging
+import pandas as pd
+from decimal import Decimal
+from engine import SUMMARY_GROUPS, event_day, parse_amount
+
+# Configure logging to output to standard output
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+def bet_profit_loss(stake: Decimal, odds: str, outcome: str) -> Decimal:
+    """
+    Profit/loss of a bet under American odds, for bets written through /bets and settled alike.
+
+    A win pays stake * odds / 100 on odds starting with '+' and stake * 100 / |odds| on odds
+    starting with '-'; unsigned, EVEN or unparseable odds pay nothing. A loss costs the stake
+    and any other outcome is zero. The result keeps full Decimal precision.
+    """
+    outcome = outcome.upper()
+    if outcome == 'WON':
+        try:
+            if odds.startswith('-'):
+                return stake * (Decimal('100') / Decimal(odds.replace('-', '')))
+            if odds.startswith('+'):
+                return stake * (Decimal(odds.replace('+', '')) / Decimal('100'))
+        except (ValueError, decimal.InvalidOperation):
+            logging.error(f"Invalid odds: {odds}")
+        return Decimal('0.0')
+    if outcome == 'LOST':
+        return -stake
+    return Decimal('0.0')
+
+def settled_profit_loss(bets: list, outcomes: list) -> list:
+    """
+    Profit/loss of each bet under its new outcome, exactly as calculate_profit_loss computes it on upload.
+
+    Settled batches repeat a handful of odds, stakes and outcomes, so each distinct
+    combination is computed once.
+    """
+    computed = {}
+    profit_loss = []
+    for bet, outcome in zip(bets, outcomes):
+        key = (bet.get('odds') or '', str(bet.get('stake')), outcome)
+        if key not in computed:
+            computed[key] = bet_profit_loss(parse_amount(bet.get('stake')), *key[::2])
+        profit_loss.append(computed[key])
+    return profit_loss
+
+def plan_settlements(stored_bets: list, outcomes: dict) -> tuple:
+    """
+    Pair each stored bet whose outcome changes with its settled version.
+
+    Returns the (stored, settled) pairs and the bet_ids already at their requested outcome.
+    """
+    outcomes = {bet_id: str(outcome).upper() for bet_id, outcome in outcomes.items()}
+    changed = [bet for bet in stored_bets if str(bet.get('outcome') or '').upper() != outcomes[bet['bet_id']]]
+    unchanged = [bet['bet_id'] for bet in stored_bets if str(bet.get('outcome') or '').upper() == outcomes[bet['bet_id']]]
+    new_outcomes = [outcomes[bet['bet_id']] for bet in changed]
+    changes = [(bet, {**bet, 'outcome': outcome, 'profit_loss': profit_loss})
+               for bet, outcome, profit_loss in zip(changed, new_outcomes, settled_profit_loss(changed, new_outcomes))]
+    return changes, unchanged
+
+def _amount(value) -> Decimal:
+    return value if isinstance(value, Decimal) else parse_amount(value)
+
+def bankroll_delta(changes: list) -> Decimal:
+    return sum((_amount(new.get('profit_loss')) - _amount(old.get('profit_loss')) for old, new in changes), Decimal('0'))
+
+def _totals(grouped: pd.DataFrame, prefix: str = '') -> dict:
+    return {f'{prefix}{stat}': value if stat == 'profit_loss' else int(value) for stat, value in grouped.items() if value != 0}
+
+def settlement_totals(changes: list) -> tuple:
+    """
+    Net change to the summary and to each day's totals when stored bets are replaced by their settled versions.
+
+    A settled bet keeps its stake, league, bet type and day, so only profit/loss and the
+    outcome counts move. They are summed per group in one pass; profit/loss stays Decimal
+    so the totals match a rebuild exactly.
+    """
+    if not changes:
+        return {}, {}
+    stored_outcome = pd.Series([str(old.get('outcome') or '').upper() for old, _ in changes])
+    settled_outcome = pd.Series([new['outcome'] for _, new in changes])
+    frame = pd.DataFrame({
+        'day': [event_day(old) for old, _ in changes],
+        'profit_loss': [_amount(new.get('profit_loss')) - _amount(old.get('profit_loss')) for old, new in changes],
+    })
+    for group in SUMMARY_GROUPS:
+        frame[group] = [old.get(group) or 'Unknown' for old, _ in changes]
+    for stat, outcome in (('wins', 'WON'), ('losses', 'LOST'), ('pushes', 'PUSH')):
+        frame[stat] = settled_outcome.eq(outcome).astype(int) - stored_outcome.eq(outcome).astype(int)
+
+    stats = ['profit_loss', 'wins', 'losses', 'pushes']
+    summary = _totals(frame[stats].sum())
+    for group in SUMMARY_GROUPS:
+        for key, grouped in frame.groupby(group, sort=False)[stats].sum().iterrows():
+            summary.update(_totals(grouped, f'{group}:{key}:'))
+    days = {day: _totals(grouped) for day, grouped in frame.groupby('day', sort=False)[stats].sum().iterrows()}
+    return summary, {day: deltas for day, deltas in days.items() if deltas}
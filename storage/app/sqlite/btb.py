@@ -0,0 +1,278 @@
+# sqlite/btb.py
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import date
+from decimal import Decimal
+from engine import (FILTER_FIELDS, SUMMARY_GROUPS, StaleVersionError, StorageEngine, bet_event_date, decode_cursor, encode_cursor,
+                    event_date_end, parse_amount, summary_from_item)
+from settlement import bankroll_delta, plan_settlements
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
+
+btb_sqlite_path = os.getenv('BTB_SQLITE_PATH', 'data/btb.sqlite3')
+
+# Filterable fields get their own column and an index that keeps each user's matches in event date order
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id TEXT PRIMARY KEY,
+        bankroll TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS bets (
+        user_id TEXT NOT NULL,
+        bet_id TEXT NOT NULL,
+        event_date TEXT NOT NULL,
+        league TEXT,
+        bet_type TEXT,
+        outcome TEXT,
+        sportsbook TEXT,
+        stake REAL NOT NULL DEFAULT 0,
+        profit_loss REAL NOT NULL DEFAULT 0,
+        data TEXT NOT NULL,
+        PRIMARY KEY (user_id, bet_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS bets_by_event_date ON bets (user_id, event_date, bet_id)",
+] + [f"CREATE INDEX IF NOT EXISTS bets_by_{field} ON bets (user_id, {field}, event_date, bet_id)" for field in FILTER_FIELDS]
+
+# Aggregate columns in the same order as the summary stats
+STATS_SQL = "COUNT(*), TOTAL(stake), TOTAL(profit_loss), COALESCE(SUM(outcome = 'WON'), 0), COALESCE(SUM(outcome = 'LOST'), 0), COALESCE(SUM(outcome = 'PUSH'), 0)"
+STATS_COLUMNS = ('bets', 'stake', 'profit_loss', 'wins', 'losses', 'pushes')
+# Stays under SQLite's default limit on bound parameters per statement
+SQLITE_MAX_PARAMETERS = 900
+
+class BTBSQLite(StorageEngine):
+    def __init__(self, path: str = None):
+        self.path = path or btb_sqlite_path
+        if self.path != ':memory:' and os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # One connection per thread; WAL lets readers run alongside the single writer
+        self.local = threading.local()
+        self.connections = []
+        self.connections_lock = threading.Lock()
+        connection = self._connection()
+        for statement in SCHEMA:
+            connection.execute(statement)
+        # Databases created before bankroll versions were tracked
+        if 'version' not in {column[1] for column in connection.execute('PRAGMA table_info(users)')}:
+            connection.execute('ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+            with self.connections_lock:
+                self.connections.append(connection)
+        return connection
+
+    def close(self):
+        super().close()
+        with self.connections_lock:
+            for connection in self.connections:
+                connection.close()
+            self.connections.clear()
+        self.local = threading.local()
+
+    def write_user_bets(self, user_id: str, bets: list) -> dict:
+        result = {'written': [], 'duplicates': [], 'failed': []}
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock up front, so the bankroll read and update cannot interleave
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT bankroll FROM users WHERE user_id = ?', (user_id,)).fetchone()
+            if row is None:
+                raise LookupError(f"User {user_id} not found")
+            profit_loss = Decimal('0')
+            for bet in bets:
+                bet = {**bet, 'event_date': bet_event_date(bet)}
+                outcome = str(bet.get('outcome')).upper() if bet.get('outcome') else None
+                cursor = connection.execute(
+                    """INSERT INTO bets (user_id, bet_id, event_date, league, bet_type, outcome, sportsbook, stake, profit_loss, data)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING""",
+                    (user_id, bet['bet_id'], bet['event_date'], bet.get('league'), bet.get('bet_type'), outcome, bet.get('sportsbook'),
+                     float(parse_amount(bet.get('stake'))), float(parse_amount(bet.get('profit_loss'))), json.dumps(bet, default=str)))
+                if cursor.rowcount:
+                    result['written'].append(bet['bet_id'])
+                    profit_loss += parse_amount(bet.get('profit_loss'))
+                else:
+                    result['duplicates'].append(bet['bet_id'])
+            connection.execute('UPDATE users SET bankroll = ?, version = version + 1 WHERE user_id = ?', (str(Decimal(row[0]) + profit_loss), user_id))
+            connection.execute('COMMIT')
+        except Exception as e:
+            connection.execute('ROLLBACK')
+            logging.error(f"Error writing {len(bets)} bets for user {user_id}: {e}")
+            return {'written': [], 'duplicates': [], 'failed': [bet['bet_id'] for bet in bets]}
+        return result
+
+    def settle_user_bets(self, user_id: str, outcomes: dict) -> dict:
+        result = {'settled': [], 'unchanged': [], 'not_found': [], 'conflicts': [], 'failed': [], 'bankroll_delta': Decimal('0')}
+        connection = self._connection()
+        # The write lock is held from the read, so nothing can settle these bets in between
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            bet_ids = list(outcomes)
+            stored = []
+            for start in range(0, len(bet_ids), SQLITE_MAX_PARAMETERS):
+                chunk = bet_ids[start:start + SQLITE_MAX_PARAMETERS]
+                rows = connection.execute(f"SELECT data FROM bets WHERE user_id = ? AND bet_id IN ({', '.join('?' * len(chunk))})", (user_id, *chunk))
+                stored.extend(bet_from_row(data) for (data,) in rows)
+            found = {bet['bet_id'] for bet in stored}
+            result['not_found'] = [bet_id for bet_id in bet_ids if bet_id not in found]
+            changes, result['unchanged'] = plan_settlements(stored, outcomes)
+            connection.executemany(
+                'UPDATE bets SET outcome = ?, profit_loss = ?, data = ? WHERE user_id = ? AND bet_id = ?',
+                [(new['outcome'], float(new['profit_loss']), json.dumps(new, default=str), user_id, new['bet_id']) for _, new in changes])
+            result['bankroll_delta'] = bankroll_delta(changes)
+            if changes:
+                row = connection.execute('SELECT bankroll FROM users WHERE user_id = ?', (user_id,)).fetchone()
+                if row is not None:
+                    connection.execute('UPDATE users SET bankroll = ?, version = version + 1 WHERE user_id = ?',
+                                       (str(Decimal(row[0]) + result['bankroll_delta']), user_id))
+            connection.execute('COMMIT')
+        except Exception as e:
+            connection.execute('ROLLBACK')
+            logging.error(f"Error settling {len(outcomes)} bets for user {user_id}: {e}")
+            return {'settled': [], 'unchanged': [], 'not_found': [], 'conflicts': [], 'failed': list(outcomes), 'bankroll_delta': Decimal('0')}
+        result['settled'] = [new['bet_id'] for _, new in changes]
+        return result
+
+    def existing_bet_ids(self, user_id: str, bet_ids: list) -> list:
+        # Answered from the primary key index without reading the bet data
+        unique_ids = list(dict.fromkeys(bet_ids))
+        stored = set()
+        for start in range(0, len(unique_ids), SQLITE_MAX_PARAMETERS):
+            chunk = unique_ids[start:start + SQLITE_MAX_PARAMETERS]
+            rows = self._connection().execute(f"SELECT bet_id FROM bets WHERE user_id = ? AND bet_id IN ({', '.join('?' * len(chunk))})", (user_id, *chunk))
+            stored.update(bet_id for (bet_id,) in rows)
+        return [bet_id for bet_id in unique_ids if bet_id in stored]
+
+    def query_user_bets(self, user_id: str, attributes=None, consistent_read: bool = False, after: str = None):
+        cursor = self._connection().execute('SELECT data FROM bets WHERE user_id = ? AND bet_id > ? ORDER BY bet_id', (user_id, after or ''))
+        while rows := cursor.fetchmany(1000):
+            for (data,) in rows:
+                yield bet_from_row(data, attributes)
+
+    def query_user_bets_page(self, user_id: str, limit: int, cursor: str = None, attributes=None,
+                             start: date = None, end: date = None, filters: dict = None) -> tuple:
+        filters = {field: value for field, value in (filters or {}).items() if value is not None}
+        conditions, parameters = ['user_id = ?'], [user_id]
+        for field, value in filters.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter: {field}")
+            conditions.append(f'{field} = ?')
+            parameters.append(value.upper() if field == 'outcome' else value)
+        if start:
+            conditions.append('event_date >= ?')
+            parameters.append(start.isoformat())
+        if end:
+            conditions.append('event_date <= ?')
+            parameters.append(event_date_end(end))
+
+        # Date ranges and filters read in event date order like the DynamoDB indexes; otherwise bet_id order
+        by_event_date = bool(filters or start or end)
+        if cursor:
+            key = decode_cursor(cursor, user_id)
+            if by_event_date:
+                if 'event_date' not in key:
+                    raise ValueError(f"Invalid cursor: {cursor}")
+                conditions.append('(event_date, bet_id) > (?, ?)')
+                parameters.extend([key['event_date'], key['bet_id']])
+            else:
+                conditions.append('bet_id > ?')
+                parameters.append(key['bet_id'])
+        order = 'event_date, bet_id' if by_event_date else 'bet_id'
+        rows = self._connection().execute(
+            f"SELECT bet_id, event_date, data FROM bets WHERE {' AND '.join(conditions)} ORDER BY {order} LIMIT ?",
+            (*parameters, limit + 1)).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            bet_id, event_date, _ = rows[-1]
+            last_key = {'user_id': user_id, 'bet_id': bet_id}
+            if by_event_date:
+                last_key['event_date'] = event_date
+            next_cursor = encode_cursor(last_key)
+        return [bet_from_row(data, attributes) for _, _, data in rows], next_cursor
+
+    def get_user_summary(self, user_id: str):
+        # Computed with indexed aggregates on every call; there is nothing to keep in sync
+        connection = self._connection()
+        totals = connection.execute(f'SELECT {STATS_SQL} FROM bets WHERE user_id = ?', (user_id,)).fetchone()
+        if not totals[0]:
+            return None
+        item = stats_item('', totals)
+        for group in SUMMARY_GROUPS:
+            rows = connection.execute(
+                f"SELECT COALESCE(NULLIF({group}, ''), 'Unknown') AS grouped, {STATS_SQL} FROM bets WHERE user_id = ? GROUP BY grouped",
+                (user_id,))
+            for grouped, *stats in rows:
+                item.update(stats_item(f'{group}:{grouped}:', stats))
+        return summary_from_item(item)
+
+    def rebuild_user_summary(self, user_id: str):
+        return self.get_user_summary(user_id)
+
+    def query_daily_rollups(self, user_id: str, start: date = None, end: date = None) -> list:
+        conditions, parameters = ['user_id = ?'], [user_id]
+        if start:
+            conditions.append('event_date >= ?')
+            parameters.append(start.isoformat())
+        if end:
+            conditions.append('event_date <= ?')
+            parameters.append(event_date_end(end))
+        rows = self._connection().execute(
+            f"SELECT substr(event_date, 1, 10) AS day, {STATS_SQL} FROM bets WHERE {' AND '.join(conditions)} GROUP BY day ORDER BY day",
+            parameters)
+        return [{'day': day, **stats_item('', stats)} for day, *stats in rows]
+
+    def rebuild_daily_rollups(self, user_id: str) -> int:
+        return len(self.query_daily_rollups(user_id))
+
+    def backfill_derived_attributes(self, user_id: str) -> list:
+        # event_date and the filter columns are always set on insert
+        return list(self.query_user_bets(user_id))
+
+    def get_user(self, user_id: str, consistent_read: bool = False):
+        # A local indexed read; there is no remote read capacity to save with a cache
+        row = self._connection().execute('SELECT user_id, bankroll, version FROM users WHERE user_id = ?', (user_id,)).fetchone()
+        return {'user_id': row[0], 'bankroll': Decimal(row[1]), 'version': row[2]} if row else None
+
+    def create_user(self, user: dict) -> bool:
+        cursor = self._connection().execute('INSERT INTO users (user_id, bankroll) VALUES (?, ?) ON CONFLICT DO NOTHING',
+                                            (user['user_id'], str(Decimal(str(user.get('bankroll', 0))))))
+        return cursor.rowcount > 0
+
+    def set_bankroll(self, user_id: str, bankroll: Decimal, expected_version: int = None) -> dict:
+        bankroll = Decimal(str(bankroll))
+        # fetchall steps the statement to completion, which ends its implicit transaction
+        if expected_version is None:
+            rows = self._connection().execute(
+                """INSERT INTO users (user_id, bankroll, version) VALUES (?, ?, 1)
+                   ON CONFLICT (user_id) DO UPDATE SET bankroll = excluded.bankroll, version = version + 1
+                   RETURNING version""", (user_id, str(bankroll))).fetchall()
+        else:
+            # A conditional write never creates the user, matching the DynamoDB engine
+            rows = self._connection().execute('UPDATE users SET bankroll = ?, version = version + 1 WHERE user_id = ? AND version = ? RETURNING version',
+                                              (str(bankroll), user_id, expected_version)).fetchall()
+        if not rows:
+            raise StaleVersionError(f"Bankroll for user {user_id} has changed since version {expected_version}")
+        return {'bankroll': bankroll, 'version': rows[0][0]}
+
+def bet_from_row(data: str, attributes=None) -> dict:
+    bet = json.loads(data)
+    if bet.get('profit_loss') is not None:
+        bet['profit_loss'] = Decimal(str(bet['profit_loss']))
+    if attributes:
+        return {attribute: bet[attribute] for attribute in attributes if attribute in bet}
+    return bet
+
+def stats_item(prefix: str, stats) -> dict:
+    return {prefix + column: round(value, 4) if isinstance(value, float) else value for column, value in zip(STATS_COLUMNS, stats)}
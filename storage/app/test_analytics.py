@@ -0,0 +1,51 @@
+import random
+import unittest
+from decimal import Decimal
+
+from analytics import compute_analytics, to_american_odds
+
+def bet(outcome, odds="-110", stake="11.00", profit_loss=None, league="NFL", bet_type="Spread", date="9/22/24 • 12:00 PM"):
+    if profit_loss is None:
+        profit_loss = {"WON": Decimal("10"), "LOST": Decimal("-11")}.get(outcome, Decimal("0"))
+    return {"bet_id": str(random.random()), "league": league, "bet_type": bet_type, "date": date, "odds": odds,
+            "stake": stake, "profit_loss": profit_loss, "outcome": outcome, "upload_timestamp": "2024-09-23 10:00:00"}
+
+class TestAnalytics(unittest.TestCase):
+
+    def test_totals_and_breakdowns(self):
+        bets = [bet("WON"), bet("LOST", league="NBA"), bet("PUSH", odds="+150", stake="$10.00", date=None),
+                bet("WON", odds="EVEN", stake="10", profit_loss=Decimal("10"), date="10/05/24 • 7:30 PM")]
+        analytics = compute_analytics(bets)
+        self.assertEqual((analytics["total_bets"], analytics["wins"], analytics["losses"], analytics["pushes"]), (4, 2, 1, 1))
+        self.assertEqual(analytics["total_profit_loss"], 9.0)
+        self.assertEqual(analytics["win_rate"], round(2 / 3, 4))
+        self.assertEqual(analytics["league_breakdown"]["NBA"]["profit_loss"], -11.0)
+        self.assertEqual(analytics["odds_breakdown"]["-150 to -101"]["bets"], 2)
+        self.assertEqual(analytics["odds_breakdown"]["+150 to +299"]["roi"], 0.0)
+        # The undated push falls back to its upload time
+        self.assertEqual(analytics["month_breakdown"]["2024-09"]["bets"], 3)
+        self.assertEqual(list(analytics["weekday_breakdown"]), ["Monday", "Saturday", "Sunday"])
+
+    def test_streaks_follow_event_order(self):
+        outcomes = ["WON", "WON", "LOST", "WON", "WON", "WON", "PUSH", "LOST", "LOST"]
+        bets = [bet(outcome, date=f"9/{day + 1}/24 • 1:00 PM") for day, outcome in enumerate(outcomes)]
+        random.shuffle(bets)
+        analytics = compute_analytics(bets)
+        self.assertEqual((analytics["longest_win_streak"], analytics["longest_loss_streak"]), (3, 2))
+
+    def test_average_odds_is_taken_over_decimal_odds(self):
+        self.assertEqual(to_american_odds(1 + 100 / 110), -110)
+        self.assertEqual(compute_analytics([bet("WON", odds="-110"), bet("WON", odds="-110")])["average_odds"], -110)
+
+    def test_large_history(self):
+        rng = random.Random(7)
+        bets = [bet(rng.choice(["WON", "LOST", "PUSH"]), odds=rng.choice(["-110", "+150", "-250", "+400"]),
+                    league=rng.choice(["NFL", "NBA", "MLB"]), date=f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/24 • 1:00 PM")
+                for _ in range(100_000)]
+        # Timed by storage/tests/load_test_compute.py; a wall-clock bound here would fail on slow CI
+        analytics = compute_analytics(bets)
+        self.assertEqual(analytics["total_bets"], 100_000)
+        self.assertEqual(analytics["wins"] + analytics["losses"] + analytics["pushes"], 100_000)
+
+if __name__ == '__main__':
+    unittest.main()
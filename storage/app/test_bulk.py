@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+import app as storage_app
+from bulk import JSONRecordReader
+from sqlite.btb import BTBSQLite
+
+def read(body: bytes, chunk_size: int) -> list:
+    reader = JSONRecordReader()
+    records = []
+    for start in range(0, len(body), chunk_size):
+        records.extend(reader.feed(body[start:start + chunk_size]))
+    return records + reader.close()
+
+class TestJSONRecordReader(unittest.TestCase):
+
+    def setUp(self):
+        self.bets = [{"bet_id": f"B{index}", "selection": "Café • Over 62.5", "stake": "11.00"} for index in range(50)]
+
+    def test_array_and_ndjson_split_at_any_byte(self):
+        array = json.dumps(self.bets, ensure_ascii=False).encode('utf-8')
+        ndjson = "\n".join(json.dumps(bet, ensure_ascii=False) for bet in self.bets).encode('utf-8')
+        for body in (array, ndjson):
+            for chunk_size in (1, 7, 64, len(body)):
+                self.assertEqual(read(body, chunk_size), self.bets)
+
+    def test_records_are_returned_as_they_complete(self):
+        reader = JSONRecordReader()
+        self.assertEqual(reader.feed(b'[{"bet_id": "A"}, {"bet_'), [{"bet_id": "A"}])
+        self.assertEqual(reader.feed(b'id": "B"}]'), [{"bet_id": "B"}])
+        self.assertEqual(reader.close(), [])
+
+    def test_malformed_bodies_are_rejected(self):
+        for body in (b'[{"bet_id": "A"}', b'{"bet_id": "A"}\n{"bet_id": ', b'[{"bet_id": "A"}] {"bet_id": "B"}', b'{"bet_id": "A"} oops'):
+            with self.assertRaises(ValueError):
+                read(body, 4)
+        with self.assertRaises(ValueError):
+            JSONRecordReader(max_record_bytes=100).feed(b'{"selection": "' + b'x' * 200)
+
+class TestBulkImportEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.engine = BTBSQLite(os.path.join(directory.name, "btb.sqlite3"))
+        patch = mock.patch.object(storage_app, "create_storage_engine", return_value=self.engine)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def post(self, chunks):
+        calls = []
+        import_user_bets = self.engine.import_user_bets
+        with mock.patch.object(storage_app, "btb_bulk_flush_records", 4), \
+             mock.patch.object(self.engine, "import_user_bets", side_effect=lambda user_id, bets: calls.append(len(bets)) or import_user_bets(user_id, bets)), \
+             TestClient(storage_app.app) as client:
+            response = client.post("/bets/bulk", content=iter(chunks))
+        return response, calls
+
+    def test_buffered_bets_are_written_in_batches(self):
+        bets = [{"bet_id": f"B{index}", "user_id": "X", "odds": "+100", "stake": "10.00", "outcome": "WON"} for index in range(10)]
+        response, calls = self.post([json.dumps(bet).encode('utf-8') + b"\n" for bet in bets + bets[:2]])
+        body = response.json()
+        self.assertEqual(response.status_code, 200)
+        # No more than the flush size is ever held, however the body is chunked
+        self.assertEqual(calls, [4, 4, 4])
+        self.assertEqual((len(body["succeeded_bets"]), sorted(body["duplicate_bets"])), (10, ["B0", "B1"]))
+        self.assertEqual(self.engine.get_user("X")["bankroll"], 200)
+
+    def test_malformed_tail_reports_what_was_imported(self):
+        bets = [{"bet_id": f"B{index}", "user_id": "X", "odds": "+100", "stake": "10.00", "outcome": "WON"} for index in range(5)]
+        response, _ = self.post([json.dumps(bet).encode('utf-8') + b"\n" for bet in bets] + [b'{"bet_id": '])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("4 bets already imported", response.json()["detail"])
+
+if __name__ == '__main__':
+    unittest.main()
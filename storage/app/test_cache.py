@@ -0,0 +1,63 @@
+import time
+import unittest
+
+from cache import TTLCache
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_items_expire(self):
+        cache = TTLCache(ttl_seconds=0.05, max_entries=10)
+        cache.put("X", {"bankroll": 100})
+        self.assertEqual(cache.get("X"), {"bankroll": 100})
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("X"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_returned_items_are_copies(self):
+        cache = TTLCache(ttl_seconds=60, max_entries=10)
+        cache.put("X", {"bankroll": 100})
+        cache.get("X")["bankroll"] = 0
+        self.assertEqual(cache.get("X"), {"bankroll": 100})
+
+    def test_read_started_before_an_invalidation_is_not_cached(self):
+        cache = TTLCache(ttl_seconds=60, max_entries=10)
+        token = cache.token("X")
+        cache.invalidate("X")
+        cache.put("X", {"bankroll": 100, "version": 1}, token)
+        self.assertIsNone(cache.get("X"))
+        cache.put("X", {"bankroll": 90, "version": 2}, cache.token("X"))
+        self.assertEqual(cache.get("X")["bankroll"], 90)
+
+    def test_older_versions_do_not_replace_newer(self):
+        cache = TTLCache(ttl_seconds=60, max_entries=10)
+        cache.put("X", {"bankroll": 90, "version": 2})
+        cache.put("X", {"bankroll": 100, "version": 1})
+        self.assertEqual(cache.get("X")["version"], 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = TTLCache(ttl_seconds=60, max_entries=2)
+        cache.put("A", {})
+        cache.put("B", {})
+        cache.get("A")
+        cache.put("C", {})
+        self.assertEqual((cache.get("A"), cache.get("B"), cache.get("C")), ({}, None, {}))
+
+    def test_invalidations_are_remembered_for_a_bounded_number_of_keys(self):
+        cache = TTLCache(ttl_seconds=60, max_entries=2)
+        token = cache.token("X")
+        for key in ["X"] + [f"U{index}" for index in range(100)]:
+            cache.invalidate(key)
+        self.assertEqual(len(cache.generations), 2)
+        # X's invalidation was forgotten, but the read that started before it is still refused
+        cache.put("X", {"bankroll": 100}, token)
+        self.assertIsNone(cache.get("X"))
+        cache.put("X", {"bankroll": 90}, cache.token("X"))
+        self.assertEqual(cache.get("X"), {"bankroll": 90})
+
+    def test_disabled(self):
+        cache = TTLCache(ttl_seconds=0, max_entries=10)
+        cache.put("X", {})
+        self.assertIsNone(cache.get("X"))
+
+if __name__ == '__main__':
+    unittest.main()
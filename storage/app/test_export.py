@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+import unittest
+from decimal import Decimal
+
+from export import EXPORT_FIELDS, export_chunks, parquet_available
+
+def bets(count):
+    return ({"bet_id": f"B{index:04d}", "league": "NFL", "selection": 'Over 62.5, "alt"', "stake": "11.00",
+             "profit_loss": Decimal("10.5"), "user_league": "X#NFL"} for index in range(count))
+
+class TestExport(unittest.TestCase):
+
+    def test_ndjson_has_export_fields_only(self):
+        lines = b"".join(export_chunks("ndjson", bets(1200))).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 1200)
+        row = json.loads(lines[0])
+        self.assertEqual(tuple(row), EXPORT_FIELDS)
+        self.assertEqual(row["profit_loss"], 10.5)
+
+    def test_resumed_csv_concatenates(self):
+        first = b"".join(export_chunks("csv", bets(3))).decode("utf-8")
+        rest = b"".join(export_chunks("csv", bets(2), header=False)).decode("utf-8")
+        rows = list(csv.DictReader(io.StringIO(first + rest)))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[4]["selection"], 'Over 62.5, "alt"')
+        self.assertEqual(b"".join(export_chunks("csv", bets(0))).decode("utf-8").strip(), ",".join(EXPORT_FIELDS))
+
+    @unittest.skipUnless(parquet_available(), "pyarrow is not installed")
+    def test_parquet_is_written_in_row_groups(self):
+        import pyarrow.parquet as pq
+        from export import parquet_chunks
+        chunks = list(parquet_chunks(bets(250), row_group_size=100))
+        parquet_file = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+        self.assertEqual((parquet_file.metadata.num_rows, parquet_file.metadata.num_row_groups), (250, 3))
+        # Each row group is sent as soon as it is written, before the footer
+        self.assertGreaterEqual(len([chunk for chunk in chunks if chunk]), 4)
+        self.assertEqual(parquet_file.read().column("profit_loss").to_pylist()[0], 10.5)
+
+if __name__ == '__main__':
+    unittest.main()
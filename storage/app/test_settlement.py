@@ -0,0 +1,57 @@
+import unittest
+from decimal import Decimal
+
+from app import calculate_profit_loss
+from service_models.models import BetDetails
+from settlement import plan_settlements, settled_profit_loss, settlement_totals
+
+def bet(bet_id, odds="-110", stake="11.00", outcome="PENDING", profit_loss=Decimal("0"), league="NFL", day=1):
+    return {"bet_id": bet_id, "league": league, "bet_type": "Spread", "odds": odds, "stake": stake, "outcome": outcome,
+            "profit_loss": profit_loss, "event_date": f"2024-09-{day:02d}T12:00"}
+
+class TestSettlement(unittest.TestCase):
+
+    def test_matches_upload_profit_loss(self):
+        cases = [("-110", "11.00", "WON"), ("+150", "$10.00", "WON"), ("-250", "1,000.00", "WON"), ("+400", "5", "LOST"),
+                 ("-110", "11.00", "PUSH"), ("-110", "11.00", "PENDING"), ("+125", "7.50", "won"), ("-115", "15.00", "WON"),
+                 ("120", "10.00", "WON"), ("EVEN", "10.00", "WON"), ("-", "10.00", "WON"), ("EVEN", "10.00", "LOST")]
+        bets = [bet(str(index), odds=odds, stake=stake) for index, (odds, stake, _) in enumerate(cases)]
+        settled = settled_profit_loss(bets, [outcome.upper() for _, _, outcome in cases])
+        for (odds, stake, outcome), profit_loss in zip(cases, settled):
+            expected = calculate_profit_loss(BetDetails(odds=odds, stake=stake, outcome=outcome.upper()))
+            # Same value and same precision, so bankroll and summary do not depend on the path
+            self.assertEqual(str(profit_loss), str(expected), (odds, stake, outcome))
+
+    def test_unsigned_and_even_odds_pay_nothing(self):
+        self.assertEqual(settled_profit_loss([bet("A", odds="120", stake="10"), bet("B", odds="EVEN", stake="10")], ["WON", "WON"]),
+                         [Decimal("0"), Decimal("0")])
+
+    def test_plan_skips_unchanged_bets(self):
+        changes, unchanged = plan_settlements([bet("A"), bet("B", outcome="WON", profit_loss=Decimal("10"))], {"A": "lost", "B": "WON"})
+        self.assertEqual(unchanged, ["B"])
+        self.assertEqual([(old["outcome"], new["outcome"], new["profit_loss"]) for old, new in changes], [("PENDING", "LOST", Decimal("-11.0000"))])
+
+    def test_totals_move_by_the_net_change(self):
+        changes, _ = plan_settlements([bet("A", day=1), bet("B", outcome="LOST", profit_loss=Decimal("-11"), league="NBA", day=2)],
+                                      {"A": "WON", "B": "PUSH"})
+        summary, days = settlement_totals(changes)
+        self.assertEqual(summary, {"profit_loss": Decimal("21"), "wins": 1, "losses": -1, "pushes": 1,
+                                   "league:NFL:profit_loss": Decimal("10"), "league:NFL:wins": 1,
+                                   "league:NBA:profit_loss": Decimal("11"), "league:NBA:losses": -1, "league:NBA:pushes": 1,
+                                   "bet_type:Spread:profit_loss": Decimal("21"), "bet_type:Spread:wins": 1,
+                                   "bet_type:Spread:losses": -1, "bet_type:Spread:pushes": 1})
+        self.assertEqual(days, {"2024-09-01": {"profit_loss": Decimal("10"), "wins": 1},
+                                "2024-09-02": {"profit_loss": Decimal("11"), "losses": -1, "pushes": 1}})
+
+    def test_large_batch(self):
+        bets = [bet(str(index), odds=("-110", "+150", "-250", "+400")[index % 4], stake=f"{10 + index % 50}.00") for index in range(100_000)]
+        outcomes = {item["bet_id"]: ("WON", "LOST", "PUSH")[index % 3] for index, item in enumerate(bets)}
+        # Timed by storage/tests/load_test_compute.py; a wall-clock bound here would fail on slow CI
+        changes, _ = plan_settlements(bets, outcomes)
+        summary, _ = settlement_totals(changes)
+        self.assertEqual(len(changes), 100_000)
+        self.assertEqual(summary["wins"] + summary["losses"] + summary["pushes"], 100_000)
+        self.assertEqual(summary["profit_loss"], sum((new["profit_loss"] for _, new in changes), Decimal("0")))
+
+if __name__ == '__main__':
+    unittest.main()
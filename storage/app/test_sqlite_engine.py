@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from engine import StaleVersionError
+from sqlite.btb import BTBSQLite
+
+def bet(bet_id, outcome="WON", league="NFL", bet_type="Spread", profit_loss="10", day=1, **extra):
+    return {"bet_id": bet_id, "league": league, "bet_type": bet_type, "odds": "-110", "stake": "11.00", "outcome": outcome,
+            "profit_loss": Decimal(profit_loss), "date": f"9/{day}/24 • 12:00 PM", "upload_timestamp": "2024-09-30 10:00:00", **extra}
+
+class TestSQLiteEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = BTBSQLite(os.path.join(self.directory.name, "btb.sqlite3"))
+        self.engine.create_user({"user_id": "X", "bankroll": Decimal("100.00")})
+
+    def tearDown(self):
+        self.engine.close()
+        self.directory.cleanup()
+
+    def test_write_skips_duplicates_and_updates_bankroll_once(self):
+        result = self.engine.write_user_bets("X", [bet("A"), bet("B", outcome="LOST", profit_loss="-11")])
+        self.assertEqual(result, {"written": ["A", "B"], "duplicates": [], "failed": []})
+        result = self.engine.write_user_bets("X", [bet("A"), bet("C")])
+        self.assertEqual((result["written"], result["duplicates"]), (["C"], ["A"]))
+        self.assertEqual(self.engine.get_user("X")["bankroll"], Decimal("109.00"))
+
+    def test_existing_bet_ids(self):
+        self.engine.write_user_bets("X", [bet("A"), bet("C")])
+        self.assertEqual(self.engine.existing_bet_ids("X", ["C", "B", "A", "C"]), ["C", "A"])
+        self.assertEqual(self.engine.existing_bet_ids("Y", ["A"]), [])
+
+    def test_unknown_user_fails_the_whole_write(self):
+        result = self.engine.write_user_bets("nobody", [bet("A")])
+        self.assertEqual(result["failed"], ["A"])
+        self.assertIsNone(self.engine.get_user_summary("nobody"))
+
+    def test_summary_is_aggregated_in_sql(self):
+        self.engine.write_user_bets("X", [bet("A"), bet("B", league="NBA", outcome="LOST", profit_loss="-11"), bet("C", league=None, outcome="PUSH", profit_loss="0")])
+        summary = self.engine.get_user_summary("X")
+        self.assertEqual((summary["total_bets"], summary["wins"], summary["losses"], summary["pushes"]), (3, 1, 1, 1))
+        self.assertEqual(summary["total_profit_loss"], Decimal("-1"))
+        self.assertEqual(summary["league_breakdown"], {"NFL": Decimal("10"), "NBA": Decimal("-11"), "Unknown": Decimal("0")})
+
+    def test_filtered_pages_follow_event_date_order(self):
+        self.engine.write_user_bets("X", [bet(f"B{index}", league=("NFL", "NBA")[index % 2], day=30 - index) for index in range(10)])
+        seen, cursor = [], None
+        while True:
+            page, cursor = self.engine.query_user_bets_page("X", 2, cursor=cursor, attributes=["bet_id", "event_date"], filters={"league": "NFL"})
+            seen.extend(page)
+            if not cursor:
+                break
+        self.assertEqual([item["bet_id"] for item in seen], ["B8", "B6", "B4", "B2", "B0"])
+        page, _ = self.engine.query_user_bets_page("X", 10, start=date(2024, 9, 21), end=date(2024, 9, 22), filters={"outcome": "won"})
+        self.assertEqual([item["bet_id"] for item in page], ["B9", "B8"])
+
+    def test_conditional_bankroll_write_needs_the_user(self):
+        with self.assertRaises(StaleVersionError):
+            self.engine.set_bankroll("Q", Decimal("5"), expected_version=3)
+        with self.assertRaises(StaleVersionError):
+            self.engine.set_bankroll("Q", Decimal("5"), expected_version=0)
+        self.assertIsNone(self.engine.get_user("Q"))
+        self.assertEqual(self.engine.set_bankroll("X", Decimal("5"), expected_version=0), {"bankroll": Decimal("5"), "version": 1})
+        with self.assertRaises(StaleVersionError):
+            self.engine.set_bankroll("X", Decimal("6"), expected_version=0)
+        self.assertEqual(self.engine.set_bankroll("Q", Decimal("5"))["version"], 1)
+
+    def test_daily_rollups(self):
+        self.engine.write_user_bets("X", [bet("A", day=1), bet("B", day=1, outcome="LOST", profit_loss="-11"), bet("C", day=2)])
+        days = self.engine.query_daily_rollups("X", start=date(2024, 9, 2))
+        self.assertEqual([(item["day"], item["bets"], item["profit_loss"]) for item in days], [("2024-09-02", 1, 10.0)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import json
+import os
+import sys
+import time
+import uuid
+import httpx
+
+# Benchmark for the storage service's bulk import. Run it against a running storage service, e.g.
+# docker compose up storage_service dynamodb, or BTB_STORAGE_ENGINE=sqlite uvicorn app:app --port 9004
+URL = os.getenv("BTB_STORAGE_URL", "http://localhost:9004")
+LEAGUES = ["NFL", "NBA", "MLB", "NHL", "NCAAF"]
+BET_TYPES = ["Spread", "Totals", "Moneyline", "Prop"]
+OUTCOMES = ["WON", "LOST", "PUSH"]
+
+def make_bet(run_id: str, index: int, user_id: str) -> dict:
+    """A distinct bet per index, spread over leagues, bet types, outcomes and event days."""
+    return {"bet_id": f"{run_id}-{index:06d}", "user_id": user_id, "league": LEAGUES[index % len(LEAGUES)],
+            "bet_type": BET_TYPES[index % len(BET_TYPES)], "selection": f"Load test {index}", "odds": ["-110", "+150", "-250"][index % 3],
+            "stake": f"{10 + index % 40}.00", "outcome": OUTCOMES[index % len(OUTCOMES)],
+            "date": f"{index % 12 + 1}/{index % 28 + 1}/24 • 1:00 PM", "sportsbook": "MGM"}
+
+def ndjson_chunks(bets: list, bets_per_chunk: int = 500):
+    """Stream the body in pieces, like an export being uploaded."""
+    for start in range(0, len(bets), bets_per_chunk):
+        yield "".join(json.dumps(bet) + "\n" for bet in bets[start:start + bets_per_chunk]).encode("utf-8")
+
+def timed_post(client, path, **kwargs):
+    start = time.perf_counter()
+    response = client.post(f"{URL}{path}", **kwargs)
+    return response, time.perf_counter() - start
+
+def run_load_test(num_bets: int, user_id: str, compare: bool):
+    """Import num_bets through /bets/bulk, re-import them to measure duplicate detection, and optionally time /bets."""
+    run_id = uuid.uuid4().hex[:8]
+    bets = [make_bet(run_id, index, user_id) for index in range(num_bets)]
+    with httpx.Client(timeout=600) as client:
+        client.post(f"{URL}/users", json={"user_id": user_id, "bankroll": 100})
+        bankroll_before = client.get(f"{URL}/users/{user_id}").json()["bankroll"]
+
+        response, elapsed = timed_post(client, "/bets/bulk", content=ndjson_chunks(bets), headers={"Content-Type": "application/x-ndjson"})
+        body = response.json()
+        print(f"/bets/bulk: {num_bets} bets in {elapsed:.2f}s ({num_bets / elapsed:.0f} bets/s), {len(body['succeeded_bets'])} written, "
+              f"{len(body['duplicate_bets'])} duplicates, {len(body['failed_bets'])} failed, {len(body['invalid_bets'])} invalid")
+
+        response, elapsed = timed_post(client, "/bets/bulk", content=ndjson_chunks(bets), headers={"Content-Type": "application/x-ndjson"})
+        body = response.json()
+        print(f"/bets/bulk re-import: {elapsed:.2f}s, {len(body['succeeded_bets'])} written, {len(body['duplicate_bets'])} duplicates")
+
+        bankroll_after = client.get(f"{URL}/users/{user_id}").json()["bankroll"]
+        summary = client.get(f"{URL}/bets/{user_id}/summary").json()
+        print(f"Bankroll {bankroll_before} -> {bankroll_after}, summary has {summary.get('total_bets')} bets")
+
+        if compare:
+            bets = [{**bet, "bet_id": f"{bet['bet_id']}-tx"} for bet in bets]
+            response, elapsed = timed_post(client, "/bets", json=bets)
+            print(f"/bets: {num_bets} bets in {elapsed:.2f}s ({num_bets / elapsed:.0f} bets/s), {len(response.json()['succeeded_bets'])} written")
+
+if __name__ == "__main__":
+    # Usage: python load_test_bulk.py [bets] [user_id] [--compare]
+    args = [arg for arg in sys.argv[1:] if arg != "--compare"]
+    num_bets = int(args[0]) if args else 10_000
+    user_id = args[1] if len(args) > 1 else f"load-{uuid.uuid4().hex[:6]}"
+    run_load_test(num_bets, user_id, "--compare" in sys.argv)
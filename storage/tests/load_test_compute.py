@@ -0,0 +1,57 @@
+import random
+import sys
+import time
+from decimal import Decimal
+from pathlib import Path
+
+# Times the storage service's in-process computations on large inputs; no running service is needed.
+# The unit tests check these code paths for correctness only, since wall-clock bounds fail on slow or shared CI.
+sys.path[:0] = [str(Path(__file__).resolve().parents[1] / "app"), str(Path(__file__).resolve().parents[2])]
+
+from analytics import compute_analytics
+from settlement import plan_settlements, settlement_totals
+
+# Seconds each computation should stay under on a developer machine
+BUDGETS = {"analytics": 1.0, "settlement": 2.0}
+
+def analytics_bets(count: int) -> list:
+    rng = random.Random(7)
+    bets = []
+    for index in range(count):
+        outcome = rng.choice(["WON", "LOST", "PUSH"])
+        bets.append({"bet_id": str(index), "league": rng.choice(["NFL", "NBA", "MLB"]), "bet_type": "Spread",
+                     "date": f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/24 • 1:00 PM", "odds": rng.choice(["-110", "+150", "-250", "+400"]),
+                     "stake": "11.00", "profit_loss": {"WON": Decimal("10"), "LOST": Decimal("-11")}.get(outcome, Decimal("0")),
+                     "outcome": outcome, "upload_timestamp": "2024-09-23 10:00:00"})
+    return bets
+
+def time_analytics(count: int) -> float:
+    bets = analytics_bets(count)
+    start = time.perf_counter()
+    compute_analytics(bets)
+    return time.perf_counter() - start
+
+def time_settlement(count: int) -> float:
+    # Pending bets settled across a few odds, stakes and outcomes, as a day of final games would be
+    bets = [{"bet_id": str(index), "league": "NFL", "bet_type": "Spread", "odds": ("-110", "+150", "-250", "+400")[index % 4],
+             "stake": f"{10 + index % 50}.00", "outcome": "PENDING", "profit_loss": Decimal("0"), "event_date": "2024-09-01T12:00"}
+            for index in range(count)]
+    outcomes = {bet["bet_id"]: ("WON", "LOST", "PUSH")[index % 3] for index, bet in enumerate(bets)}
+    start = time.perf_counter()
+    changes, _ = plan_settlements(bets, outcomes)
+    settlement_totals(changes)
+    return time.perf_counter() - start
+
+def run_benchmarks(count: int) -> bool:
+    """Time each computation on count bets and report it against its budget. Returns whether all stayed within budget."""
+    within_budget = True
+    for name, benchmark in (("analytics", time_analytics), ("settlement", time_settlement)):
+        elapsed = benchmark(count)
+        within_budget &= elapsed < BUDGETS[name]
+        print(f"{name}: {count} bets in {elapsed:.3f}s (budget {BUDGETS[name]:.1f}s)")
+    return within_budget
+
+if __name__ == "__main__":
+    # Usage: python load_test_compute.py [bets]
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sys.exit(0 if run_benchmarks(count) else 1)
@@ -0,0 +1,59 @@
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+import httpx
+from load_test_bulk import URL, make_bet
+
+# Concurrency benchmark for /bets. Run it against a running storage service backed by DynamoDB Local,
+# e.g. docker compose up storage_service dynamodb, and vary BTB_STORAGE_WORKERS and BTB_DYNAMODB_MAX_POOL_CONNECTIONS
+
+async def post_bets(client, semaphore, bets: list, latencies: list, errors: list):
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{URL}/bets", json=bets)
+            response.raise_for_status()
+            body = response.json()
+            if body["failed_bets"]:
+                errors.append(f"{len(body['failed_bets'])} failed bets")
+        except httpx.HTTPError as e:
+            errors.append(str(e) or type(e).__name__)
+        latencies.append(time.perf_counter() - start)
+
+async def run_load_test(num_requests: int, concurrency: int, num_users: int, bets_per_request: int):
+    """Send num_requests /bets requests, at most concurrency at a time, spread round-robin over num_users users."""
+    run_id = uuid.uuid4().hex[:8]
+    user_ids = [f"load-{run_id}-{index}" for index in range(num_users)]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        for user_id in user_ids:
+            await client.post(f"{URL}/users", json={"user_id": user_id, "bankroll": 0})
+
+        requests = [[make_bet(run_id, index * bets_per_request + offset, user_ids[index % num_users]) for offset in range(bets_per_request)]
+                    for index in range(num_requests)]
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, errors = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*(post_bets(client, semaphore, bets, latencies, errors) for bets in requests))
+        elapsed = time.perf_counter() - start
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        print(f"/bets: {num_requests} requests x {bets_per_request} bets, {concurrency} concurrent, {num_users} users")
+        print(f"  {elapsed:.2f}s, {num_requests / elapsed:.1f} requests/s, {num_requests * bets_per_request / elapsed:.1f} bets/s")
+        print(f"  latency p50 {quantiles[49] * 1000:.0f}ms, p95 {quantiles[94] * 1000:.0f}ms, p99 {quantiles[98] * 1000:.0f}ms, "
+              f"max {max(latencies) * 1000:.0f}ms, {len(errors)} errors")
+        for error in sorted(set(errors))[:5]:
+            print(f"  error: {error}")
+
+        # Every written bet must have reached its user's summary exactly once
+        summaries = [(await client.get(f"{URL}/bets/{user_id}/summary")).json() for user_id in user_ids]
+        stored = sum(summary.get("total_bets", 0) for summary in summaries)
+        print(f"  summaries hold {stored} of {num_requests * bets_per_request} bets")
+
+if __name__ == "__main__":
+    # Usage: python load_test_concurrent.py [requests] [concurrency] [users] [bets_per_request]
+    args = [int(arg) for arg in sys.argv[1:]]
+    defaults = [2000, 64, 50, 1]
+    asyncio.run(run_load_test(*(args + defaults[len(args):])))